@@ -0,0 +1,52 @@
+"""
+Round trip (pickle then unpickle) cost of :class:`ayeaye.Pinnate` objects holding large nested
+documents. This is what a return value or task kwargs crossing the :class:`LocalProcessPool`
+queues pays.
+
+The 'before' figures re-create the old serialisation (`as_native()` then `load()`) for
+comparison.
+
+Run from the root of the repository-
+$ PYTHONPATH=lib python benchmarks/pinnate_pickle.py
+"""
+
+import pickle
+import timeit
+
+from ayeaye.pinnate import Pinnate
+
+
+def nested_document(width, depth):
+    if depth == 0:
+        return {"value": 1.5, "label": "leaf", "tags": ["a", "b", "c"]}
+
+    return {
+        f"child_{i}": nested_document(width, depth - 1) if i % 2 else [{"n": i}] * width
+        for i in range(width)
+    }
+
+
+def old_round_trip(p, protocol):
+    "Serialisation before :meth:`Pinnate.__reduce__`"
+    as_bytes = pickle.dumps({"pinnate_data": p.as_native()}, protocol=protocol)
+    state = pickle.loads(as_bytes)
+    return Pinnate(state["pinnate_data"])
+
+
+def new_round_trip(p, protocol):
+    return pickle.loads(pickle.dumps(p, protocol=protocol))
+
+
+if __name__ == "__main__":
+    repeat = 5
+    for width, depth in [(10, 3), (20, 3), (10, 5)]:
+        doc = nested_document(width, depth)
+        for label, p in [("eager", Pinnate(doc)), ("wrap", Pinnate.wrap(doc))]:
+            size = len(pickle.dumps(p, protocol=5))
+            before = min(timeit.repeat(lambda: old_round_trip(p, 4), number=1, repeat=repeat))
+            after = min(timeit.repeat(lambda: new_round_trip(p, 5), number=1, repeat=repeat))
+            print(
+                f"width={width:<3} depth={depth} {label:<5} pickle={size / 1024:8.1f}KB "
+                f"before={before * 1000:8.2f}ms after={after * 1000:8.2f}ms "
+                f"speed up={before / after:5.1f}x"
+            )
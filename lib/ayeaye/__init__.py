@@ -6,3 +6,4 @@ from ayeaye.connectors.base import AccessMode
 from ayeaye.model import LockingMode, Model, PartitionedModel
 from ayeaye.model_collection import ModelCollection
 from ayeaye.pinnate import Pinnate
+from ayeaye.record import Record
@@ -124,7 +124,16 @@ class AbstractDependencyDrivenModelRunner(ayeaye.PartitionedModel):
             if not self.condition.acquire(True, timeout=3):
                 continue
 
-            if len(self.running_models) == 0 or self.condition.wait(timeout=1):
+            # yielded after the lock is released. The process pool could pause this generator
+            # and `partition_subtask_complete` needs the lock.
+            sub_tasks = []
+            # models that completed before this waits, e.g. those replayed from a checkpoint, have
+            # already notified
+            if (
+                len(self.running_models) == 0
+                or self.recently_completed_models
+                or self.condition.wait(timeout=1)
+            ):
 
                 just_completed = set()
                 for model_name in self.recently_completed_models:
@@ -151,12 +160,14 @@ class AbstractDependencyDrivenModelRunner(ayeaye.PartitionedModel):
                         model_cls=model_cls,
                         method_name="go",  # full model runs from this method
                     )
-                    yield t
+                    sub_tasks.append(t)
 
             # wait() will re-acquire the lock both on receiving a notification and on timeout so
             # release it in both cases
             self.condition.release()
 
+            yield from sub_tasks
+
             if len(self.remaining_models) == 0:
                 self.log("All models have been started", "DEBUG")
                 return
@@ -327,10 +327,19 @@ class Connect:
         return getattr(self._standalone_connection, attr)
 
     def __len__(self):
-        raise NotImplementedError("TODO")
+        """
+        Number of records in the dataset behind a standalone Connect. i.e. proxy to a DataConnector.
+        A TypeError is raised when the DataConnector doesn't support `len`.
+        """
+        self.connect_standalone()
+        return len(self._standalone_connection)
 
     def __getitem__(self, key):
-        raise NotImplementedError("TODO")
+        """
+        Random access to the records behind a standalone Connect. e.g. `Connect(ref="x")[10:20]`
+        """
+        self.connect_standalone()
+        return self._standalone_connection[key]
 
     def __iter__(self):
         """
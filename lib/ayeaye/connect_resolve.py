@@ -1,3 +1,5 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
 import copy
 import json
 import re
@@ -47,23 +49,72 @@ class ConnectorResolver:
     """
 
     def __init__(self):
-        self._clear_state()
+        # threads and asyncio tasks in :meth:`isolated_thread` have their own state. A context
+        # variable because each thread, and each asyncio task, has it's own value.
+        self._isolated_state = ContextVar("isolated_resolver_state", default=None)
+        self._global_state = _ResolverState()
 
     def _clear_state(self):
-        self.unnamed_callables = []
-        self._attr = {}
+        if self._isolated_state.get() is not None:
+            self._isolated_state.set(_ResolverState())
+        else:
+            self._global_state = _ResolverState()
 
-        self.secret_callables = []
-        self._secret_attr = {}
+    @property
+    def _state(self):
+        "@return: :class:`_ResolverState` used by the current thread or asyncio task"
+        return self._isolated_state.get() or self._global_state
+
+    @property
+    def unnamed_callables(self):
+        return self._state.unnamed_callables
+
+    @property
+    def _attr(self):
+        return self._state.attr
+
+    @property
+    def secret_callables(self):
+        return self._state.secret_callables
+
+    @property
+    def _secret_attr(self):
+        return self._state.secret_attr
 
     def brutal_reset(self):
         """
         Discard any callables or attributes that have been set. This method is really for unit
         tests to stop a failed test effecting the 'clear' state for a subsequent test. Be careful
         not to call this other times.
+
+        Within :meth:`isolated_thread` just the current thread's state is discarded.
         """
         self._clear_state()
 
+    @contextmanager
+    def isolated_thread(self):
+        """
+        Context manager giving the current thread it's own, initially empty, set of callables and
+        attributes. Until it exits, :meth:`add` and :meth:`context` in this thread don't change
+        what other threads resolve and changes made by other threads aren't seen by this one.
+
+        An asyncio task is isolated from the other tasks in the same way. It must be used within
+        the task, i.e. not by the code that created the task.
+
+        This is how :class:`ayeaye.runtime.thread_pool.LocalThreadPool` and
+        :class:`ayeaye.runtime.async_pool.LocalAsyncPool` run sub-tasks with different contexts at
+        the same time. e.g.
+
+        >>> with connector_resolver.isolated_thread():
+        >>>     with connector_resolver.context(data_version="1234"):
+        >>>         ...
+        """
+        token = self._isolated_state.set(_ResolverState())
+        try:
+            yield self
+        finally:
+            self._isolated_state.reset(token)
+
     def __getattr__(self, attr):
         if attr not in self._attr:
             return DeferredResolution(self, attr)
@@ -282,8 +333,8 @@ class ConnectorResolver:
 
         @see :meth:`add` for args and kwargs
 
-        Warning - not yet thread-safe as the global state is altered for the duration of the
-        context manager. Can be fixed with thread local variables.
+        Warning - not thread-safe as the global state is altered for the duration of the
+        context manager. Unless it's used within :meth:`isolated_thread`.
         """
 
         class _LocalResolverContext:
@@ -342,6 +393,20 @@ class ConnectorResolver:
         return isolated_local_context
 
 
+class _ResolverState:
+    """
+    Callables and attributes added to a :class:`ConnectorResolver`. There is one for all threads
+    and one for each thread or asyncio task in :meth:`ConnectorResolver.isolated_thread`.
+    """
+
+    def __init__(self):
+        self.unnamed_callables = []
+        self.attr = {}
+
+        self.secret_callables = []
+        self.secret_attr = {}
+
+
 class DeferredResolution:
     """
     Avoid the catch 22 of :class:`ConnectorResolver`'s named attribute being needed by a class variable
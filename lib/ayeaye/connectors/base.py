@@ -1,10 +1,12 @@
 from collections import namedtuple
+import codecs
 from datetime import datetime, timezone
 from enum import Enum
 import glob
 import os
 import types
 
+from ayeaye.connectors.line_index import LineIndex
 from ayeaye.ignition import Ignition, EngineUrlCase, EngineUrlStatus
 
 
@@ -128,6 +130,12 @@ class DataConnector:
     # as is to the target subclass of :class:`ayeaye.DataConnector`.
     preserve_callables = []
 
+    # True when an open connection can be kept for the next sub-task run on the same model
+    # instance in a worker (@see `model_cache_size` in
+    # :class:`ayeaye.runtime.multiprocess.LocalProcessPool`). i.e. the connection doesn't depend
+    # on what the last sub-task did with it, as it would with a file's position.
+    connection_reusable = False
+
     # TODO - make it possible for internal variable name to not match kwarg name, e.g. schema -> self._schema
     # TODO - these aren't always optional, handling missing mandatory args here
 
@@ -317,6 +325,13 @@ class DataConnector:
     def __len__(self):
         raise NotImplementedError("Can optionally be implemented by subclasses.")
 
+    def __bool__(self):
+        """
+        A connector is true whatever it's length. Otherwise `if connector:` would call
+        :meth:`__len__`, which could read the whole dataset.
+        """
+        return True
+
     def __getitem__(self, key):
         raise NotImplementedError("Can optionally be implemented by subclasses.")
 
@@ -427,6 +442,10 @@ class FileBasedConnector(DataConnector):
     file_mode = "t"
     engine_pattern_expander_cls = FilesystemEnginePattern
 
+    # :class:`LineIndex` for subclasses with one record per line. It's kept after the connection
+    # is closed and rebuilt if the file changes. @see :meth:`_record_index`
+    _line_index = None
+
     def _reset(self):
         """
         Subclasses must call this within the constructor
@@ -434,6 +453,9 @@ class FileBasedConnector(DataConnector):
         self._file_handle = None
         self._engine_params = None
         self.file_size = None
+        # (start, end) byte offsets after snapping to record boundaries. Only used by subclasses
+        # that support ;start=...;end=... engine_url args. @see :meth:`_open_byte_range`
+        self._byte_range = None
 
     @property
     def engine_params(self):
@@ -475,6 +497,234 @@ class FileBasedConnector(DataConnector):
             return os.stat(self.file_path).st_size
         return None
 
+    def byte_ranges(self, partition_count, balance_records=False):
+        """
+        Split the file into `partition_count` ranges of roughly equal numbers of bytes. These can
+        be used with connectors that support `start` and `end` engine_url args (e.g. CSV and
+        NDJSON) so each sub-task of a :class:`PartitionedModel` reads just part of a large file.
+
+        The offsets don't need to be on record boundaries, the connector reading the range will
+        snap to the start of the next record.
+
+        With `balance_records` each range has roughly the same number of records instead. This
+        uses the line index (@see :meth:`_record_index`) so is only for subclasses with one record
+        per line.
+
+        e.g.
+        >>> for start, end in self.big_input.byte_ranges(partition_count):
+        >>>    yield ("process_range", {"start": start, "end": end})
+
+        @param partition_count: (int) maximum number of ranges. Tiny files could give fewer.
+        @param balance_records: (bool) split by number of records, not bytes
+        @return: list of (start, end) tuples, start is inclusive, end is exclusive
+        """
+        if partition_count < 1:
+            raise ValueError("partition_count must be a positive integer")
+
+        file_size = self._get_file_size()
+        if file_size is None:
+            raise ValueError(f"Size of '{self.file_path}' isn't available")
+
+        if balance_records:
+            offsets = self._record_index().offsets
+            record_count = len(offsets)
+            # the first range starts at 0 so it includes any header
+            boundaries = [0] + [
+                offsets[record_count * i // partition_count]
+                for i in range(1, partition_count)
+                if record_count * i // partition_count < record_count
+            ]
+        else:
+            boundaries = [file_size * i // partition_count for i in range(partition_count)]
+
+        boundaries = sorted(set(boundaries))
+
+        boundaries.append(file_size)
+        return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)]
+
+    def _open_byte_range(self, data_start=0):
+        """
+        Snap the `start` and `end` engine params to record (i.e. line) boundaries within the open
+        file and store the result in `self._byte_range`. A record belongs to the range that
+        contains it's first byte.
+
+        Records must be separated by newlines, so quoted CSV values spanning lines aren't
+        supported. The file must be uncompressed and seekable.
+
+        @param data_start: (int) byte offset of the first record. e.g. after a CSV header.
+        """
+        binary_handle = getattr(self._file_handle, "buffer", self._file_handle)
+        if not binary_handle.seekable():
+            raise ValueError("Byte ranges can only be read from a seekable file")
+
+        file_size = self._get_file_size()
+
+        def record_boundary(offset):
+            "byte offset of the first record starting at or after `offset`"
+            offset = min(max(offset, data_start), file_size)
+            if offset == data_start or offset == file_size:
+                return offset
+
+            binary_handle.seek(offset - 1)
+            binary_handle.readline()
+            return binary_handle.tell()
+
+        start = record_boundary(int(self.engine_params.get("start", 0)))
+        end = record_boundary(int(self.engine_params.get("end", file_size)))
+        self._byte_range = (start, max(start, end))
+        self.approx_position = start
+
+    def _binary_lines(self):
+        """
+        Generator yielding lines (bytes) from the binary layer beneath the text mode file handle.
+        Exact byte positions are tracked in `self.approx_position`.
+
+        When `self._byte_range` is set, just the records within the range are yielded. See
+        :meth:`_open_byte_range`.
+        """
+        binary_handle = getattr(self._file_handle, "buffer", self._file_handle)
+
+        if self._byte_range is None:
+            for line in binary_handle:
+                self.approx_position += len(line)
+                yield line
+            return
+
+        position, end = self._byte_range
+        binary_handle.seek(position)
+
+        while position < end:
+            line = binary_handle.readline()
+            if not line:
+                break
+            position += len(line)
+            self.approx_position = position
+            yield line
+
+    def _byte_range_lines(self):
+        """
+        Generator yielding decoded lines for the records within `self._byte_range`. See
+        :meth:`_binary_lines`.
+        """
+        encoding = getattr(self._file_handle, "encoding", None) or "utf-8"
+        for line in self._binary_lines():
+            yield line.decode(encoding)
+
+    def _line_index_args(self):
+        """
+        Subclasses with one record per line can override this.
+
+        @return: (dict) kwargs for :meth:`LineIndex.for_file`. `data_start` is the byte offset of
+            the first record (e.g. after a header) and `persist` is to use a sidecar file.
+        """
+        return {"data_start": 0, "persist": False}
+
+    def _record_index(self, build=True):
+        """
+        The index is built on first use and rebuilt if the file changes.
+
+        @param build: (bool) build the index, which reads the whole file, when it isn't already in
+            memory or in a current sidecar file
+        @return: :class:`LineIndex` with the byte offset of every record in the file or None when
+            not `build` and it would have to be built
+        """
+        encoding = codecs.lookup(self.encoding or "utf-8").name
+        if encoding.startswith(("utf-16", "utf-32")):
+            raise ValueError(f"Records can't be indexed in files with '{encoding}' encoding")
+
+        index_args = self._line_index_args()
+        if self._line_index is None or not self._line_index.matches(
+            os.stat(self.file_path), index_args["data_start"]
+        ):
+            self._line_index = LineIndex.for_file(
+                self.file_path, opener=self._open, build=build, **index_args
+            )
+
+        return self._line_index
+
+    def record_count(self):
+        """
+        Number of records. Within the byte range when `start` or `end` engine_url args are given.
+
+        The first call reads the whole file to build an index of the records, unless the index is
+        in a current sidecar file (@see `persist_line_index` optional arg). Subclasses with one
+        record per line can use this.
+
+        @return: (int)
+        """
+        if self.access != AccessMode.READ:
+            raise ValueError("Record count is only available in READ mode")
+
+        return self._indexed_record_count()
+
+    def _indexed_len(self):
+        """
+        For :meth:`__len__`. Python calls `len()` as a hint, e.g. in `list(connector)`, so it
+        mustn't read the whole file to build the index. It's :meth:`record_count` when the index is
+        already available.
+
+        @return: (int) number of records
+        """
+        if self.access != AccessMode.READ:
+            raise ValueError("Length is only available in READ mode")
+
+        if self._record_index(build=False) is None:
+            # TypeError, as for an object without a length, so `list(..)` etc. carry on without it
+            raise TypeError(
+                "len() needs the index of records, which reads the whole file to build. Use "
+                "record_count() or random access (e.g. connector[0]) first."
+            )
+
+        return self._indexed_record_count()
+
+    def _indexed_span(self):
+        """
+        @return: (first, last) positions within the line index of the records in the `start` and
+            `end` byte range (engine_url args) or all the records when there isn't a byte range.
+        """
+        line_index = self._record_index()
+        if "start" not in self.engine_params and "end" not in self.engine_params:
+            return 0, len(line_index)
+
+        start = int(self.engine_params.get("start", 0))
+        end = int(self.engine_params.get("end", line_index.file_size))
+        return line_index.span(start, end)
+
+    def _indexed_record_count(self):
+        "@return: (int) number of records. @see :meth:`_indexed_span`"
+        first, last = self._indexed_span()
+        return last - first
+
+    def _indexed_lines(self, key):
+        """
+        Read records from anywhere in the file by seeking to their byte offset.
+
+        @param key: (int or slice) position(s) of the record(s), counting from the start of the
+            byte range when `start` or `end` engine_url args are given.
+        @return: (bytes) line for an int key or a list of (bytes) lines for a slice
+        """
+        first, last = self._indexed_span()
+        offsets = self._line_index.offsets
+        record_count = last - first
+
+        if isinstance(key, slice):
+            positions = range(*key.indices(record_count))
+        elif isinstance(key, int):
+            position = key + record_count if key < 0 else key
+            if not 0 <= position < record_count:
+                raise IndexError("Record index out of range")
+            positions = [position]
+        else:
+            raise TypeError("Records can only be accessed with an int or a slice")
+
+        lines = []
+        with self._open(self.file_path, "rb") as binary_handle:
+            for position in positions:
+                binary_handle.seek(offsets[first + position])
+                lines.append(binary_handle.readline())
+
+        return lines if isinstance(key, slice) else lines[0]
+
     def auto_create_directory(self):
         "Place for a hook within subclasses. @see :meth:`_auto_create_directory`"
         return self._auto_create_directory()
@@ -577,6 +827,12 @@ class FileBasedConnector(DataConnector):
         if self.access != AccessMode.READ or self.file_size is None or self.approx_position == 0:
             return None
 
+        if self._byte_range is not None:
+            start, end = self._byte_range
+            if end == start:
+                return 1.0
+            return (self.approx_position - start) / (end - start)
+
         return self.approx_position / self.file_size
 
     @property
@@ -4,11 +4,18 @@ Created on 14 Jan 2020
 @author: si
 """
 
+import codecs
 import copy
 import csv
+import io
+from itertools import islice
 
 from ayeaye.connectors.base import AccessMode, FileBasedConnector
 from ayeaye.pinnate import Pinnate
+from ayeaye.record import Record
+
+# most records :meth:`CsvConnector.add_many` holds before writing, whatever `write_buffer_size` is
+_ADD_MANY_BATCH = 1000
 
 
 class CsvConnector(FileBasedConnector):
@@ -23,7 +30,12 @@ class CsvConnector(FileBasedConnector):
         "transform_map": {},
         "encoding": "utf-8-sig",
         "delimiter": ",",
+        "persist_line_index": False,
+        "write_buffer_size": 1,
+        "file_buffer_size": None,
+        "record_type": Pinnate,
     }
+    preserve_callables = ["record_type"]
     optional_engine_url_args = FileBasedConnector.optional_engine_url_args + ["start", "end"]
     write_mode_open_args = {"newline": "\n"}
 
@@ -69,10 +81,34 @@ class CsvConnector(FileBasedConnector):
             delimiter (str)
                     Used to separate fields.
 
+            persist_line_index (bool) - keep the index used by `record_count()`, `len(..)` and
+                    random access (e.g. `connector[1000:1010]`) in a hidden file next to the CSV
+                    file so it's only built once.
+                    @see :class:`ayeaye.connectors.line_index.LineIndex`
+
+            write_buffer_size (int) - number of records given to :meth:`add` or :meth:`add_many`
+                    that are held before being written in one go. They are also written by
+                    :meth:`flush` and when the connection is closed. The default (1) writes each
+                    record before `add` returns. A larger value is faster but errors from
+                    writing (e.g. a `transform_map` function failing) are raised by a later
+                    `add`, `flush` or the close instead of the `add` that caused them.
+
+            file_buffer_size (int) - bytes buffered by the operating system file handle when
+                    writing. Default is Python's default which is usually 8KB. A few MB suits
+                    large outputs.
+
+            record_type (class) - :class:`Pinnate` (default) or :class:`ayeaye.Record` for a
+                    compact, read only record that's faster to build.
+
         Connection information-
             engine_url format is
-            csv://<filesystem absolute path>data_file.csv[;start=<line number>][;end=<line number>][;encoding=<character encoding>]
+            csv://<filesystem absolute path>data_file.csv[;start=<byte offset>][;end=<byte offset>][;encoding=<character encoding>]
         e.g. csv:///data/my_project/all_the_data.csv
+
+            `start` and `end` restrict reading to the records that begin within that byte range.
+            The offsets are snapped to the start of the next line so they can be evenly spaced
+            through the file. See :meth:`FileBasedConnector.byte_ranges`. Values containing
+            newlines aren't supported in this mode.
         """
         self._reset()
         super().__init__(*args, **kwargs)
@@ -85,11 +121,21 @@ class CsvConnector(FileBasedConnector):
         if self.access == AccessMode.READWRITE:
             raise NotImplementedError("Read+Write access not yet implemented")
 
+        if self.write_buffer_size < 1:
+            raise ValueError("write_buffer_size must be a positive integer")
+
+        if self.file_buffer_size is not None:
+            self.write_mode_open_args = {
+                **self.write_mode_open_args,
+                "buffering": self.file_buffer_size,
+            }
+
         self._reset()
 
     def _reset(self):
         FileBasedConnector._reset(self)
         self.csv = None
+        self._write_buffer = []  # dicts with just the fields being written
         self.approx_position = 0
         if hasattr(self, "base_field_names"):
             self.field_names = copy.copy(self.base_field_names)
@@ -107,9 +153,6 @@ class CsvConnector(FileBasedConnector):
                 if typed_param in self._engine_params:
                     self._engine_params[typed_param] = int(self._engine_params[typed_param])
 
-            if "start" in self._engine_params or "end" in self._engine_params:
-                raise NotImplementedError("TODO")
-
         return self._engine_params
 
     def connect(self):
@@ -136,43 +179,27 @@ class CsvConnector(FileBasedConnector):
                 )
                 self.field_names = self.csv.fieldnames
 
-                if self.required_fields is not None:
-                    required = set(self.required_fields)
-                    field_names = set(self.field_names)
-
-                    if not required.issubset(field_names):
-                        missing_fields = ",".join(list(required - field_names))
-                        msg = f"Missing required field(s): {missing_fields}"
-                        raise ValueError(msg)
-
-                if self.expected_fields is not None and self.expected_fields != self.field_names:
-                    diff_s = set(self.expected_fields).symmetric_difference(set(self.field_names))
-                    diff = ",".join(diff_s)
-                    diff_count = len(diff_s)
-                    expected = ",".join(self.expected_fields)
-                    actual = ",".join(self.field_names)
-                    msg = (
-                        f"Expected fields does match fields found in file. There are {diff_count} "
-                        f"difference(s): [{diff}] expected: [{expected}] but found: [{actual}]"
+                if "start" in self.engine_params or "end" in self.engine_params:
+                    # Just read the records within the byte range. The header (if there is one)
+                    # has already been read.
+                    data_start = 0
+                    if self.field_names is not None and "fieldnames" not in extra_args:
+                        header_handle = getattr(self._file_handle, "buffer", self._file_handle)
+                        header_handle.seek(0)
+                        header_handle.readline()
+                        data_start = header_handle.tell()
+
+                    self._open_byte_range(data_start=data_start)
+                    extra_args["fieldnames"] = self.field_names
+                    self.csv = csv.DictReader(
+                        self._byte_range_lines(),
+                        delimiter=self.delimiter,
+                        **extra_args,
                     )
-                    raise ValueError(msg)
 
+                field_names = self._checked_field_names(self.field_names)
                 if self.alias_fields is not None:
-                    if isinstance(self.alias_fields, dict):
-                        replace_fields = [self.alias_fields.get(f, f) for f in self.csv.fieldnames]
-                        self.csv.fieldnames = self.field_names = replace_fields
-
-                    elif not isinstance(self.alias_fields, list) or len(self.alias_fields) != len(
-                        self.csv.fieldnames
-                    ):
-                        msg = (
-                            "Alias fields must be a dictionary or list with same number of "
-                            "items as fields in the file"
-                        )
-                        raise ValueError(msg)
-
-                    else:
-                        self.csv.fieldnames = self.field_names = self.alias_fields
+                    self.csv.fieldnames = self.field_names = field_names
 
             elif self.access == AccessMode.WRITE:
                 if (
@@ -204,19 +231,122 @@ class CsvConnector(FileBasedConnector):
             else:
                 raise ValueError("Unsupported access mode")
 
+    def _checked_field_names(self, field_names):
+        """
+        @param field_names: (list of str) from the `field_names` arg or the file's header
+        @return: (list of str) `field_names` with `alias_fields` applied
+        @raise ValueError: when `field_names` don't satisfy `required_fields` or `expected_fields`
+        """
+        if self.required_fields is not None:
+            required = set(self.required_fields)
+            present = set(field_names)
+
+            if not required.issubset(present):
+                missing_fields = ",".join(list(required - present))
+                msg = f"Missing required field(s): {missing_fields}"
+                raise ValueError(msg)
+
+        if self.expected_fields is not None and self.expected_fields != field_names:
+            diff_s = set(self.expected_fields).symmetric_difference(set(field_names))
+            diff = ",".join(diff_s)
+            diff_count = len(diff_s)
+            expected = ",".join(self.expected_fields)
+            actual = ",".join(field_names)
+            msg = (
+                f"Expected fields does match fields found in file. There are {diff_count} "
+                f"difference(s): [{diff}] expected: [{expected}] but found: [{actual}]"
+            )
+            raise ValueError(msg)
+
+        if self.alias_fields is None:
+            return field_names
+
+        if isinstance(self.alias_fields, dict):
+            return [self.alias_fields.get(f, f) for f in field_names]
+
+        if not isinstance(self.alias_fields, list) or len(self.alias_fields) != len(field_names):
+            msg = (
+                "Alias fields must be a dictionary or list with same number of "
+                "items as fields in the file"
+            )
+            raise ValueError(msg)
+
+        return self.alias_fields
+
+    def _reader_args(self):
+        "@return: (dict) kwargs for `csv.reader` other than the file"
+        extra_args = {"delimiter": self.delimiter}
+        if self.quoting:
+            extra_args["quoting"] = getattr(csv, self.quoting)
+        return extra_args
+
+    def _line_index_args(self):
+        data_start = 0
+        if self.base_field_names is None:
+            # first line is the header
+            with self._open(self.file_path, "rb") as binary_handle:
+                binary_handle.readline()
+                data_start = binary_handle.tell()
+
+        return {"data_start": data_start, "persist": self.persist_line_index}
+
     def __len__(self):
-        raise NotImplementedError("TODO")
+        """
+        Number of records once the index of records has been built, e.g. by :meth:`record_count`
+        or random access, or is in a current sidecar file. Otherwise TypeError is raised so
+        `list(connector)` doesn't read the file twice.
+
+        @return: (int) number of records. Within the byte range when `start` or `end` are given.
+        """
+        return self._indexed_len()
 
     def __getitem__(self, key):
-        raise NotImplementedError("TODO")
+        """
+        Records are read by seeking to their position in the file so values spanning lines
+        aren't supported.
+
+        @param key: (int or slice)
+        @return: record (see `record_type`) for an int key or a list of records for a slice
+        """
+        if self.access != AccessMode.READ:
+            raise ValueError("Records can only be accessed in READ mode")
+
+        lines = self._indexed_lines(key)
+        encoding = codecs.lookup(self.encoding or "utf-8").name
+
+        # field names (and aliases) are from the header. The file isn't opened in text mode.
+        field_names = self.base_field_names
+        if field_names is None:
+            with self._open(self.file_path, "rb") as binary_handle:
+                header = binary_handle.readline().decode(encoding)
+            field_names = next(csv.reader([header], **self._reader_args()))
+
+        field_names = self._checked_field_names(field_names)
+        fields_count = len(field_names)
+
+        decoded = [line.decode(encoding) for line in (lines if isinstance(key, slice) else [lines])]
+        records = []
+        for row in csv.reader(decoded, **self._reader_args()):
+            row = row[:fields_count] + [None] * (fields_count - len(row))
+            raw = dict(zip(field_names, row))
+
+            for k, transformer in self.transform_map.items():
+                if k in raw:
+                    raw[k] = transformer(raw[k])
+
+            records.append(self.record_type.wrap(raw))
+
+        return records if isinstance(key, slice) else records[0]
 
     def __iter__(self):
         self.connect()
         for raw in self.csv:
-            # OSError: telling position disabled by next() call so this for now
-            # str(x) will slightly over count 'None'. None is given by DictReader when
-            # trailing commas are omitted for optional fields at end of row.
-            self.approx_position += len(self.delimiter.join([str(x) for x in raw.values()]))
+            if self._byte_range is None:
+                # OSError: telling position disabled by next() call so this for now
+                # str(x) will slightly over count 'None'. None is given by DictReader when
+                # trailing commas are omitted for optional fields at end of row.
+                # When reading a byte range the exact position is already known.
+                self.approx_position += len(self.delimiter.join([str(x) for x in raw.values()]))
 
             if self.transform_map:
                 # field mapping + transform callable
@@ -224,11 +354,96 @@ class CsvConnector(FileBasedConnector):
                     if k in raw:
                         raw[k] = transformer(raw[k])
 
-            yield Pinnate(data=raw)
+            yield self.record_type.wrap(raw)
+
+        # reduce the number of open file handles when the whole file has been read
+        self.close_connection()
+
+    def iter_batches(self, batch_size=10000, columnar=False):
+        """
+        Generator yielding blocks of rows without building a :class:`Pinnate` for each row. This
+        is much faster than :meth:`__iter__` with large files.
+
+        The `transform_map` is applied to each column of the block in one pass.
+
+        Rows with fewer values than `field_names` are padded with None (as csv.DictReader does)
+        and values beyond the last field are dropped. Blank lines are skipped.
+
+        @param batch_size: (int) maximum number of rows in each block.
+        @param columnar: (bool)
+            False (default) - yield a list of tuples. Values in each tuple are in the same order
+                as `self.field_names`.
+            True - yield a dict with field name as the key and a list of values for that
+                column as the value.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+
+        self.connect()
+
+        # the header (or not) and field aliases have been dealt with by the DictReader in
+        # :meth:`connect`. The underlying csv reader yields plain lists.
+        reader = self.csv.reader
+        field_names = self.field_names
+        if field_names is None:
+            # empty file without `field_names`. Like :meth:`__iter__` there is nothing to yield.
+            self.close_connection()
+            return
+
+        fields_count = len(field_names)
+
+        # (column index, callable)
+        transformers = [
+            (idx, self.transform_map[fn])
+            for idx, fn in enumerate(field_names)
+            if fn in self.transform_map
+        ]
+
+        while True:
+            rows = list(islice(reader, batch_size))
+            if not rows:
+                break
+
+            if any(len(row) != fields_count for row in rows):
+                rows = [
+                    row[:fields_count] + [None] * (fields_count - len(row)) for row in rows if row
+                ]
+                if not rows:
+                    continue
+
+            if columnar or transformers:
+                columns = [list(values) for values in zip(*rows)]
+
+                for idx, transformer in transformers:
+                    columns[idx] = [transformer(v) for v in columns[idx]]
+
+                if columnar:
+                    block = dict(zip(field_names, columns))
+                else:
+                    block = list(zip(*columns))
+            else:
+                block = [tuple(row) for row in rows]
+
+            if self._byte_range is None:
+                self._update_byte_position()
+            yield block
 
         # reduce the number of open file handles when the whole file has been read
         self.close_connection()
 
+    def _update_byte_position(self):
+        """
+        Set `approx_position` from the position of the binary buffer beneath the text mode file
+        handle. The text layer reads ahead so this is accurate to within a read chunk.
+
+        When not available (some engine type modifiers don't have a seekable buffer)
+        `approx_position` is left unchanged.
+        """
+        try:
+            self.approx_position = self._file_handle.buffer.tell()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            pass
+
     @property
     def data(self):
         raise NotImplementedError("TODO")
@@ -236,43 +451,93 @@ class CsvConnector(FileBasedConnector):
     def add(self, data):
         """
         Write line to CSV file.
-        @param data: (dict or Pinnate)
+
+        It's only buffered when `write_buffer_size` (see the constructor) is more than 1. A
+        buffered record is written, and any error from writing it is raised, by a later `add`,
+        :meth:`flush` or when the connection is closed.
+
+        @param data: (dict, Pinnate or Record)
+        """
+        self.add_many([data])
+
+    def add_many(self, records):
+        """
+        Write lines to CSV file. This is faster than calling :meth:`add` for each record.
+
+        Records are held until `write_buffer_size` of them are waiting, or until the end of this
+        call when that is fewer than 1000 records. The `transform_map` is then
+        applied one field at a time to all the waiting records and they are written with a single
+        `writerows`.
+
+        @param records: (iterable of dict, Pinnate or Record)
         """
         if self.access != AccessMode.WRITE:
             raise ValueError("Write attempted on dataset opened in READ mode.")
 
-        # until schemas are implemented, first row determines fields
-        if self.csv is None and self.field_names is None:
+        # records from one call are batched even when `write_buffer_size` is small
+        batch_size = max(self.write_buffer_size, _ADD_MANY_BATCH)
+        write_buffer = self._write_buffer
+        for data in records:
             if isinstance(data, dict):
-                self.field_names = list(data.keys())
-            elif isinstance(data, Pinnate):
-                self.field_names = list(data.as_dict().keys())
+                _d = data
+            elif isinstance(data, (Pinnate, Record)):
+                _d = data.as_dict()
+            else:
+                msg = (
+                    "data isn't an accepted type. Only (dict), (Pinnate) or (Record) are accepted."
+                )
+                raise ValueError(msg)
+
+            # until schemas are implemented, first row determines fields
+            if self.csv is None:
+                if self.field_names is None:
+                    self.field_names = list(_d.keys())
+                self.connect()
+
+            if self.field_names:
+                # the CSV module needs the fields to match the fieldnames. It's a common scenario
+                # to extract just a few fields, these have already been passed to the
+                # CsvConnector so just extract the fields needed. This is also a copy so the
+                # caller can reuse their dictionary while it's buffered.
+                data_extract = {fn: _d[fn] for fn in self.field_names if fn in _d}
+            else:
+                data_extract = dict(_d)
 
-        self.connect()
+            write_buffer.append(data_extract)
+            if len(write_buffer) >= batch_size:
+                self.flush()
+                write_buffer = self._write_buffer
 
-        if isinstance(data, dict):
-            _d = data
-        elif isinstance(data, Pinnate):
-            _d = data.as_dict()
-        else:
-            raise ValueError("data isn't an accepted type. Only (dict) or (Pinnate) are accepted.")
+        if len(write_buffer) >= self.write_buffer_size:
+            self.flush()
 
-        if self.field_names:
-            # the CSV module needs the dictionary passed to write row to match the fieldnames. It's
-            # a common scenario to extract just a few fields, these have already been passed to
-            # the CsvConnector so just extract the fields needed.
-            data_extract = {fn: _d[fn] for fn in self.field_names if fn in _d}
-        else:
-            data_extract = _d
+    def flush(self):
+        """
+        Write buffered records to the file handle.
+        """
+        if not self._write_buffer:
+            return
+
+        rows = self._write_buffer
+        self._write_buffer = []
 
         # field level changes before writing
-        if self.transform_map:
-            # field mapping + transform callable
-            for k, transformer in self.transform_map.items():
+        for k, transformer in self.transform_map.items():
+            for data_extract in rows:
                 if k in data_extract:
                     data_extract[k] = transformer(data_extract[k])
 
-        self.csv.writerow(data_extract)
+        if self.field_names:
+            # rows are already restricted to these fields so the DictWriter's per row checks
+            # aren't needed. Missing fields are blank, as DictWriter does.
+            field_names = self.field_names
+            self.csv.writer.writerows([[r.get(fn, "") for fn in field_names] for r in rows])
+        else:
+            self.csv.writerows(rows)
+
+    def close_connection(self):
+        self.flush()
+        super().close_connection()
 
 
 class TsvConnector(CsvConnector):
@@ -0,0 +1,198 @@
+"""
+Interchangeable JSON encoders/decoders for connectors that read and write JSON documents.
+
+The standard library's `json` module is always available. Faster alternatives are used when they
+are installed and requested, either for a single connector-
+
+>>> ayeaye.Connect(engine_url="ndjson:///data/big.ndjson", json_backend="orjson")
+
+or for all connectors that don't specify one-
+
+>>> from ayeaye.connectors.json_backend import json_backends
+>>> json_backends.default = "orjson"
+"""
+
+import json
+
+try:
+    import orjson
+except ModuleNotFoundError:
+    pass
+
+try:
+    import ujson
+except ModuleNotFoundError:
+    pass
+
+try:
+    import simdjson
+except ModuleNotFoundError:
+    pass
+
+
+class AbstractJsonBackend:
+    """
+    Subclasses wrap a JSON library.
+    """
+
+    # used to select the backend. e.g. json_backend="orjson"
+    name = None
+
+    @staticmethod
+    def is_available():
+        """
+        @return: bool - the underlying library is installed
+        """
+        raise NotImplementedError("Must be implemented by subclasses")
+
+    def loads(self, document):
+        """
+        @param document: (bytes or str) a single JSON document. Bytes must be UTF-8.
+        @return: native python types
+        """
+        raise NotImplementedError("Must be implemented by subclasses")
+
+    def dumps(self, data, indent=None):
+        """
+        Will raise TypeError if the data can't be serialised to JSON.
+
+        @param data: native python types
+        @param indent: (int) optional - spaces to indent when pretty printing
+        @return: (str)
+        """
+        raise NotImplementedError("Must be implemented by subclasses")
+
+
+class StdlibJsonBackend(AbstractJsonBackend):
+    name = "json"
+
+    @staticmethod
+    def is_available():
+        return True
+
+    def loads(self, document):
+        return json.loads(document)
+
+    def dumps(self, data, indent=None):
+        return json.dumps(data, indent=indent)
+
+
+class OrjsonBackend(AbstractJsonBackend):
+    """
+    https://github.com/ijl/orjson
+
+    Output is compact (i.e. no spaces after separators) and orjson can only indent with 2 spaces.
+    Other indents fall back to the standard library.
+    """
+
+    name = "orjson"
+
+    @staticmethod
+    def is_available():
+        return "orjson" in globals()
+
+    def loads(self, document):
+        return orjson.loads(document)
+
+    def dumps(self, data, indent=None):
+        if indent is None:
+            return orjson.dumps(data).decode("utf-8")
+
+        if indent == 2:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode("utf-8")
+
+        return json.dumps(data, indent=indent)
+
+
+class UjsonBackend(AbstractJsonBackend):
+    "https://github.com/ultrajson/ultrajson"
+
+    name = "ujson"
+
+    @staticmethod
+    def is_available():
+        return "ujson" in globals()
+
+    def loads(self, document):
+        return ujson.loads(document)
+
+    def dumps(self, data, indent=None):
+        return ujson.dumps(data, indent=indent or 0)
+
+
+class SimdjsonBackend(AbstractJsonBackend):
+    """
+    https://github.com/TkTech/pysimdjson
+
+    simdjson only decodes, the standard library is used to encode.
+    """
+
+    name = "simdjson"
+
+    @staticmethod
+    def is_available():
+        return "simdjson" in globals()
+
+    def loads(self, document):
+        return simdjson.loads(document)
+
+    def dumps(self, data, indent=None):
+        return json.dumps(data, indent=indent)
+
+
+class JsonBackendRegistry:
+    """
+    Find a JSON backend by name. Also holds the default backend used when a connector isn't
+    given one.
+    """
+
+    def __init__(self):
+        self.backends = {}  # name -> subclass of :class:`AbstractJsonBackend`
+        self._default = None
+        self.reset()
+
+    def reset(self):
+        "Built in backends with the standard library as the default"
+        self.backends = {
+            b.name: b for b in [StdlibJsonBackend, OrjsonBackend, UjsonBackend, SimdjsonBackend]
+        }
+        self._default = StdlibJsonBackend.name
+
+    @property
+    def default(self):
+        "(str) name of the backend used when connectors don't specify one"
+        return self._default
+
+    @default.setter
+    def default(self, backend_name):
+        # fail early if it's not installed
+        self.get(backend_name)
+        self._default = backend_name
+
+    def available(self):
+        """
+        @return: list of str - names of backends that are installed
+        """
+        return [name for name, backend_cls in self.backends.items() if backend_cls.is_available()]
+
+    def get(self, backend=None):
+        """
+        @param backend: (str, instance of subclass of :class:`AbstractJsonBackend` or None for
+            the default backend)
+        @return: instance of subclass of :class:`AbstractJsonBackend`
+        """
+        if isinstance(backend, AbstractJsonBackend):
+            return backend
+
+        backend_name = self._default if backend is None else backend
+        backend_cls = self.backends.get(backend_name)
+        if backend_cls is None:
+            raise ValueError(f"Unknown JSON backend: '{backend_name}'")
+
+        if not backend_cls.is_available():
+            raise ValueError(f"JSON backend '{backend_name}' isn't installed")
+
+        return backend_cls()
+
+
+json_backends = JsonBackendRegistry()
@@ -5,9 +5,9 @@ Created on 15 Apr 2020
 """
 
 import io
-import json
 
 from ayeaye.connectors.base import AccessMode, FileBasedConnector
+from ayeaye.connectors.json_backend import json_backends
 from ayeaye.pinnate import Pinnate
 
 
@@ -17,6 +17,7 @@ class JsonConnector(FileBasedConnector):
     optional_args = {
         **FileBasedConnector.optional_args,
         "encoding": "utf-8-sig",
+        "json_backend": None,
     }
 
     def __init__(self, *args, **kwargs):
@@ -26,7 +27,10 @@ class JsonConnector(FileBasedConnector):
         For args: @see :class:`connectors.base.DataConnector`
 
         additional args for JsonConnector
-         None
+            json_backend (str or instance of :class:`AbstractJsonBackend`) - library used to
+                    decode and encode the document. e.g. "orjson". Defaults to the standard
+                    library unless changed with `json_backends.default`.
+                    @see :mod:`ayeaye.connectors.json_backend`
 
         Connection information-
             engine_url format is
@@ -64,10 +68,18 @@ class JsonConnector(FileBasedConnector):
             FileBasedConnector.connect(self)
 
     def __len__(self):
-        raise NotImplementedError("TODO")
+        """
+        The document is loaded into memory so there isn't an index of positions in the file.
+
+        @return: (int) number of items in the top level list or dictionary
+        """
+        return len(self.data.values())
 
     def __getitem__(self, key):
-        raise NotImplementedError("TODO")
+        """
+        @param key: (int or slice) for a list document or (str) key for a dictionary document
+        """
+        return self.data[key]
 
     def __iter__(self):
         raise NotImplementedError("Not an iterative dataset. Use .data instead.")
@@ -78,8 +90,8 @@ class JsonConnector(FileBasedConnector):
 
         if self._doc is None:
             self.connect()
-            as_native = json.load(self._file_handle)
-            self._doc = Pinnate(as_native)
+            as_native = json_backends.get(self.json_backend).loads(self._file_handle.read())
+            self._doc = Pinnate.wrap(as_native)
 
             if self.access == AccessMode.READWRITE:
                 self._file_handle.seek(0)
@@ -104,10 +116,11 @@ class JsonConnector(FileBasedConnector):
         if "indent" in self.engine_params:
             json_args["indent"] = self.engine_params["indent"]
 
+        json_backend = json_backends.get(self.json_backend)
         if isinstance(new_data, Pinnate):
-            as_json = json.dumps(new_data.as_dict(), **json_args)
+            as_json = json_backend.dumps(new_data.as_dict(), **json_args)
         else:
-            as_json = json.dumps(new_data, **json_args)
+            as_json = json_backend.dumps(new_data, **json_args)
 
         # Data is written to beginning of file (it might be readwrite or already written to);
         # write to disk immediately (i.e. flush); @see :meth:`connect`.
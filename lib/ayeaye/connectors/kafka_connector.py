@@ -212,7 +212,7 @@ class KafkaConnector(DataConnector):
 
             for m in self.client:
                 self.approx_position += 1
-                yield Pinnate(data=m.value)
+                yield Pinnate.wrap(m.value)
 
                 if end_offset is not None and m.offset >= end_offset:
                     break
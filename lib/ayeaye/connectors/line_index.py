@@ -0,0 +1,163 @@
+"""
+Byte offsets of the records in files with one record per line (e.g. CSV and NDJSON) so they can be
+counted and read in any order without reading the whole file.
+
+The index is a compact array of offsets. It can be kept in a hidden 'sidecar' file next to the
+data file so it only needs to be built once. It's keyed on the data file's size and modification
+time so a changed file is re-indexed.
+"""
+
+import array
+import os
+import struct
+import sys
+from bisect import bisect_left
+
+
+class LineIndex:
+    """
+    Byte offset of the first byte of each record. Records are separated by newlines and blank lines
+    aren't records. Quoted values spanning lines (possible in CSV) aren't supported.
+    """
+
+    sidecar_prefix = "."
+    sidecar_suffix = ".ayeaye_index"
+    magic = b"AYEIDX01"
+    # file size, modification time in nanoseconds, offset of first record
+    header = struct.Struct("<QQQ")
+
+    def __init__(self, offsets, file_size, mtime_ns, data_start=0):
+        """
+        @param offsets: (array.array of unsigned 64 bit ints) byte offset of each record
+        @param file_size: (int) bytes in the indexed file
+        @param mtime_ns: (int) modification time of the indexed file
+        @param data_start: (int) offset indexing started from. e.g. after a CSV header.
+        """
+        self.offsets = offsets
+        self.file_size = file_size
+        self.mtime_ns = mtime_ns
+        self.data_start = data_start
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @classmethod
+    def sidecar_path(cls, file_path):
+        """
+        @return: (str) path to the index file for the data file at `file_path`
+        """
+        directory, file_name = os.path.split(file_path)
+        return os.path.join(directory, cls.sidecar_prefix + file_name + cls.sidecar_suffix)
+
+    @classmethod
+    def for_file(cls, file_path, data_start=0, persist=False, opener=open, build=True):
+        """
+        Load the index from the sidecar file when it's current, otherwise build it.
+
+        @param file_path: (str) data file
+        @param data_start: (int) offset of the first record
+        @param persist: (bool) read and write the sidecar file. Failing to write the sidecar
+            (e.g. read only directory) isn't an error.
+        @param opener: (callable) with the same signature as `open`
+        @param build: (bool) build the index when there isn't a current sidecar file
+        @return: :class:`LineIndex` or None when it would have to be built and not `build`
+        """
+        stat = os.stat(file_path)
+        sidecar_path = cls.sidecar_path(file_path)
+
+        if persist:
+            line_index = cls.load(sidecar_path)
+            if line_index is not None and line_index.matches(stat, data_start):
+                return line_index
+
+        if not build:
+            return None
+
+        with opener(file_path, "rb") as binary_handle:
+            line_index = cls.build(binary_handle, stat.st_size, stat.st_mtime_ns, data_start)
+
+        if persist:
+            try:
+                line_index.save(sidecar_path)
+            except OSError:
+                pass
+
+        return line_index
+
+    @classmethod
+    def build(cls, binary_handle, file_size, mtime_ns, data_start=0):
+        """
+        @param binary_handle: file like opened in binary mode
+        @return: :class:`LineIndex`
+        """
+        offsets = array.array("Q")
+        position = data_start
+        binary_handle.seek(data_start)
+        for line in binary_handle:
+            if line.strip():
+                offsets.append(position)
+            position += len(line)
+
+        return cls(offsets, file_size, mtime_ns, data_start)
+
+    @classmethod
+    def load(cls, sidecar_path):
+        """
+        @return: :class:`LineIndex` or None if the sidecar file doesn't exist or isn't valid
+        """
+        try:
+            with open(sidecar_path, "rb") as f:
+                contents = f.read()
+        except OSError:
+            return None
+
+        header_end = len(cls.magic) + cls.header.size
+        if not contents.startswith(cls.magic) or (len(contents) - header_end) % 8:
+            return None
+
+        file_size, mtime_ns, data_start = cls.header.unpack(contents[len(cls.magic) : header_end])
+        offsets = array.array("Q")
+        offsets.frombytes(contents[header_end:])
+        if sys.byteorder != "little":
+            offsets.byteswap()
+
+        return cls(offsets, file_size, mtime_ns, data_start)
+
+    def save(self, sidecar_path):
+        "Write the index. It's replaced in one step so readers never see a partial index."
+        offsets = self.offsets
+        if sys.byteorder != "little":
+            offsets = array.array("Q", offsets)
+            offsets.byteswap()
+
+        partial_path = f"{sidecar_path}.{os.getpid()}.partial"
+        with open(partial_path, "wb") as f:
+            f.write(self.magic)
+            f.write(self.header.pack(self.file_size, self.mtime_ns, self.data_start))
+            offsets.tofile(f)
+        os.replace(partial_path, sidecar_path)
+
+    def matches(self, stat, data_start=0):
+        """
+        @param stat: (os.stat_result) of the data file
+        @return: (bool) the index was built from the file as it is now
+        """
+        return (
+            self.file_size == stat.st_size
+            and self.mtime_ns == stat.st_mtime_ns
+            and self.data_start == data_start
+        )
+
+    def span(self, start, end):
+        """
+        Records belong to the byte range containing their first byte. @see
+        :meth:`FileBasedConnector._open_byte_range`
+
+        @param start: (int) byte offset, inclusive
+        @param end: (int) byte offset, exclusive
+        @return: (first, last) positions in the index of records within the byte range. `last` is
+            exclusive.
+        """
+        first = bisect_left(self.offsets, start)
+        last = bisect_left(self.offsets, end, lo=first)
+        return first, last
@@ -4,13 +4,15 @@ Created on 17 Dec 2020
 @author: si
 """
 
-try:
-    import ndjson
-except ModuleNotFoundError:
-    pass
+import codecs
 
 from ayeaye.connectors.base import AccessMode, FileBasedConnector
+from ayeaye.connectors.json_backend import json_backends
 from ayeaye.pinnate import Pinnate
+from ayeaye.record import Record
+
+# most records :meth:`NdjsonConnector.add_many` holds before writing, any `write_buffer_size`
+_ADD_MANY_BATCH = 1000
 
 
 class NdjsonConnector(FileBasedConnector):
@@ -18,7 +20,13 @@ class NdjsonConnector(FileBasedConnector):
     optional_args = {
         **FileBasedConnector.optional_args,
         "encoding": "utf-8-sig",
+        "json_backend": None,
+        "persist_line_index": False,
+        "write_buffer_size": 1,
+        "record_type": Pinnate,
     }
+    preserve_callables = ["record_type"]
+    optional_engine_url_args = FileBasedConnector.optional_engine_url_args + ["start", "end"]
 
     def __init__(self, *args, **kwargs):
         """
@@ -29,53 +37,144 @@ class NdjsonConnector(FileBasedConnector):
         For args: @see :class:`connectors.base.DataConnector`
 
         additional args for NdjsonConnector
-         None
+            json_backend (str or instance of :class:`AbstractJsonBackend`) - library used to
+                    decode and encode each line. e.g. "orjson". Defaults to the standard
+                    library unless changed with `json_backends.default`.
+                    @see :mod:`ayeaye.connectors.json_backend`
+
+            persist_line_index (bool) - keep the index used by `record_count()`, `len(..)` and
+                    random access (e.g. `connector[1000:1010]`) in a hidden file next to the data
+                    file so it's only built once.
+                    @see :class:`ayeaye.connectors.line_index.LineIndex`
+
+            write_buffer_size (int) - number of serialised records from :meth:`add` or
+                    :meth:`add_many` that are held before being written with a single write. They
+                    are also written by :meth:`flush` and when the connection is closed. The
+                    default (1) writes each record before `add` returns. A larger value is faster
+                    but errors from writing are raised by a later `add`, `flush` or the close.
+
+            record_type (class) - :class:`Pinnate` (default) or :class:`ayeaye.Record` for a
+                    compact, read only record that's faster to build.
 
         Connection information-
             engine_url format is
-            ndjson://<filesystem absolute path>[;encoding=<character encoding>]
+            ndjson://<filesystem absolute path>[;start=<byte offset>][;end=<byte offset>][;encoding=<character encoding>]
         e.g. ndjson:///data/my_project/the_data.json;encoding=latin-1
-        """
-        super().__init__(*args, **kwargs)
 
+            `start` and `end` restrict reading to the records that begin within that byte range.
+            See :meth:`FileBasedConnector.byte_ranges`.
+        """
         self._reset()
+        super().__init__(*args, **kwargs)
 
         if self.access == AccessMode.READWRITE:
             raise NotImplementedError("READWRITE access not yet implemented")
 
+        if self.write_buffer_size < 1:
+            raise ValueError("write_buffer_size must be a positive integer")
+
     def _reset(self):
         FileBasedConnector._reset(self)
         self.reader = None
         self.writer = None
+        self._json = None
+        self._write_buffer = []  # JSON documents (str) waiting to be written
         self.approx_position = 0
 
     def connect(self):
         if self.reader is None and self.writer is None:
+            self._json = json_backends.get(self.json_backend)
+
             if self.access == AccessMode.READ:
                 FileBasedConnector.connect(self)
-                self.reader = ndjson.reader(self._file_handle)
+                if "start" in self.engine_params or "end" in self.engine_params:
+                    self._open_byte_range()
+
+                self.reader = self._decoded_lines()
 
             elif self.access == AccessMode.WRITE:
                 FileBasedConnector.connect(self)
-                self.writer = ndjson.writer(self._file_handle)
+                self.writer = self._file_handle
 
             else:
                 raise ValueError("Unknown access mode")
 
+    def _decoded_lines(self):
+        """
+        Generator yielding a decoded JSON document for each non-blank line.
+
+        UTF-8 lines are read as bytes and given directly to the JSON backend so they aren't
+        decoded twice. `self.approx_position` is maintained from the length of each line.
+        """
+        loads = self._json.loads
+        encoding = codecs.lookup(self._file_handle.encoding or "utf-8").name
+
+        if encoding in ("utf-8", "utf-8-sig"):
+            lines = self._binary_lines()
+        elif self._byte_range is not None:
+            lines = self._byte_range_lines()
+        else:
+            # newlines aren't always a single byte (e.g. UTF-16) so use the text layer
+            lines = self._file_handle
+
+        first_line = True
+        for line in lines:
+            if first_line:
+                first_line = False
+                bom = codecs.BOM_UTF8 if isinstance(line, bytes) else "\ufeff"
+                if line.startswith(bom):
+                    line = line[len(bom) :]
+
+            if lines is self._file_handle:
+                self.approx_position += len(line)
+
+            line = line.strip()
+            if line:
+                yield loads(line)
+
+    def _line_index_args(self):
+        return {"data_start": 0, "persist": self.persist_line_index}
+
     def __len__(self):
-        raise NotImplementedError("TODO")
+        """
+        Number of records once the index of records has been built, e.g. by :meth:`record_count`
+        or random access, or is in a current sidecar file. Otherwise TypeError is raised so
+        `list(connector)` doesn't read the file twice.
+
+        @return: (int) number of records. Within the byte range when `start` or `end` are given.
+        """
+        return self._indexed_len()
 
     def __getitem__(self, key):
-        raise NotImplementedError("TODO")
+        """
+        @param key: (int or slice)
+        @return: record (see `record_type`) for an int key or a list of records for a slice
+        """
+        if self.access != AccessMode.READ:
+            raise ValueError("Records can only be accessed in READ mode")
+
+        loads = json_backends.get(self.json_backend).loads
+        encoding = codecs.lookup(self.encoding or "utf-8").name
+
+        def as_pinnate(line):
+            if encoding not in ("utf-8", "utf-8-sig"):
+                line = line.decode(encoding)
+            elif line.startswith(codecs.BOM_UTF8):
+                line = line[len(codecs.BOM_UTF8) :]
+            return self.record_type.wrap(loads(line))
+
+        lines = self._indexed_lines(key)
+        if isinstance(key, slice):
+            return [as_pinnate(line) for line in lines]
+
+        return as_pinnate(lines)
 
     def __iter__(self):
         self.connect()
 
         for r in self.reader:
-            # OSError: telling position disabled by next() call so this for now.
-            # TODO: It's a waste of CPU to make it back into a string.
-            self.approx_position += len(str(r))
-            yield Pinnate(data=r)
+            # `self.approx_position` is a byte count from the file handle. See :meth:`_binary_lines`
+            yield self.record_type.wrap(r)
 
         # reduce the number of open file handles when the whole file has been read
         self.close_connection()
@@ -87,16 +186,67 @@ class NdjsonConnector(FileBasedConnector):
     def add(self, data):
         """
         Write record to ndjson file.
-        @param data: (dict or Pinnate) - must be safe to serialise to JSON so no dates etc.
+
+        It's only buffered when `write_buffer_size` (see the constructor) is more than 1. A
+        buffered record is written, and any error from writing it is raised, by a later `add`,
+        :meth:`flush` or when the connection is closed.
+
+        @param data: (dict, Pinnate or Record) - must be safe to serialise to JSON so no dates etc.
+        """
+        self.add_many([data])
+
+    def add_many(self, records):
+        """
+        Write records to ndjson file. This is faster than calling :meth:`add` for each record.
+
+        Records are serialised straight away so the caller can reuse or change them. The JSON
+        documents are held until `write_buffer_size` are waiting, or until the end of this call
+        when that is fewer than 1000 documents, and then written with one call.
+
+        @param records: (iterable of dict, Pinnate or Record) - must be safe to serialise to JSON
         """
         if self.access != AccessMode.WRITE:
             raise ValueError("Write attempted on dataset opened in READ mode.")
 
         self.connect()
 
-        if isinstance(data, dict):
-            self.writer.writerow(data)
-        elif isinstance(data, Pinnate):
-            self.writer.writerow(data.as_dict())
-        else:
-            raise ValueError("data isn't an accepted type. Only (dict) or (Pinnate) are accepted.")
+        # records from one call are batched even when `write_buffer_size` is small
+        batch_size = max(self.write_buffer_size, _ADD_MANY_BATCH)
+        dumps = self._json.dumps
+        write_buffer = self._write_buffer
+        for data in records:
+            if isinstance(data, dict):
+                write_buffer.append(dumps(data))
+            elif isinstance(data, (Pinnate, Record)):
+                write_buffer.append(dumps(data.as_dict()))
+            else:
+                msg = (
+                    "data isn't an accepted type. Only (dict), (Pinnate) or (Record) are accepted."
+                )
+                raise ValueError(msg)
+
+            if len(write_buffer) >= batch_size:
+                self._write_buffered()
+                write_buffer = self._write_buffer
+
+        if len(write_buffer) >= self.write_buffer_size:
+            self._write_buffered()
+
+    def flush(self):
+        """
+        Write buffered records and flush the file handle.
+        """
+        self._write_buffered()
+        if self.writer is not None:
+            self.writer.flush()
+
+    def _write_buffered(self):
+        "Write all the buffered records with one call."
+        if self._write_buffer:
+            self._write_buffer.append("")  # for the final newline
+            self.writer.write("\n".join(self._write_buffer))
+            self._write_buffer = []
+
+    def close_connection(self):
+        self._write_buffered()
+        super().close_connection()
@@ -3,104 +3,445 @@ Created on 4 Mar 2020
 
 @author: si
 """
+
 """
 Created on 14 Jan 2020
 
 @author: si
 """
 try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
     import pyarrow.parquet as pq
 except ModuleNotFoundError:
     pass
 
 import os
+import re
 
 from ayeaye.connectors.base import AccessMode, DataConnector, FilesystemEnginePattern
 from ayeaye.pinnate import Pinnate
+from ayeaye.record import Record, record_class
 
 
 class ParquetConnector(DataConnector):
     engine_type = "parquet://"
-    # engine_pattern_expander_cls = FilesystemEnginePattern
+    engine_pattern_expander_cls = FilesystemEnginePattern
+    optional_engine_url_args = ["filter"]
+    optional_args = {
+        "columns": None,
+        "filters": None,
+        "batch_size": 65536,
+        "schema": None,
+        "row_group_size": 65536,
+        "record_type": Pinnate,
+    }
+    preserve_callables = ["record_type"]
+
+    # operator -> (callable to filter rows, callable with (value, min, max) that is False when the
+    # row group's statistics show no rows can match)
+    # The row filter callable works with an array or a pyarrow.dataset expression.
+    filter_operators = {
+        "=": (lambda c, v: pc.equal(c, v), lambda v, lo, hi: lo <= v <= hi),
+        "==": (lambda c, v: pc.equal(c, v), lambda v, lo, hi: lo <= v <= hi),
+        "!=": (lambda c, v: pc.not_equal(c, v), lambda v, lo, hi: not (lo == hi == v)),
+        "<": (lambda c, v: pc.less(c, v), lambda v, lo, hi: lo < v),
+        "<=": (lambda c, v: pc.less_equal(c, v), lambda v, lo, hi: lo <= v),
+        ">": (lambda c, v: pc.greater(c, v), lambda v, lo, hi: hi > v),
+        ">=": (lambda c, v: pc.greater_equal(c, v), lambda v, lo, hi: hi >= v),
+        "in": (
+            lambda c, v: pc.is_in(c, value_set=pa.array(v)),
+            lambda v, lo, hi: any(lo <= x <= hi for x in v),
+        ),
+    }
+
+    # filter given in the engine_url. e.g. ;filter=year>=2020
+    url_filter_pattern = re.compile(r"^\s*([^<>=!]+?)\s*(==|!=|>=|<=|=|<|>)\s*(.*?)\s*$")
 
     def __init__(self, *args, **kwargs):
         """
-        Connector to Apache Parquet data files and (TODO) datasets.
+        Connector to Apache Parquet data files and datasets.
         See https://parquet.apache.org/
 
+        A dataset is a directory of parquet files. Sub-directories can be hive partitions.
+        e.g. /data/sales/year=2024/month=1/part-0.parquet
+
         Uses Apache arrow.
         See https://arrow.apache.org/docs/index.html
 
         WARNING this module is more experimental than you can possibly imagine.
 
+        Records are streamed from the file one batch at a time so the whole file isn't loaded
+        into memory.
+
         For args: @see :class:`connectors.base.DataConnector`
 
         additional args for ParquetConnector
-         None
+            columns (list of str) - just read these columns. Default is all columns.
+
+            filters (list of (column name, operator, value) tuples) - only yield rows matching
+                    all of these. Operators are =, ==, !=, <, <=, >, >= and 'in' (value is a list).
+                    Row groups are skipped when their statistics show no rows could match.
+                    e.g. filters=[("year", ">=", 2020), ("country", "in", ["UK", "FR"])]
+
+            batch_size (int) - maximum number of rows in each batch read from the file.
+
+            schema (:class:`pyarrow.Schema`) - used in WRITE mode. When not given it is inferred
+                    from the first row group.
+
+            row_group_size (int) - used in WRITE mode. Records passed to :meth:`add` and
+                    :meth:`add_batch` are buffered and written in row groups of this many rows.
+
+            record_type (class) - :class:`Pinnate` (default) or :class:`ayeaye.Record` for a
+                    compact, read only record that's built straight from the batch's columns.
 
         Connection information-
-            engine_url format is parquet://<filesystem absolute path>data.parquet
+            engine_url format is
+            parquet://<filesystem absolute path>data.parquet[;filter=<column><operator><value>]
+            or
+            parquet://<filesystem absolute path to dataset directory>[;filter=...]
+
+            `filter` can be repeated. All filters must match. Operators are as for `filters`
+            except 'in'. Values are cast to the column's type.
+            e.g. parquet:///data/sales;filter=year=2024;filter=month>=6
+
+            With a dataset, equality filters on hive partition keys are used to go straight to
+            the partition's directory so other partitions aren't listed or opened.
         """
+        self.parquet_file = None
+        self.row_groups = None
+        self.dataset = None
+        self.fragments = None
+        self.row_count = None
+        self.current_row = 0
+        self._active_filters = None  # `filters` + those from the engine_url
+
+        # WRITE mode
+        self._writer = None
+        self._pending_rows = []  # list of dict
+        self._pending_batches = []  # list of :class:`pyarrow.RecordBatch`
+        self._pending_count = 0
+
         super().__init__(*args, **kwargs)
 
-        self.table = None
-        self.row_count = None
+        for f in self.filters or []:
+            if len(f) != 3 or f[1] not in self.filter_operators:
+                raise ValueError(f"Unsupported filter: {f}")
 
-        if self.access != AccessMode.READ:
-            raise NotImplementedError("Write access not yet implemented")
+        if self.access not in [AccessMode.READ, AccessMode.WRITE]:
+            raise NotImplementedError("Read+Write access not yet implemented")
+
+    @property
+    def file_path(self):
+        """
+        @return: (str) filesystem path to file
+        """
+        engine_params = self.ignition._decode_filesystem_engine_url(
+            self.engine_url, optional_args=self.optional_engine_url_args
+        )
+        return engine_params.file_path
+
+    def _url_filters(self):
+        """
+        `filter` args can be repeated in the engine_url so they aren't in the usual engine params.
+
+        @return: list of (column name, operator, value as str)
+        """
+        url_filters = []
+        for url_arg in self.engine_url.split(";")[1:]:
+            arg_name, arg_value = url_arg.split("=", 1)
+            if arg_name != "filter":
+                continue
+
+            match = self.url_filter_pattern.match(arg_value)
+            if match is None:
+                raise ValueError(f"Unsupported filter: {arg_value}")
+            url_filters.append(match.groups())
+
+        return url_filters
+
+    def _build_filters(self, schema):
+        """
+        Combine the `filters` optional arg with filters from the engine_url. Values from the
+        engine_url are cast to the column's type in `schema`.
+
+        @return: list of (column name, operator, value)
+        """
+        active_filters = list(self.filters or [])
+        for column_name, operator, value in self._url_filters():
+            if column_name not in schema.names:
+                raise ValueError(f"Unknown column in filter: {column_name}")
+
+            column_type = schema.field(column_name).type
+            typed_value = pa.scalar(value).cast(column_type).as_py()
+            active_filters.append((column_name, operator, typed_value))
+
+        return active_filters
+
+    def _filter_expression(self):
+        """
+        @return: :class:`pyarrow.dataset.Expression` for all the active filters or None
+        """
+        expression = None
+        for column_name, operator, value in self._active_filters:
+            filter_rows, _ = self.filter_operators[operator]
+            f_expression = filter_rows(ds.field(column_name), value)
+            expression = f_expression if expression is None else expression & f_expression
+
+        return expression
+
+    def _partition_directory(self, dataset_path):
+        """
+        Follow hive partition directories (e.g. year=2024) that match equality filters.
+
+        @return: (str) directory that contains all the partitions that could match
+        """
+        equality_filters = [f for f in self.filters or [] if f[1] in ("=", "==")]
+        equality_filters += [f for f in self._url_filters() if f[1] in ("=", "==")]
+
+        partition_path = dataset_path
+        while equality_filters:
+            for f in equality_filters:
+                candidate = os.path.join(partition_path, f"{f[0]}={f[2]}")
+                if os.path.isdir(candidate):
+                    partition_path = candidate
+                    equality_filters.remove(f)
+                    break
+            else:
+                break
+
+        return partition_path
 
     def connect(self):
         super().connect()
-        if self.table is None:
-            engine_params = self.ignition._decode_filesystem_engine_url(self.engine_url)
-            file_path = engine_params.file_path
+        if self.access == AccessMode.WRITE:
+            # the pyarrow.parquet.ParquetWriter is created when the first row group is written
+            # as the schema could be inferred from the data.
+            return
+
+        if self.parquet_file is None and self.dataset is None:
+            file_path = self.file_path
+            self.current_row = 0
+
             if os.path.isdir(file_path):
-                raise NotImplementedError("Parquet datasets are not yet supported")
+                self.dataset = ds.dataset(
+                    self._partition_directory(file_path),
+                    format="parquet",
+                    partitioning="hive",
+                    partition_base_dir=file_path,
+                )
+                self._active_filters = self._build_filters(self.dataset.schema)
+                self.fragments = list(self.dataset.get_fragments(filter=self._filter_expression()))
+                self.row_count = sum(f.metadata.num_rows for f in self.fragments)
+                return
 
             if not os.path.isfile(file_path) or not os.access(file_path, os.R_OK):
                 raise ValueError(f"File '{file_path}' not readable")
 
-            self.table = pq.read_table(file_path)
-            self.row_count = self.table.num_rows
+            self.parquet_file = pq.ParquetFile(file_path)
+            self._active_filters = self._build_filters(self.parquet_file.schema_arrow)
+            self.row_groups = self._matching_row_groups()
+
+            metadata = self.parquet_file.metadata
+            self.row_count = sum(metadata.row_group(i).num_rows for i in self.row_groups)
 
     def close_connection(self):
         super().close_connection()
-        self.table = None
+        if self.access == AccessMode.WRITE:
+            self.flush()
+            if self._writer is None and self.schema is not None:
+                # nothing was added but there is enough to write an empty file
+                self._open_writer(self.schema)
+
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+        if self.parquet_file is not None:
+            self.parquet_file.close()
+        self.parquet_file = None
+        self.row_groups = None
+        self.dataset = None
+        self.fragments = None
         self.row_count = None
+        self._active_filters = None
+
+    def _matching_row_groups(self):
+        """
+        Use the min/max statistics for each row group to skip those that can't contain rows
+        matching the active filters.
+
+        @return: list of int - row group indexes
+        """
+        metadata = self.parquet_file.metadata
+        row_groups = []
+        for rg_idx in range(metadata.num_row_groups):
+            row_group = metadata.row_group(rg_idx)
+            column_stats = {}
+            for c_idx in range(row_group.num_columns):
+                column = row_group.column(c_idx)
+                column_stats[column.path_in_schema] = column.statistics
+
+            if all(self._may_match(f, column_stats.get(f[0])) for f in self._active_filters):
+                row_groups.append(rg_idx)
+
+        return row_groups
+
+    def _may_match(self, row_filter, statistics):
+        """
+        @return: bool - False when the statistics show no rows can match the filter
+        """
+        if statistics is None or not statistics.has_min_max:
+            return True
+
+        _column_name, operator, value = row_filter
+        _, stats_check = self.filter_operators[operator]
+        try:
+            return stats_check(value, statistics.min, statistics.max)
+        except TypeError:
+            # the statistic's python type isn't comparable to the filter value
+            return True
+
+    def iter_batches(self):
+        """
+        Generator yielding :class:`pyarrow.RecordBatch` objects with up to `self.batch_size` rows
+        from the `self.columns` columns and matching `self.filters` and filters in the
+        engine_url.
+
+        This is much faster than iterating Pinnate objects with :meth:`__iter__`. Use methods
+        such as `.to_pydict()` or `.column(..)` on each batch.
+        """
+        self.connect()
+
+        if self.dataset is not None:
+            yield from self._iter_dataset_batches()
+            return
+
+        active_filters = self._active_filters
+        columns = self.columns
+        read_columns = columns
+        if columns is not None and active_filters:
+            # columns needed to filter but not wanted in the output
+            read_columns = list(columns) + [f[0] for f in active_filters if f[0] not in columns]
+
+        if not self.row_groups:
+            return
+
+        for batch in self.parquet_file.iter_batches(
+            batch_size=self.batch_size,
+            row_groups=self.row_groups,
+            columns=read_columns,
+        ):
+            self.current_row += batch.num_rows
+
+            if active_filters:
+                mask = None
+                for column_name, operator, value in active_filters:
+                    filter_rows, _ = self.filter_operators[operator]
+                    f_mask = filter_rows(batch.column(column_name), value)
+                    mask = f_mask if mask is None else pc.and_kleene(mask, f_mask)
+
+                batch = batch.filter(mask)
+
+                if read_columns is not columns:
+                    batch = batch.select(columns)
+
+            yield batch
+
+    def _iter_dataset_batches(self):
+        """
+        Fragments (i.e. files) that can't match the filters have already been excluded in
+        :meth:`connect`. Pyarrow uses row group statistics within each fragment.
+        """
+        expression = self._filter_expression()
+        fragments_rows = 0
+        for fragment in self.fragments:
+            for batch in fragment.to_batches(
+                schema=self.dataset.schema,
+                columns=self.columns,
+                filter=expression,
+                batch_size=self.batch_size,
+            ):
+                self.current_row += batch.num_rows
+                yield batch
+
+            # rows not matching filters weren't yielded
+            fragments_rows += fragment.metadata.num_rows
+            self.current_row = fragments_rows
+
+    def _readable_dataset(self):
+        """
+        @return: (:class:`pyarrow.dataset.Dataset`) for the file or dataset directory
+        """
+        self.connect()
+        if self.dataset is not None:
+            return self.dataset
+
+        return ds.dataset(self.file_path, format="parquet")
 
     def __len__(self):
-        raise NotImplementedError("TODO")
+        """
+        Parquet files know how many rows they have so this is quick without filters. With filters
+        just the columns being filtered are read.
 
-    def __getitem__(self, key):
-        raise NotImplementedError("TODO")
+        @return: (int) number of rows matching the filters
+        """
+        if self.access != AccessMode.READ:
+            raise ValueError("Length is only available in READ mode")
 
-    def __iter__(self):
         self.connect()
+        if not self._active_filters:
+            return self.row_count
 
-        if self.row_count is None:
-            raise ValueError("Number of rows not loaded from source file")
+        return self._readable_dataset().count_rows(filter=self._filter_expression())
 
-        self.current_row = 0
-        for table_batch in self.table.to_batches():
-            big_chunk = table_batch.to_pydict()
-
-            # Check assumptions about chunks and relationship with tables....
-            #
-            # This is testing the assumption that each column has same number of rows.
-            # This probably needs to consider schema as fields presumably could be
-            # optional.
-            chunk_item_lengths = [len(c) for c in big_chunk.values()]
-            chunk_length = chunk_item_lengths[0]
-            for a_chunk_length in chunk_item_lengths:
-                if a_chunk_length != chunk_length:
-                    msg = "Unable to process tables with optional fields."
-                    raise NotImplementedError(msg)
-
-            # assumption: table rows could be split between batches
-            for current_index in range(chunk_length):
-                row_as_dict = {k: big_chunk[k][current_index] for k in big_chunk.keys()}
-                yield Pinnate(data=row_as_dict)
-                self.current_row += 1
+    def __getitem__(self, key):
+        """
+        Row groups (and files within a dataset) before the wanted rows are skipped using their
+        row counts.
+
+        @param key: (int or slice) position of row(s) after filtering
+        @return: :class:`Pinnate` for an int key or a list of :class:`Pinnate` for a slice
+        """
+        if self.access != AccessMode.READ:
+            raise ValueError("Records can only be accessed in READ mode")
+
+        row_count = len(self)
+        if isinstance(key, slice):
+            positions = range(*key.indices(row_count))
+        elif isinstance(key, int):
+            position = key + row_count if key < 0 else key
+            if not 0 <= position < row_count:
+                raise IndexError("Row index out of range")
+            positions = [position]
+        else:
+            raise TypeError("Rows can only be accessed with an int or a slice")
+
+        table = self._readable_dataset().take(
+            pa.array(positions, type=pa.int64()),
+            columns=self.columns,
+            filter=self._filter_expression(),
+        )
+        records = list(self._records(table))
+        return records if isinstance(key, slice) else records[0]
+
+    def _records(self, batch):
+        """
+        @param batch: (:class:`pyarrow.RecordBatch` or :class:`pyarrow.Table`)
+        @return: generator yielding a record (see `record_type`) for each row
+        """
+        if self.record_type is Record:
+            # one class for the whole batch and no intermediate dictionaries
+            make_record = record_class(tuple(batch.schema.names))._make
+            columns = [column.to_pylist() for column in batch.columns]
+            return map(make_record, zip(*columns))
+
+        return (self.record_type.wrap(row_as_dict) for row_as_dict in batch.to_pylist())
+
+    def __iter__(self):
+        for batch in self.iter_batches():
+            yield from self._records(batch)
 
         # reduce the number of open file handles when the whole file has been read
         self.close_connection()
@@ -109,16 +450,177 @@ class ParquetConnector(DataConnector):
     def data(self):
         raise NotImplementedError("TODO")
 
+    def add(self, data):
+        """
+        Buffer a record to write to the parquet file.
+
+        @param data: (dict, Pinnate or Record)
+        """
+        if self.access != AccessMode.WRITE:
+            raise ValueError("Write attempted on dataset opened in READ mode.")
+
+        if isinstance(data, dict):
+            self._pending_rows.append(data)
+        elif isinstance(data, (Pinnate, Record)):
+            self._pending_rows.append(data.as_dict())
+        else:
+            raise ValueError(
+                "data isn't an accepted type. Only (dict), (Pinnate) or (Record) are accepted."
+            )
+
+        self._pending_count += 1
+        if self._pending_count >= self.row_group_size:
+            self._write_row_groups(complete_only=True)
+
+    def add_batch(self, batch):
+        """
+        Buffer many records at once. This avoids the per-record cost of :meth:`add`.
+
+        @param batch: (:class:`pyarrow.RecordBatch`, :class:`pyarrow.Table` or dict with column
+            name as the key and a list of values as the value)
+        """
+        if self.access != AccessMode.WRITE:
+            raise ValueError("Write attempted on dataset opened in READ mode.")
+
+        if isinstance(batch, dict):
+            batch = pa.RecordBatch.from_pydict(batch, schema=self._write_schema)
+
+        if isinstance(batch, pa.Table):
+            batches = batch.to_batches()
+        elif isinstance(batch, pa.RecordBatch):
+            batches = [batch]
+        else:
+            raise ValueError("batch isn't an accepted type. See doc. string for accepted types.")
+
+        # keep the order that records were added
+        self._rows_to_batch()
+        self._pending_batches.extend(batches)
+        self._pending_count += sum(b.num_rows for b in batches)
+
+        if self._pending_count >= self.row_group_size:
+            self._write_row_groups(complete_only=True)
+
+    @property
+    def _write_schema(self):
+        """
+        @return: (:class:`pyarrow.Schema`) or None if it will be inferred from the data
+        """
+        if self._writer is not None:
+            return self._writer.schema
+        return self.schema
+
+    def _rows_to_batch(self):
+        "Move records given to :meth:`add` to the list of pending batches."
+        if self._pending_rows:
+            schema = self._write_schema
+            if schema is None:
+                # `from_pylist` would only use the first record's fields
+                field_names = dict.fromkeys(k for row in self._pending_rows for k in row)
+                columns = {f: [row.get(f) for row in self._pending_rows] for f in field_names}
+                batch = pa.RecordBatch.from_pydict(columns)
+            else:
+                batch = pa.RecordBatch.from_pylist(self._pending_rows, schema=schema)
+            self._pending_batches.append(batch)
+            self._pending_rows = []
+
+    def _open_writer(self, schema):
+        file_dir = os.path.dirname(self.file_path)
+        if file_dir and not os.path.exists(file_dir):
+            os.makedirs(file_dir)
+
+        self._writer = pq.ParquetWriter(self.file_path, schema)
+
+    def flush(self):
+        """
+        Write buffered records to the parquet file. This happens automatically when there are
+        `row_group_size` records buffered and when the connection is closed.
+        """
+        if self.access == AccessMode.WRITE:
+            self._write_row_groups(complete_only=False)
+
+    def _write_row_groups(self, complete_only):
+        """
+        @param complete_only: (bool) just write whole row groups, the remainder stays buffered.
+        """
+        self._rows_to_batch()
+        if not self._pending_batches:
+            return
+
+        schema = self._write_schema
+        if schema is None:
+            # until the writer is open each pending batch has the schema inferred from it's own
+            # data. e.g. a column that is all None is null typed in one batch and int64 in the next.
+            schema = _unify_schemas([batch.schema for batch in self._pending_batches])
+
+        table = pa.Table.from_batches(
+            [_conform_batch(b, schema) for b in self._pending_batches], schema=schema
+        )
+        if self._writer is None:
+            self._open_writer(schema)
+
+        write_rows = table.num_rows
+        if complete_only:
+            write_rows -= write_rows % self.row_group_size
+
+        self._writer.write_table(table.slice(0, write_rows), row_group_size=self.row_group_size)
+
+        remainder = table.slice(write_rows)
+        self._pending_batches = remainder.to_batches() if remainder.num_rows else []
+        self._pending_count = remainder.num_rows
+
     def as_pandas(self):
         """
         @return: (Pandas dataframe)
         """
         self.connect()
-        return self.table.to_pandas()
+        if self.dataset is not None:
+            table = self.dataset.to_table(columns=self.columns, filter=self._filter_expression())
+        elif self._active_filters:
+            schema = self.parquet_file.schema_arrow
+            if self.columns is not None:
+                schema = pa.schema([schema.field(c) for c in self.columns])
+            table = pa.Table.from_batches(list(self.iter_batches()), schema=schema)
+        else:
+            table = self.parquet_file.read(columns=self.columns, use_pandas_metadata=True)
+
+        return table.to_pandas()
 
     @property
     def progress(self):
-        if self.access != AccessMode.READ or self.row_count is None or self.current_row == 0:
+        if self.access != AccessMode.READ or not self.row_count or self.current_row == 0:
             return None
 
-        return self.current_row / self.file_size
+        return self.current_row / self.row_count
+
+
+def _unify_schemas(schemas):
+    """
+    @param schemas: (list of :class:`pyarrow.Schema`)
+    @return: (:class:`pyarrow.Schema`) with all the fields. Types are promoted where pyarrow can
+        (e.g. int64 to double). Before pyarrow 14 only null typed fields are promoted.
+    """
+    try:
+        return pa.unify_schemas(schemas, promote_options="permissive")
+    except TypeError:
+        # `promote_options` was added in pyarrow 14
+        return pa.unify_schemas(schemas)
+
+
+def _conform_batch(batch, schema):
+    """
+    @param batch: (:class:`pyarrow.RecordBatch`)
+    @param schema: (:class:`pyarrow.Schema`) to write. Columns in `batch` are cast to it's types,
+        missing columns are null and columns not in the schema are dropped.
+    @return: (:class:`pyarrow.RecordBatch`)
+    """
+    if batch.schema.equals(schema):
+        return batch
+
+    columns = []
+    for field in schema:
+        if field.name in batch.schema.names:
+            columns.append(batch.column(field.name).cast(field.type))
+        else:
+            columns.append(pa.nulls(batch.num_rows, type=field.type))
+
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
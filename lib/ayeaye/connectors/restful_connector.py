@@ -23,6 +23,8 @@ class RestfulConnector(DataConnector):
         "headers": None,
         "keep_alive": True,  # http 1.1 mode is the default
     }
+    # the keep alive session doesn't depend on the previous request
+    connection_reusable = True
 
     class RawData:
         """
@@ -234,7 +236,7 @@ class RestfulConnector(DataConnector):
         if return_format == "native":
             serialised_request = r.json()
         elif return_format == "pinnate":
-            serialised_request = Pinnate(r.json())
+            serialised_request = Pinnate.wrap(r.json())
         elif return_format == "raw":
             serialised_request = r.text
         else:
@@ -313,7 +315,7 @@ class RestfulConnector(DataConnector):
             # r.text could contain something but probably empty
             return None
 
-        serialised_request = Pinnate(reply_doc)
+        serialised_request = Pinnate.wrap(reply_doc)
         return serialised_request
 
     def patch(self, url, data):
@@ -354,7 +356,7 @@ class RestfulConnector(DataConnector):
             # r.text could contain something but probably empty
             return None
 
-        serialised_request = Pinnate(reply_doc)
+        serialised_request = Pinnate.wrap(reply_doc)
         return serialised_request
 
     def delete(self, url):
@@ -388,7 +390,7 @@ class RestfulConnector(DataConnector):
             # r.text could contain something but probably empty
             return None
 
-        serialised_request = Pinnate(reply_doc)
+        serialised_request = Pinnate.wrap(reply_doc)
         return serialised_request
 
     def _post_request_checks(self, r):
@@ -78,6 +78,11 @@ class SqlAlchemyDatabaseConnector(DataConnector):
         # self.schema_builder is built by init from the optional args
         self._schema_p = None  # see :meth:`connect`
 
+    @property
+    def connection_reusable(self):
+        "Sessions used to write are closed after each sub-task so uncommitted changes aren't kept."
+        return self.access == AccessMode.READ
+
     def connect(self):
         super().connect()
         if self.Base is not None:
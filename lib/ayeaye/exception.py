@@ -39,10 +39,21 @@ class SubTaskFailed(Exception):
         failed_cls_name = task_fail_message.model_class_name
         msg = (
             f"Subtask failed. '{failed_cls_name}.{task_fail_message.method_name}' raised an "
-            f"{task_fail_message.exception_class_name} exception."
+            f"{task_fail_message.exception_class_name} exception"
         )
+        if task_fail_message.attempt > 1:
+            msg += f" on attempt {task_fail_message.attempt}"
+        msg += "."
         trace_str = "\n".join(task_fail_message.traceback)
         msg = msg + "\n" + trace_str
 
         super().__init__(msg)
         self.task_fail_message = task_fail_message
+
+
+class WorkerProcessExited(Exception):
+    """
+    A local worker process running a sub-task exited before the sub-task finished. e.g. it was
+    killed by the operating system. The sub-task is reported with a
+    :class:`ayeaye.runtime.task_message.TaskFailed` message naming this exception.
+    """
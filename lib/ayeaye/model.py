@@ -1,14 +1,18 @@
 from collections import namedtuple, defaultdict
 from datetime import datetime
 from enum import Enum
+from threading import Lock
 from time import time
+import uuid
 
 import ayeaye
 from ayeaye.exception import SubTaskFailed
 from ayeaye.connectors.base import DataConnector
 from ayeaye.connect_resolve import connector_resolver
 from ayeaye.runtime.knowledge import RuntimeKnowledge
+from ayeaye.runtime.async_pool import LocalAsyncPool
 from ayeaye.runtime.multiprocess import LocalProcessPool
+from ayeaye.runtime.thread_pool import LocalThreadPool
 from ayeaye.runtime.task_message import TaskComplete, TaskFailed, TaskLogMessage, TaskPartition
 from ayeaye.ignition import EngineUrlCase, EngineUrlStatus
 
@@ -194,12 +198,17 @@ class Model:
 
         return datasets
 
-    def close_datasets(self):
+    def close_datasets(self, keep_reusable=False):
         """
         Call :meth:`close_connection` on all datasets.
+
+        @param keep_reusable: (bool) leave datasets with a `connection_reusable` connection (e.g.
+            a database session) open. Used between sub-tasks run by the same model instance.
         """
 
         for dataset_connection in self.open_datasets().values():
+            if keep_reusable and dataset_connection.connection_reusable:
+                continue
             dataset_connection.close_connection()
 
     def set_logger(self, logger):
@@ -341,7 +350,8 @@ class PartitionedModel(Model):
     on the tasks the model divides itself into.
 
     The executor is responsible for re-executing failed tasks. All sub-tasks should be idempotent and
-    therefore safe to execute multiple times, possibly in parallel.
+    therefore safe to execute multiple times, possibly in parallel. :class:`LocalProcessPool` retries
+    failed sub-tasks when it's given `max_attempts`.
 
     It works as follows-
 
@@ -378,8 +388,9 @@ class PartitionedModel(Model):
     (e.g. method names and sub-task arguments) or is a generator. Each sub-task is passed by the executor to an
     instance of the model that has been instantiated with the same resolver context (see
     :class:`ConnectorResolver`) as the 'parent' model. The models running in the worker processes
-    are initiated when the worker process starts, i.e. each instance will have it's sub-task method
-    called multiple times. See :meth:`partition_initialise`.
+    can be kept between sub-tasks, i.e. an instance could have it's sub-task method called
+    multiple times. See :meth:`partition_initialise` and `model_cache_size` and `chunk_size` in
+    :class:`ayeaye.runtime.multiprocess.LocalProcessPool`.
 
     6. The return value from each subtask is passed to (optionally overridden)
     :meth:`partition_subtask_complete` on the parent instance.
@@ -387,11 +398,24 @@ class PartitionedModel(Model):
     7. When the executor is satisfied that all sub-tasks are complete the optional
     :meth:`partition_complete` method is called on the parent instance.
 
+    A run that ends part way through (e.g. the machine was restarted) can be resumed when the model
+    has a `checkpoint` (@see :class:`ayeaye.runtime.checkpoint.SqliteCheckpoint`). Sub-tasks in
+    the checkpoint aren't run again; their stored :class:`TaskComplete` messages are passed to
+    :meth:`partition_subtask_complete` as the sub-tasks are read from :meth:`partition_slice`. The
+    checkpoint is cleared when the run finishes. Sub-tasks are only recorded when the pool copies
+    `TaskPartition.task_id` to the :class:`TaskComplete` it yields, as the built in pools do.
+
     """
 
-    # Start simple, this will no doubt increase in flexibility. Each are an integer suggesting
-    # how many sub-tasks the execution could be split into.
-    PartitionOption = namedtuple("PartitionOption", ("minimum", "maximum", "optimal"))
+    # Start simple, this will no doubt increase in flexibility. The first three are an integer
+    # suggesting how many sub-tasks the execution could be split into. `worker_type` is "process",
+    # "thread" or "async". `task_memory` is the estimated bytes needed by each running sub-task.
+    # @see :meth:`partition_plea`
+    PartitionOption = namedtuple(
+        "PartitionOption",
+        ("minimum", "maximum", "optimal", "worker_type", "task_memory"),
+        defaults=("process", None),
+    )
 
     def __init__(self):
         super().__init__()
@@ -402,6 +426,10 @@ class PartitionedModel(Model):
         # lazy / injectable
         self._process_pool = None
 
+        # optional :class:`ayeaye.runtime.checkpoint.AbstractCheckpoint`. Sub-tasks completed by an
+        # earlier run that didn't finish are skipped.
+        self.checkpoint = None
+
     @property
     def process_pool(self):
         """
@@ -409,12 +437,18 @@ class PartitionedModel(Model):
 
         The It's used to change how subtasks are run. The default is to use :class:`LocalProcessPool`
         which uses multiple :class:`multiprocessing.Process`es but a distributed pool could be used
-        instead.
+        instead. :class:`ayeaye.runtime.thread_pool.LocalThreadPool` and
+        :class:`ayeaye.runtime.async_pool.LocalAsyncPool` are for I/O bound sub-tasks. A persistent
+        :class:`LocalProcessPool` given to :meth:`LocalProcessPool.make_shared` is used by all
+        models without their own pool.
         see Fossa repo :class:`fossa.control.rabbit_mq.message_exchange` for another
         example.
 
         @return: subclass of :class:`ayeaye.runtime.multiprocess.AbstractProcessPool`
         """
+        if self._process_pool is None:
+            self._process_pool = LocalProcessPool.shared()
+
         if self._process_pool is None:
             # default behaviour is to run subtasks in separate local processes
             self._process_pool = LocalProcessPool(max_processes=self.runtime.max_concurrent_tasks)
@@ -471,6 +505,18 @@ class PartitionedModel(Model):
         as this is a reasonable parallel work load for a typical task which consumes a balance of
         IO and CPU on either a modern machine or in a distributed setup.
 
+        Sub-tasks that mostly wait for I/O (e.g. calls to a REST API) can be run in threads instead
+        of processes with `worker_type="thread"`. Or, for `async def` sub-task methods, run
+        concurrently in an event loop with `worker_type="async"`. This is used when the model
+        hasn't been given a :attr:`process_pool`. The number of threads or concurrent sub-tasks
+        isn't limited by the number of CPUs. @see
+        :class:`ayeaye.runtime.thread_pool.LocalThreadPool` and
+        :class:`ayeaye.runtime.async_pool.LocalAsyncPool`
+
+        Sub-tasks that need a lot of memory can give an estimate of the bytes each one needs with
+        `task_memory`. The number of workers is then limited to the number of sub-tasks that fit in
+        the available memory (@see :meth:`RuntimeKnowledge.max_tasks_for_memory`).
+
         Also @see :class:`ayeaye.runtime.knowledge.RuntimeKnowledge` which will impose resource
         limits when running processes locally.
 
@@ -490,7 +536,9 @@ class PartitionedModel(Model):
         Slightly more flexible than returning tuples to describe sub-tasks is to use
         :class`TaskPartition` objects. This class can be used to specify another class for the model
         (i.e. something other than `self.__class__`. And other sets of keyword arguments can be
-        specified. e.g. model or partition initialisation parameters.
+        specified. e.g. model or partition initialisation parameters. Giving each one an estimated
+        `cost` (e.g. the number of bytes it will read) runs the largest sub-tasks first so one big
+        sub-task isn't left running on its own at the end.
 
         The number of sub-tasks returned doesn't need to relate to the number of partitions
         (`partition_count`). This is because each worker could execute zero or more sub-tasks.
@@ -561,9 +609,28 @@ class PartitionedModel(Model):
         assert partition_option.minimum > 0, msg
         assert partition_option.minimum <= partition_option.maximum, msg
 
+        if self._process_pool is None and partition_option.worker_type == "thread":
+            self._process_pool = LocalThreadPool(max_threads=partition_option.maximum)
+        elif self._process_pool is None and partition_option.worker_type == "async":
+            self._process_pool = LocalAsyncPool(max_concurrent=partition_option.maximum)
+
         # this should be in lock-step with the default LocalProcessPool and other pools do their
         # own thing.
         max_workers = self.runtime.max_concurrent_tasks
+        if isinstance(self.process_pool, LocalProcessPool):
+            # could be a shared pool with fewer workers
+            max_workers = min(max_workers, self.process_pool.max_processes)
+        elif isinstance(self.process_pool, LocalThreadPool):
+            # threads waiting for I/O aren't limited by the number of CPUs
+            max_workers = self.process_pool.max_threads
+        elif isinstance(self.process_pool, LocalAsyncPool):
+            max_workers = self.process_pool.max_concurrent
+
+        if partition_option.task_memory:
+            memory_workers = self.runtime.max_tasks_for_memory(partition_option.task_memory)
+            if memory_workers is not None and memory_workers < max_workers:
+                self.log(f"Available memory limits the number of workers to {memory_workers}")
+                max_workers = memory_workers
 
         workers_count = partition_option.minimum
         if partition_option.optimal < max_workers:
@@ -575,7 +642,12 @@ class PartitionedModel(Model):
             workers_count = partition_option.maximum
 
         # workers_count =  1
-        self.log(f"Using {workers_count} worker processes")
+        if isinstance(self.process_pool, LocalThreadPool):
+            self.log(f"Using {workers_count} worker threads")
+        elif isinstance(self.process_pool, LocalAsyncPool):
+            self.log(f"Running up to {workers_count} sub-tasks concurrently")
+        else:
+            self.log(f"Using {workers_count} worker processes")
 
         self.build()
 
@@ -604,6 +676,10 @@ class PartitionedModel(Model):
                     )
                     task_definitions.append(tp)
 
+            if any(t.cost is not None for t in task_definitions):
+                # largest first so the last sub-tasks to finish are small ones
+                task_definitions.sort(key=lambda t: t.cost or 0, reverse=True)
+
             def _sub_tasks_iterator():
                 "Convert list into an iterator"
                 yield from task_definitions
@@ -617,10 +693,39 @@ class PartitionedModel(Model):
         else:
             raise ValueError("tasks returned from `partition_slice` isn't an obvious iterator")
 
-        if workers_count == 1:
+        subtasks_complete = 0
+        # The sub-tasks iterator can be read by a pool's thread and :meth:`partition_subtask_complete`
+        # is called by that thread for sub-tasks in the checkpoint. One call at a time.
+        subtask_complete_lock = Lock()
+
+        def subtask_complete(task_message):
+            nonlocal subtasks_complete
+            with subtask_complete_lock:
+                self.partition_subtask_complete(task_message=task_message)
+                subtasks_complete += 1
+
+                if subtasks_count is not None:
+                    self.log_progress(subtasks_complete / subtasks_count)
+
+        # task_id -> :class:`TaskPartition` for sub-tasks that are running and not in the
+        # checkpoint. Those that are in it aren't given to the pool.
+        checkpoint_pending = {}
+        if self.checkpoint is not None:
+            sub_tasks_iterator = self._checkpointed_sub_tasks(
+                sub_tasks_iterator, checkpoint_pending, subtask_complete
+            )
+
+        def checkpoint_finished(task_message):
+            "Record a :class:`TaskComplete` from this run. Replayed messages aren't pending."
+            task_partition = checkpoint_pending.pop(task_message.task_id, None)
+            if task_partition is not None and isinstance(task_message, TaskComplete):
+                self.checkpoint.record(task_partition, task_message)
+
+        if workers_count == 1 and not isinstance(self.process_pool, LocalAsyncPool):
             # don't use the process pool as only one worker is available. There might be many
             # tasks so do these in serial.
             # this mode is useful for unittests as Multiprocess can confuse things
+            # The async pool is still used as the sub-task methods need an event loop.
             self.log(f"Running single sub-task within main process")
 
             # simplified verion of what happens in ProcessPool.
@@ -630,47 +735,44 @@ class PartitionedModel(Model):
             self.runtime.worker_id = 0
             self.runtime.total_workers = 1
 
-            subtasks_complete = 0
             for task in sub_tasks_iterator:
-
                 resolver_context = None
                 if task.additional_context:
                     # this will be overlaid onto any context that is already in play
                     resolver_context = connector_resolver.context(**task.additional_context)
                     resolver_context.start()
 
-                # re-create self as a new instance model. This keeps single process mode insync
-                # with the `process_pool` mode.
-                m = task.model_cls(**task.model_construction_kwargs)
+                try:
+                    # re-create self as a new instance model. This keeps single process mode insync
+                    # with the `process_pool` mode.
+                    m = task.model_cls(**task.model_construction_kwargs)
 
-                # it's running in the same process as self so share logging
-                m.log_to_stdout = self.log_to_stdout
-                m.external_loggers = self.external_loggers
+                    # it's running in the same process as self so share logging
+                    m.log_to_stdout = self.log_to_stdout
+                    m.external_loggers = self.external_loggers
 
-                m.partition_initialise(**task.partition_initialise_kwargs)
+                    m.partition_initialise(**task.partition_initialise_kwargs)
 
-                sub_task_method = getattr(m, task.method_name)
-                subtask_return_value = sub_task_method(**task.method_kwargs)
-                subtasks_complete += 1
+                    sub_task_method = getattr(m, task.method_name)
+                    subtask_return_value = sub_task_method(**task.method_kwargs)
 
-                m.close_datasets()
+                    m.close_datasets()
+                finally:
+                    # a failed run shouldn't leave the sub-task's context on the resolver
+                    if resolver_context is not None:
+                        resolver_context.finish()
 
                 task_message = TaskComplete(
                     model_cls_name=task.model_cls.__name__,
                     method_name=task.method_name,
                     method_kwargs=task.method_kwargs,
                     return_value=subtask_return_value,
+                    task_id=task.task_id,
                 )
-                self.partition_subtask_complete(task_message=task_message)
-
-                if resolver_context is not None:
-                    resolver_context.finish()
-
-                if subtasks_count is not None:
-                    self.log_progress(subtasks_complete / subtasks_count)
+                checkpoint_finished(task_message)
+                subtask_complete(task_message)
 
         else:
-            subtasks_complete = 0
             subtask_kwargs = {
                 "sub_tasks": sub_tasks_iterator,
                 "context_kwargs": active_context["mapper"],
@@ -679,20 +781,19 @@ class PartitionedModel(Model):
 
             for subtask_message in self.process_pool.run_subtasks(**subtask_kwargs):
                 if isinstance(subtask_message, TaskComplete):
-                    self.partition_subtask_complete(task_message=subtask_message)
-                    subtasks_complete += 1
-
-                    if subtasks_count is not None:
-                        self.log_progress(subtasks_complete / subtasks_count)
+                    checkpoint_finished(subtask_message)
+                    subtask_complete(subtask_message)
 
                 elif isinstance(subtask_message, TaskFailed):
-                    subtasks_complete += 1
+                    checkpoint_finished(subtask_message)
+                    with subtask_complete_lock:
+                        subtasks_complete += 1
 
-                    # The failure could be handled by the model. Default behaviour in
-                    # :meth:`PartitionedModel.partition_subtask_complete` is to raise this as an
-                    # exception
-                    # for now, throw an error
-                    self.partition_subtask_failed(task_message=subtask_message)
+                        # The failure could be handled by the model. Default behaviour in
+                        # :meth:`PartitionedModel.partition_subtask_complete` is to raise this as an
+                        # exception
+                        # for now, throw an error
+                        self.partition_subtask_failed(task_message=subtask_message)
 
                 elif isinstance(subtask_message, TaskLogMessage):
                     # TODO structured logging to separate and de-dupe fields like the date
@@ -700,4 +801,37 @@ class PartitionedModel(Model):
                 else:
                     raise ValueError("Undefined message type received")
 
+            if isinstance(self.process_pool, LocalProcessPool):
+                for worker_report in self.process_pool.utilisation_report():
+                    self.log(worker_report)
+
         self.partition_complete()
+
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
+
+    def _checkpointed_sub_tasks(self, sub_tasks, pending, replay):
+        """
+        Generator yielding the sub-tasks that aren't in `self.checkpoint`. The stored
+        :class:`TaskComplete` of those that are is passed to `replay` when they are read, in the
+        thread reading this, so it doesn't wait for messages from the pool.
+
+        @param sub_tasks: iterator of :class:`TaskPartition`
+        @param pending: (dict) each sub-task that is yielded is added with it's `task_id` as the
+            key. A `task_id` is given to sub-tasks without one.
+        @param replay: (callable) given each stored :class:`TaskComplete`
+        """
+        skipped = 0
+        for task in sub_tasks:
+            task_complete = self.checkpoint.completed(task)
+            if task_complete is None:
+                if task.task_id is None:
+                    task.task_id = uuid.uuid4().hex
+                pending[task.task_id] = task
+                yield task
+            else:
+                skipped += 1
+                replay(task_complete)
+
+        if skipped:
+            self.log(f"Skipped {skipped} sub-tasks completed by an earlier run")
@@ -25,20 +25,59 @@ class Pinnate:
     3
     """
 
-    def __init__(self, data=None):
+    # attributes of the Pinnate object itself, everything else is in the payload
+    _internal_attrs = ("_attr", "_wrapped", "_adopted")
+
+    def __init__(self, data=None, eager=True):
         """
         :param data: mixed
             can be dictionary or list or set or dictionary/list encoded in json or instance of Pinnate
+        :param eager: bool
+            True (default) - nested dictionaries are copied into Pinnate objects now.
+            False - the dictionary, list or set is used as the payload without being copied or
+            walked. @see :meth:`wrap`
         """
         # this is the 'payload', it's type is decided on first use. It's typically a dictionary because
         # the attribute nature of Pinnate is the most useful feature. It can also be a list or set.
         self._attr = None
 
+        # key -> value from the payload wrapped for attribute access. Built on first access and
+        # discarded when the key is set. @see :meth:`__getattr__`
+        self._wrapped = {}
+
+        # the payload is the caller's data structure and only holds native python types
+        self._adopted = False
+
         if isinstance(data, self.__class__):
             self._attr = data._attr
+            self._wrapped = data._wrapped
+            self._adopted = data._adopted
+        elif not eager and data is not None:
+            if isinstance(data, str):
+                data = json.loads(data)
+
+            if not isinstance(data, (dict, list, set)):
+                raise TypeError("Unsupported type")
+
+            self._attr = data
+            self._adopted = True
         elif data:
             self.load(data)
 
+    @classmethod
+    def wrap(cls, data):
+        """
+        Fast construction from native python types, e.g. a record just decoded from a file.
+
+        `data` isn't copied so changes made through the Pinnate are made to `data`. Nested
+        dictionaries are wrapped when they are first accessed. :meth:`as_dict` and
+        :meth:`as_native` return `data` itself.
+
+        @param data: (dict, list, set or json string)
+        @return: Pinnate
+        """
+        return cls(data, eager=False)
+
     @property
     def payload_undefined(self):
         """
@@ -84,8 +123,15 @@ class Pinnate:
             raise TypeError("Payload data hasn't been set")
 
         if self.is_payload(dict):
+            if self._adopted:
+                # nested dictionaries as Pinnate objects, the same as an eager Pinnate
+                return [self[k] for k in self._attr]
+
             return self._attr.values()
 
+        if self.is_payload(list) and self._adopted:
+            return [self[i] for i in range(len(self._attr))]
+
         if self.is_payload(list, set):
             return self._attr
 
@@ -95,6 +141,10 @@ class Pinnate:
         if self.payload_undefined or not self.is_payload(dict):
             raise TypeError("Payload data isn't a dictionary")
 
+        if self._adopted:
+            # nested dictionaries as Pinnate objects, the same as an eager Pinnate
+            return [(k, self[k]) for k in self._attr]
+
         return self._attr.items()
 
     def __contains__(self, key):
@@ -112,10 +162,18 @@ class Pinnate:
 
         For lists and sets the generator yields each item. For dictionaries it yield (key, value)
         """
+        if self.is_payload(list) and self._adopted:
+            # dictionaries as Pinnate objects, the same as an eager Pinnate
+            return iter([self[i] for i in range(len(self._attr))])
+
         if self.is_payload(set, list):
             return iter(self._attr)
 
         if self.is_payload(dict):
+            if self._adopted:
+                # nested dictionaries as Pinnate objects, the same as an eager Pinnate
+                return iter([(k, self[k]) for k in self._attr])
+
             as_key_pairs = [(k, v) for k, v in self._attr.items()]
             return iter(as_key_pairs)
 
@@ -127,6 +185,9 @@ class Pinnate:
         if not self.is_payload(dict):
             raise TypeError(f"as_dict() can only be called when the payload data is a dictionary")
 
+        if self._adopted and select_fields is None:
+            return self._attr
+
         if select_fields is not None:
             r = {}
             for k in select_fields:
@@ -151,6 +212,9 @@ class Pinnate:
         if self.payload_undefined:
             return None
 
+        if self._adopted:
+            return self._attr
+
         if self.is_payload(dict):
             return self.as_dict()
 
@@ -178,60 +242,88 @@ class Pinnate:
         return json.dumps(self.as_native(*args, **kwargs), default=str)
 
     def __getattr__(self, attr):
+        if attr in self._internal_attrs:
+            # not yet set. e.g. during unpickling
+            raise AttributeError(attr)
+
+        wrapped = self._wrapped.get(attr)
+        if wrapped is not None:
+            if not isinstance(wrapped, _PinnateList) or wrapped.is_view_of(self._attr.get(attr)):
+                return wrapped
+
         if attr not in self._attr:
             raise AttributeError(
                 "{} instance has no attribute '{}'".format(self.__class__.__name__, attr)
             )
-        if isinstance(self._attr[attr], list):
-
-            def list_recurse(item):
-                r = []
-                for s in item:
-                    if isinstance(s, dict):
-                        r.append(self.__class__(s))
-                    elif isinstance(s, list):
-                        r.append(list_recurse(s))
-                    else:
-                        r.append(s)
-                return r
-
-            return list_recurse(self._attr[attr])
-
-        elif isinstance(self._attr[attr], dict):
-            return self.__class__(self._attr[attr])
+
+        value = self._attr[attr]
+        if isinstance(value, list):
+            # a view of the payload's list so changes made through it (e.g. `append`) are kept
+            wrapped = _PinnateList(value, self.__class__)
+        elif isinstance(value, dict):
+            # adopted, not copied, so changes made through it are made to the payload
+            wrapped = self.__class__(value, eager=False)
         else:
-            return self._attr[attr]
+            return value
+
+        # lists and dictionaries are wrapped once, not on every access
+        self._wrapped[attr] = wrapped
+        return wrapped
 
     def __setattr__(self, attr, val):
-        super(Pinnate, self).__setattr__(attr, val)
-        if attr != "_attr":
-            if self.payload_undefined:
-                self._attr = {}
+        if attr in self._internal_attrs:
+            super(Pinnate, self).__setattr__(attr, val)
+            return
 
-            self._attr[attr] = val
+        # payload values aren't instance attributes so :meth:`__getattr__` always sees the
+        # current value
+        self[attr] = val
 
     def __getitem__(self, key):
-        return self._attr[key]
+        if self._adopted and isinstance(key, slice) and self.is_payload(list):
+            return [self[i] for i in range(*key.indices(len(self._attr)))]
+
+        value = self._attr[key]
+        if self._adopted and isinstance(value, dict):
+            # nested dictionaries in an eager Pinnate are already Pinnate objects.
+            # An item in a list payload could have been moved so the wrapper is checked.
+            wrapped = self._wrapped.get(key)
+            if wrapped is None or wrapped._attr is not value:
+                wrapped = self._wrapped[key] = self.__class__(value, eager=False)
+            return wrapped
+
+        return value
 
     def __setitem__(self, key, value):
         if self.payload_undefined:
             # if key is an integer the datatype *could* also be list
             self._attr = {}
 
+        if self._adopted and isinstance(value, self.__class__):
+            value = value.as_native()
+        elif isinstance(value, _PinnateList):
+            value = value.native
+
         self._attr[key] = value
+        self._wrapped.pop(key, None)
 
-    def __getstate__(self):
+    def __reduce__(self):
         """
-        For serialise/pickle
+        For serialise/pickle.
+
+        The payload is pickled as it is. Nested Pinnate objects are pickled in the same way so
+        nothing is copied to native types before pickling or re-wrapped when unpickling. Cached
+        wrappers from :meth:`__getattr__` aren't pickled.
         """
-        # 'pinnate_data' is a namespace to avoid None requiring :meth:`new`
-        return {"pinnate_data": self.as_native()}
+        return (_restore_pinnate, (self.__class__, self._attr, self._adopted))
 
     def __setstate__(self, state):
         """
-        For serialise/pickle
+        For unpickling data pickled before :meth:`__reduce__` was added.
         """
         self._attr = None
+        self._wrapped = {}
+        self._adopted = False
 
         # None shouldn't be passed to :meth:`load` as per constructor. It needs to be handled
         # like this otherwise pickle doesn't call :meth:`__setstate__`
@@ -286,8 +378,21 @@ class Pinnate:
             )
             raise TypeError(msg)
 
-        if self.is_payload(dict):
+        if self._adopted:
+            # payload stays as native types, nested values are wrapped when accessed
+            if self.is_payload(dict):
+                for k, v in data.items():
+                    self[k] = v
+            else:
+                native = [v.as_native() if isinstance(v, self.__class__) else v for v in data]
+                if self.is_payload(list):
+                    self._attr.extend(native)
+                else:
+                    self._attr.update(native)
+
+        elif self.is_payload(dict):
             for k, v in data.items():
+                self._wrapped.pop(k, None)
                 if isinstance(v, dict):
                     self._attr[k] = Pinnate(v)
                 else:
@@ -318,3 +423,160 @@ class Pinnate:
         Can be used to add item when the payload is a list.
         """
         self.update(set([item]))
+
+
+class _PinnateList(list):
+    """
+    List in a :class:`Pinnate`'s payload as seen through attribute access.
+
+    It's a list of the payload list's items. Dictionaries are wrapped in :class:`Pinnate` objects
+    when they are read. Changes are made to this and to the payload's list so they are kept.
+    Items are stored as native types. Changes made to the payload's list without going through
+    this aren't seen when the list is the same length, @see :meth:`is_view_of`.
+    """
+
+    def __init__(self, items, pinnate_cls):
+        """
+        @param items: (list) from the payload
+        @param pinnate_cls: (class) :class:`Pinnate` or subclass to wrap dictionaries with
+        """
+        super().__init__(items)
+        self._items = items
+        self._pinnate_cls = pinnate_cls
+
+        # index -> (item, wrapper) for dictionaries and lists that have been read
+        self._wrapped = {}
+
+    @property
+    def native(self):
+        "@return: (list) the payload's list"
+        return self._items
+
+    def is_view_of(self, items):
+        """
+        @param items: (list) from a payload
+        @return: (bool) this can still be used for `items`
+        """
+        return items is self._items and len(items) == list.__len__(self)
+
+    def _native(self, value):
+        if isinstance(value, self._pinnate_cls):
+            return value.as_native()
+        if isinstance(value, _PinnateList):
+            return value.native
+        return value
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        item = list.__getitem__(self, index)
+        if not isinstance(item, (dict, list)):
+            return item
+
+        if index < 0:
+            index += len(self)
+
+        cached = self._wrapped.get(index)
+        # items could have moved since they were wrapped
+        if cached is not None and cached[0] is item:
+            return cached[1]
+
+        if isinstance(item, dict):
+            wrapped = self._pinnate_cls(item, eager=False)
+        else:
+            wrapped = _PinnateList(item, self._pinnate_cls)
+        self._wrapped[index] = (item, wrapped)
+        return wrapped
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __reversed__(self):
+        for index in reversed(range(len(self))):
+            yield self[index]
+
+    def __contains__(self, value):
+        return list.__contains__(self, self._native(value))
+
+    def index(self, value, *args):
+        return list.index(self, self._native(value), *args)
+
+    def count(self, value):
+        return list.count(self, self._native(value))
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = [self._native(v) for v in value]
+        else:
+            value = self._native(value)
+        self._items[index] = value
+        list.__setitem__(self, index, value)
+
+    def __delitem__(self, index):
+        del self._items[index]
+        list.__delitem__(self, index)
+
+    def append(self, value):
+        value = self._native(value)
+        self._items.append(value)
+        list.append(self, value)
+
+    def extend(self, values):
+        values = [self._native(v) for v in values]
+        self._items.extend(values)
+        list.extend(self, values)
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def __imul__(self, n):
+        self._items *= n
+        list.__imul__(self, n)
+        return self
+
+    def insert(self, index, value):
+        value = self._native(value)
+        self._items.insert(index, value)
+        list.insert(self, index, value)
+
+    def pop(self, index=-1):
+        value = self[index]
+        del self[index]
+        return value
+
+    def remove(self, value):
+        del self[self.index(value)]
+
+    def clear(self):
+        self._items.clear()
+        list.clear(self)
+
+    def reverse(self):
+        self._items.reverse()
+        list.reverse(self)
+
+    def sort(self, key=None, reverse=False):
+        "`key` is given the items as they are read, i.e. dictionaries as :class:`Pinnate` objects"
+        sort_key = None if key is None else (lambda i: key(self[i]))
+        if sort_key is None:
+            self._items.sort(reverse=reverse)
+        else:
+            order = sorted(range(len(self)), key=sort_key, reverse=reverse)
+            self._items[:] = [self._items[i] for i in order]
+        list.__setitem__(self, slice(None), self._items)
+
+    def __reduce__(self):
+        # copied and pickled as the list it's a view of
+        return (list, (list(self._items),))
+
+
+def _restore_pinnate(cls, payload, adopted):
+    "For unpickling. @see :meth:`Pinnate.__reduce__`"
+    pinnate = cls.__new__(cls)
+    pinnate._attr = payload
+    pinnate._wrapped = {}
+    pinnate._adopted = adopted
+    return pinnate
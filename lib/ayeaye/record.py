@@ -0,0 +1,143 @@
+from functools import lru_cache
+import json
+from keyword import iskeyword
+from operator import itemgetter
+
+
+@lru_cache(maxsize=1024)
+def record_class(field_names):
+    """
+    Records with the same fields share a class so the field names are stored once and not in each
+    record.
+
+    @param field_names: (tuple of str) csv.DictReader uses None as the name of extra values in a
+        row. These are only available with `record[None]`.
+    @return: subclass of :class:`Record`
+    """
+    namespace = {
+        "__slots__": (),
+        "_fields": field_names,
+        "_field_index": {name: idx for idx, name in enumerate(field_names)},
+    }
+    reserved = set(dir(Record))
+    for idx, name in enumerate(field_names):
+        if (
+            isinstance(name, str)
+            and name.isidentifier()
+            and not iskeyword(name)
+            and name not in reserved
+        ):
+            namespace[name] = property(itemgetter(idx))
+
+    return type("Record", (Record,), namespace)
+
+
+def _rebuild_record(field_names, values):
+    "For pickle. The subclass of :class:`Record` is built at runtime so it can't be imported."
+    return record_class(field_names)._make(values)
+
+
+class Record(tuple):
+    """
+    Compact, read only alternative to :class:`Pinnate` for records yielded by connectors. Values
+    are held in a tuple and the field names are shared by all records with the same fields.
+
+    Connectors that support the `record_type` optional arg can yield these instead of
+    :class:`Pinnate` objects-
+
+    >>> c = ayeaye.Connect(engine_url="csv:///data/big.csv", record_type=ayeaye.Record)
+    >>> for r in c:
+    >>>    r.name, r["name"], r.as_dict()
+
+    Unlike :class:`Pinnate`-
+    - nested dictionaries aren't wrapped so attribute access is just for the top level fields
+    - iterating yields values (as a tuple does)
+    - fields with names that aren't python identifiers, or that clash with a method name (e.g.
+    'items' or 'count') can only be accessed with `record["field name"]`
+    """
+
+    __slots__ = ()
+
+    # set in each subclass by :func:`record_class`
+    _fields = ()
+    _field_index = {}
+
+    def __new__(cls, data=None):
+        """
+        @param data: (dict) to make a record from. Or, for subclasses built by
+            :func:`record_class`, a sequence of values in the same order as the fields.
+        """
+        if isinstance(data, dict):
+            return tuple.__new__(record_class(tuple(data)), data.values())
+
+        if cls is Record:
+            raise TypeError("Record must be built from a dictionary")
+
+        return tuple.__new__(cls, data or ())
+
+    @classmethod
+    def wrap(cls, data):
+        """
+        Same as `Record(data)`. Connectors build records with `record_type.wrap(..)` so this
+        matches :meth:`Pinnate.wrap`.
+
+        @param data: (dict)
+        """
+        return cls(data)
+
+    @classmethod
+    def _make(cls, values):
+        "@return: record of this subclass's fields without any checks"
+        return tuple.__new__(cls, values)
+
+    def __getattr__(self, attr):
+        # only called when the field wasn't found as a property
+        if attr in self._field_index:
+            return tuple.__getitem__(self, self._field_index[attr])
+
+        raise AttributeError(f"{self.__class__.__name__} instance has no attribute '{attr}'")
+
+    def __getitem__(self, key):
+        if isinstance(key, str) or key is None:
+            return tuple.__getitem__(self, self._field_index[key])
+
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return key in self._field_index
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in zip(self._fields, self))
+        return f"<Record {fields}>"
+
+    def __reduce__(self):
+        return (_rebuild_record, (self._fields, tuple(self)))
+
+    def get(self, key, default=None):
+        idx = self._field_index.get(key)
+        return default if idx is None else tuple.__getitem__(self, idx)
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return zip(self._fields, self)
+
+    def as_dict(self, select_fields=None):
+        """
+        @param select_fields: (list of str) to only include some fields.
+        @return: (dict)
+        """
+        if select_fields is not None:
+            return {k: self[k] for k in select_fields}
+
+        return dict(zip(self._fields, self))
+
+    def as_native(self):
+        return self.as_dict()
+
+    def as_json(self):
+        return json.dumps(self.as_dict(), default=str)
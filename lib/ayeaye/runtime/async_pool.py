@@ -0,0 +1,229 @@
+"""
+Run :class:`ayeaye.PartitionedModel` sub-tasks concurrently in an asyncio event loop.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import inspect
+from threading import Lock
+
+from ayeaye.connect_resolve import connector_resolver
+from ayeaye.runtime.multiprocess import AbstractProcessPool, LocalProcessPool, _FeederFinished
+from ayeaye.runtime.task_message import TaskComplete, TaskLogMessage
+
+# Internal message. A worker has no more sub-tasks to run.
+_WORKER_FINISHED = object()
+
+
+class _AsyncQueueLogger:
+    """
+    Send log messages from a sub-task's model to the parent's :meth:`log` through the run's
+    :class:`asyncio.Queue`. It must be called from the event loop's thread.
+    """
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    def write(self, msg):
+        self.messages.put_nowait(TaskLogMessage(msg=msg))
+
+
+class LocalAsyncPool(AbstractProcessPool):
+    """
+    Run sub-tasks concurrently in one asyncio event loop in the current process.
+
+    This is for sub-tasks that spend their time waiting on the network, e.g. hundreds of API or
+    database requests. The sub-task's method should be an `async def` method. It's awaited so other
+    sub-tasks run while it waits. A normal method works but blocks the other sub-tasks until it
+    returns.
+
+    Each sub-task is run by a new instance of it's model in it's own resolver context (@see
+    :meth:`ConnectorResolver.isolated_thread`) made from the context given to
+    :meth:`run_subtasks` and the sub-task's `additional_context`.
+
+    Code that is already running in an event loop reads the messages with `async for`-
+
+    >>> pool = LocalAsyncPool(max_concurrent=200)
+    >>> async for message in pool.run_subtasks_async(sub_tasks):
+    >>>     ...
+
+    A :class:`ayeaye.PartitionedModel` uses this pool when it's given one as it's `process_pool`
+    or when :meth:`PartitionedModel.partition_plea` returns a `PartitionOption` with
+    `worker_type="async"`. The model's own methods (e.g. :meth:`partition_subtask_complete`)
+    aren't `async`.
+    """
+
+    def __init__(self, max_concurrent=100):
+        """
+        @param max_concurrent: (int) upper limit for the number of sub-tasks running at once.
+        """
+        self.max_concurrent = max_concurrent
+        self._run_lock = Lock()
+
+    def run_subtasks(self, sub_tasks, context_kwargs=None, processes=None):
+        """
+        Generator yielding instances that are a subclass of :class:`AbstractTaskMessage`. These
+        are from subtasks.
+
+        The sub-tasks are run in a new event loop so this can't be called from code running in an
+        event loop. Use :meth:`run_subtasks_async` instead.
+
+        @param processes: (int) number of sub-tasks running at once. It can't be more than
+            `self.max_concurrent`.
+
+        @see doc. string in :meth:`AbstractProcessPool.run_subtasks`
+        """
+        loop = asyncio.new_event_loop()
+        messages = self.run_subtasks_async(sub_tasks, context_kwargs, processes)
+        try:
+            while True:
+                try:
+                    message = loop.run_until_complete(messages.__anext__())
+                except StopAsyncIteration:
+                    break
+                yield message
+        finally:
+            loop.run_until_complete(messages.aclose())
+            loop.close()
+
+    async def run_subtasks_async(self, sub_tasks, context_kwargs=None, processes=None):
+        """
+        Asynchronous generator yielding the same messages as :meth:`run_subtasks`.
+
+        @param sub_tasks: An iterator, or asynchronous iterator, of :class:`TaskPartition` objects.
+            The next sub-task is only read when there is space for it to run. An iterator (e.g. a
+            :meth:`PartitionedModel.partition_slice` generator) is read in another thread so it
+            can block without stopping the running sub-tasks.
+
+        @see :meth:`run_subtasks` for the other args.
+        """
+        if processes is None:
+            processes = self.max_concurrent
+
+        if processes > self.max_concurrent:
+            msg = f"{processes} concurrent sub-tasks requested, max set to {self.max_concurrent}"
+            raise ValueError(msg)
+
+        if not self._run_lock.acquire(blocking=False):
+            raise RuntimeError("This pool is already running sub-tasks")
+
+        context_kwargs = context_kwargs or {}
+        messages = asyncio.Queue()
+        sub_tasks_iterator = _async_iter(sub_tasks)
+        iterator_lock = asyncio.Lock()  # an asynchronous generator can't be read concurrently
+
+        async def next_sub_task():
+            "@return: :class:`TaskPartition` or None when there aren't any more"
+            async with iterator_lock:
+                try:
+                    return await sub_tasks_iterator.__anext__()
+                except StopAsyncIteration:
+                    return None
+
+        async def run_worker(worker_id):
+            logger = _AsyncQueueLogger(messages)
+            try:
+                while True:
+                    try:
+                        task_message = await next_sub_task()
+                    except Exception as e:
+                        messages.put_nowait(_FeederFinished(exception=e))
+                        break
+
+                    if task_message is None:
+                        break
+
+                    task_msg = await self._run_sub_task(
+                        task_message, logger, worker_id, processes, context_kwargs
+                    )
+                    messages.put_nowait(task_msg)
+            finally:
+                messages.put_nowait(_WORKER_FINISHED)
+
+        # each worker is an asyncio task so it has it's own resolver context
+        workers = [asyncio.ensure_future(run_worker(worker_id)) for worker_id in range(processes)]
+        try:
+            running_workers = len(workers)
+            while running_workers:
+                message = await messages.get()
+                if message is _WORKER_FINISHED:
+                    running_workers -= 1
+
+                elif isinstance(message, _FeederFinished):
+                    raise message.exception
+
+                else:
+                    # could be a log message or sub-task completed notification
+                    yield message
+
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._run_lock.release()
+
+    @staticmethod
+    async def _run_sub_task(task_message, logger, worker_id, total_workers, context_kwargs):
+        """
+        Run the sub-task on a new model in the current asyncio task's own resolver context.
+
+        @param task_message: :class:`TaskPartition`
+        @return: :class:`TaskComplete` or :class:`TaskFailed`
+        """
+        if task_message.method_kwargs is None:
+            task_message.method_kwargs = {}
+
+        with connector_resolver.isolated_thread():
+            with connector_resolver.context(**context_kwargs, **task_message.additional_context):
+                model = None
+                try:
+                    model = LocalProcessPool._worker_model(
+                        task_message, logger, worker_id, total_workers
+                    )
+                    sub_task_method = getattr(model, task_message.method_name)
+                    subtask_return_value = sub_task_method(**task_message.method_kwargs)
+                    if inspect.isawaitable(subtask_return_value):
+                        subtask_return_value = await subtask_return_value
+
+                    return TaskComplete(
+                        model_cls_name=task_message.model_cls.__name__,
+                        method_name=task_message.method_name,
+                        method_kwargs=task_message.method_kwargs,
+                        return_value=subtask_return_value,
+                        task_id=task_message.task_id,
+                    )
+
+                except Exception:
+                    return LocalProcessPool._task_failed_message(task_message, context_kwargs)
+
+                finally:
+                    if model is not None:
+                        model.close_datasets()
+
+
+async def _async_iter(iterable):
+    """
+    @param iterable: iterable or asynchronous iterable. An iterable is read by one thread that
+        isn't the event loop's, in a copy of the caller's context.
+    @return: asynchronous iterator
+    """
+    if hasattr(iterable, "__aiter__"):
+        async for item in iterable:
+            yield item
+        return
+
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    iterator = iter(iterable)
+    finished = object()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ayeaye_sub_tasks")
+    try:
+        while True:
+            item = await loop.run_in_executor(executor, context.run, next, iterator, finished)
+            if item is finished:
+                break
+            yield item
+    finally:
+        # don't wait for an iterator that is blocked
+        executor.shutdown(wait=False)
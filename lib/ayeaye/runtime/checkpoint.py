@@ -0,0 +1,153 @@
+"""
+Record the sub-tasks of a :class:`ayeaye.PartitionedModel` as they complete so a run that ended
+part way through can be resumed without running them again.
+"""
+
+import hashlib
+import json
+import pickle
+import sqlite3
+from threading import Lock
+
+# Protocol 5 for the same reasons as :mod:`ayeaye.runtime.multiprocess`
+PICKLE_PROTOCOL = 5
+
+
+class AbstractCheckpoint:
+    """
+    Store of :class:`TaskComplete` messages for sub-tasks that have finished.
+
+    A sub-task is identified by a stable hash of everything in it's :class:`TaskPartition` that
+    decides what it does (@see :meth:`key`).
+
+    A checkpoint belongs to one run of a model. Use a new one (e.g. named with a build id) for a run
+    with a different resolver context or input data.
+    """
+
+    @staticmethod
+    def key(task_partition):
+        """
+        @param task_partition: :class:`TaskPartition`. The kwargs and `additional_context` should
+            have values that can be serialised to JSON. Other values are converted to strings.
+        @return: (str) hash of the module qualified model class, method name, method,
+            construction and `partition_initialise` kwargs and additional context. It's the same
+            in every process and every run.
+        """
+        model_cls = task_partition.model_cls
+        sub_task = [
+            f"{model_cls.__module__}.{model_cls.__qualname__}",
+            task_partition.method_name,
+            task_partition.method_kwargs or {},
+            task_partition.model_construction_kwargs or {},
+            task_partition.partition_initialise_kwargs or {},
+            task_partition.additional_context or {},
+        ]
+        serialised = json.dumps(sub_task, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(serialised.encode("utf-8")).hexdigest()
+
+    def completed(self, task_partition):
+        """
+        @param task_partition: :class:`TaskPartition`
+        @return: :class:`TaskComplete` from an earlier run of the sub-task or None
+        """
+        return self.get(self.key(task_partition))
+
+    def record(self, task_partition, task_complete):
+        """
+        @param task_partition: :class:`TaskPartition` that was run
+        @param task_complete: :class:`TaskComplete` of the sub-task that has just finished
+        """
+        self.put(self.key(task_partition), task_complete)
+
+    def get(self, key):
+        """
+        @param key: (str) @see :meth:`key`
+        @return: :class:`TaskComplete` or None
+        """
+        raise NotImplementedError("Must be implemented by subclasses")
+
+    def put(self, key, task_complete):
+        """
+        Store the message. It must still be there if the process ends straight after this.
+
+        @param key: (str) @see :meth:`key`
+        @param task_complete: :class:`TaskComplete`
+        """
+        raise NotImplementedError("Must be implemented by subclasses")
+
+    def clear(self):
+        "Forget all the completed sub-tasks. The run has finished."
+        raise NotImplementedError("Must be implemented by subclasses")
+
+
+class SqliteCheckpoint(AbstractCheckpoint):
+    """
+    Completed sub-tasks, with their pickled return values, in a local SQLite database.
+
+    >>> model = MyPartitionedModel()
+    >>> model.checkpoint = SqliteCheckpoint("/tmp/my_model_checkpoint.sqlite")
+    >>> model.go()
+
+    The database is opened on first use so a model with a checkpoint can be copied into worker
+    processes. It can be used by more than one thread.
+    """
+
+    def __init__(self, path):
+        """
+        @param path: (str) file for the SQLite database. It's created when it doesn't exist.
+        """
+        self.path = path
+        self._connection = None
+        self._lock = Lock()
+
+    def __getstate__(self):
+        # the connection and lock belong to this process
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def connection(self):
+        "Call with `self._lock` held."
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL with 'normal' sync. survives the process being killed but is quick to commit.
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS task_complete "
+                "(task_key TEXT PRIMARY KEY, task_message BLOB NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, key):
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT task_message FROM task_complete WHERE task_key = ?", (key,)
+            ).fetchone()
+
+        if row is None:
+            return None
+        return pickle.loads(row[0])
+
+    def put(self, key, task_complete):
+        task_message = pickle.dumps(task_complete, protocol=PICKLE_PROTOCOL)
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO task_complete (task_key, task_message) VALUES (?, ?)",
+                (key, task_message),
+            )
+            self.connection.commit()
+
+    def clear(self):
+        with self._lock:
+            self.connection.execute("DELETE FROM task_complete")
+            self.connection.commit()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
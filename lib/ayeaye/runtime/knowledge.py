@@ -5,6 +5,7 @@ Created on 31 Jan 2022
 
 @author: si
 """
+
 import math
 import os
 
@@ -22,8 +23,18 @@ class RuntimeKnowledge:
     * worker_id (int) - unique integer assigned in ascending order to workers as they start
     * total_workers (int) - Number of workers created in worker group. Is `None` if variable number
                     of workers are being used.
+
+    The resources available to the process (@see :attr:`effective_cpus` and
+    :attr:`available_memory`) take account of CPU affinity and cgroup (v1 and v2) limits so they
+    are right within a container.
     """
 
+    # Where to find the process's cgroups and the system's memory. Class attributes so they can be
+    # changed for tests.
+    proc_self_cgroup = "/proc/self/cgroup"
+    cgroup_root = "/sys/fs/cgroup"
+    proc_meminfo = "/proc/meminfo"
+
     def __init__(self):
         self.worker_id = None
         self.total_workers = None
@@ -34,7 +45,7 @@ class RuntimeKnowledge:
         # can be set to an absolute limit
         # e.g.
         #   model_instance.runtime.max_concurrent_tasks = 1
-        # or by default returns number of CPUs * self.cpu_task ratio
+        # or by default returns number of effective CPUs * self.cpu_task ratio
         self._max_concurrent_tasks = None
 
     @property
@@ -43,7 +54,7 @@ class RuntimeKnowledge:
             # user has set an absolute value
             return self._max_concurrent_tasks
 
-        return math.ceil(os.cpu_count() * self.cpu_task_ratio)
+        return math.ceil(self.effective_cpus * self.cpu_task_ratio)
 
     @max_concurrent_tasks.setter
     def max_concurrent_tasks(self, max_tasks):
@@ -53,3 +64,158 @@ class RuntimeKnowledge:
         @param max_tasks: (int)
         """
         self._max_concurrent_tasks = max_tasks
+
+    @property
+    def effective_cpus(self):
+        """
+        CPUs this process can use. This is the fewest of the CPUs it's allowed to run on (i.e. it's
+        affinity) and it's cgroup CPU quota rounded up. In a container the quota is often much
+        lower than the number of CPUs in the host which is what `os.cpu_count()` returns.
+
+        @return: (int)
+        """
+        if hasattr(os, "sched_getaffinity"):
+            cpus = len(os.sched_getaffinity(0))
+        else:
+            cpus = os.cpu_count() or 1
+
+        cpu_quota = self.cgroup_cpu_quota()
+        if cpu_quota is not None:
+            cpus = min(cpus, max(1, math.ceil(cpu_quota)))
+
+        return cpus
+
+    def cgroup_cpu_quota(self):
+        """
+        @return: (float) CPU time, as a number of CPUs, that this process's cgroups allow it. None
+            if there isn't a quota.
+        """
+        quotas = []
+        for directory in self._cgroup_directories("cpu"):
+            # cgroup v2 e.g. "200000 100000" or "max 100000"
+            cpu_max = _read_text(os.path.join(directory, "cpu.max"))
+            if cpu_max is not None:
+                quota, _, period = cpu_max.partition(" ")
+                if quota.isdigit() and period.isdigit() and int(period) > 0:
+                    quotas.append(int(quota) / int(period))
+
+            # cgroup v1. A quota of -1 means no quota
+            quota = _read_int(os.path.join(directory, "cpu.cfs_quota_us"))
+            period = _read_int(os.path.join(directory, "cpu.cfs_period_us"))
+            if quota is not None and quota > 0 and period:
+                quotas.append(quota / period)
+
+        return min(quotas) if quotas else None
+
+    @property
+    def available_memory(self):
+        """
+        Memory that could be used without swapping or being killed for exceeding a limit. This is
+        the least of the system's available memory and the space left within this process's
+        cgroup memory limits. Reclaimable file cache is counted as available.
+
+        @return: (int) bytes or None if it isn't known
+        """
+        available = []
+
+        meminfo = _read_text(self.proc_meminfo) or ""
+        for line in meminfo.splitlines():
+            if line.startswith("MemAvailable:"):
+                available.append(int(line.split()[1]) * 1024)
+                break
+        else:
+            try:
+                available.append(os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE"))
+            except (AttributeError, ValueError, OSError):
+                pass
+
+        # (limit, usage, memory.stat key for reclaimable cache) for cgroup v2 and v1
+        cgroup_files = [
+            ("memory.max", "memory.current", "inactive_file"),
+            ("memory.limit_in_bytes", "memory.usage_in_bytes", "total_inactive_file"),
+        ]
+        for directory in self._cgroup_directories("memory"):
+            for limit_file, usage_file, cache_key in cgroup_files:
+                limit = _read_int(os.path.join(directory, limit_file))
+                usage = _read_int(os.path.join(directory, usage_file))
+                if limit is None or usage is None:
+                    # "max" is no limit
+                    continue
+
+                memory_stat = _read_text(os.path.join(directory, "memory.stat")) or ""
+                for line in memory_stat.splitlines():
+                    key, _, value = line.partition(" ")
+                    if key == cache_key and value.isdigit():
+                        usage = max(0, usage - int(value))
+                        break
+
+                available.append(max(0, limit - usage))
+
+        return min(available) if available else None
+
+    def max_tasks_for_memory(self, task_memory):
+        """
+        @param task_memory: (int or float) bytes each task is estimated to need
+        @return: (int) number of tasks, at least 1, that fit in the :attr:`available_memory` or
+            None if the available memory isn't known
+        """
+        if not task_memory > 0:
+            raise ValueError("task_memory must be a positive number of bytes")
+
+        available_memory = self.available_memory
+        if available_memory is None:
+            return None
+
+        return max(1, int(available_memory // task_memory))
+
+    def _cgroup_directories(self, controller):
+        """
+        @param controller: (str) cgroup v1 controller. e.g. 'cpu' or 'memory'
+        @return: (list of str) directories for this process's cgroup and each of it's ancestors as
+            they could all set limits. Both cgroup v2 and v1 (for `controller`) directories.
+        """
+        directories = []
+        for line in (_read_text(self.proc_self_cgroup) or "").splitlines():
+            # e.g. '0::/user.slice' (v2) or '4:memory:/docker/abc' (v1)
+            parts = line.split(":", 2)
+            if len(parts) != 3:
+                continue
+
+            _, controllers, cgroup_path = parts
+            if controllers == "":
+                mount_point = self.cgroup_root
+            elif controller in controllers.split(","):
+                mount_point = os.path.join(self.cgroup_root, controller)
+            else:
+                continue
+
+            # a container without it's own cgroup namespace sees the host's path for it's cgroup
+            # but just has it's own cgroup mounted. So paths that don't exist are skipped.
+            cgroup_path = cgroup_path.strip("/")
+            while True:
+                directory = os.path.join(mount_point, cgroup_path) if cgroup_path else mount_point
+                if os.path.isdir(directory):
+                    directories.append(directory)
+                if not cgroup_path:
+                    break
+                cgroup_path = os.path.dirname(cgroup_path)
+
+        return directories
+
+
+def _read_text(path):
+    "@return: (str) contents of the file without surrounding whitespace or None if it can't be read"
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _read_int(path):
+    "@return: (int) from the file or None if it can't be read or isn't an integer. e.g. 'max'"
+    text = _read_text(path)
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return None
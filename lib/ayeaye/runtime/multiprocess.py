@@ -2,18 +2,48 @@
 Run :class:`ayeaye.PartitionedModel` models across multiple operating system processes.
 """
 
-from ctypes import c_int
-from multiprocessing import Process, Queue
-from multiprocessing.sharedctypes import Value
-
+import atexit
+from collections import deque, OrderedDict
+import copy
+from dataclasses import dataclass
+import heapq
+import importlib
+from itertools import count
+import multiprocessing
+from multiprocessing import resource_tracker
+from multiprocessing.connection import wait
+import os
+import pickle
 import sys
-from threading import Thread
+from threading import Condition, Lock, Thread
+import time
 import traceback
+from typing import Optional
+from weakref import WeakSet
 
 import ayeaye
 from ayeaye.connect_resolve import connector_resolver
+from ayeaye.exception import WorkerProcessExited
+from ayeaye.runtime import shared_memory_transport
 from ayeaye.runtime.task_message import TaskComplete, TaskFailed, TaskLogMessage, TaskPartition
 
+# :class:`multiprocessing.Queue` pickles with the default protocol (4 before Python 3.14). Messages
+# are pickled with protocol 5 before they go on a queue.
+PICKLE_PROTOCOL = 5
+
+
+def queue_put(queue, message):
+    "Put `message` on the :class:`multiprocessing.Queue` as a protocol 5 pickle."
+    queue.put(pickle.dumps(message, protocol=PICKLE_PROTOCOL))
+
+
+def queue_get(queue, **kwargs):
+    """
+    @param kwargs: passed to :meth:`multiprocessing.Queue.get`. e.g. timeout
+    @return: message put on the queue with :func:`queue_put`
+    """
+    return pickle.loads(queue.get(**kwargs))
+
 
 class QueueLogger:
     """
@@ -27,7 +57,60 @@ class QueueLogger:
     def write(self, msg):
         # TODO structured logging
         log_serialised = TaskLogMessage(msg=msg)
-        self.log_queue.put(log_serialised)
+        queue_put(self.log_queue, log_serialised)
+
+
+class _PipeWriter:
+    """
+    Send messages from a worker to the parent down the worker's own pipe. It's used like a
+    :class:`multiprocessing.Queue` by :func:`queue_put`.
+
+    Unlike a queue shared by all the workers, there isn't a lock or a background thread that
+    other workers depend on. So a worker that's killed part way through can't block the others.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = Lock()  # a model could log from more than one thread
+
+    def put(self, message_bytes):
+        with self.lock:
+            self.connection.send_bytes(message_bytes)
+
+
+@dataclass
+class _FeederFinished:
+    "Internal message. All the sub-tasks have been read from the iterator."
+
+    exception: Optional[BaseException] = None  # raised by the iterator
+
+
+@dataclass
+class _ChunkFinished:
+    "Internal message. A worker has run a chunk of sub-tasks."
+
+    results: list  # a :class:`TaskComplete` or :class:`TaskFailed` for each sub-task
+    busy_seconds: float  # time spent running the chunk
+
+
+@dataclass
+class WorkerUtilisation:
+    """
+    How busy one worker was during a call to :meth:`LocalProcessPool.run_subtasks`. A worker that
+    is idle while others are busy at the end of a run shows sub-tasks of uneven sizes. @see
+    `cost` in :class:`TaskPartition`.
+    """
+
+    worker_id: int
+    run_seconds: float  # duration of the whole run
+    sub_tasks: int = 0
+    cost: float = 0.0  # total of the sub-tasks' `cost` estimates
+    busy_seconds: float = 0.0
+
+    @property
+    def utilisation(self):
+        "@return: (float) fraction of the run the worker was running sub-tasks"
+        return self.busy_seconds / self.run_seconds if self.run_seconds else 0.0
 
 
 class AbstractProcessPool:
@@ -78,16 +161,118 @@ class LocalProcessPool(AbstractProcessPool):
     It's frustrating that this can't be done with :class:`multiprocessing.Pool`. Please let me
     know if you can see a way with `Pool`.
 
-    This subclass of :class:`AbstractProcessPool` doesn't re-try failed tasks; it simply passes
-    a :class:`TaskFailed` message to the calling model. @see :method:`run_subtasks.`
+    By default this subclass of :class:`AbstractProcessPool` doesn't re-try failed tasks; it
+    simply passes a :class:`TaskFailed` message to the calling model. With `max_attempts` a failed
+    sub-task is run again after an exponential backoff. @see :method:`run_subtasks.`
+
+    By default the worker processes are started by each call to :meth:`run_subtasks` and end
+    when the sub-tasks are complete. A `persistent` pool keeps its workers running between calls
+    so the cost of starting processes and importing modules is only paid once. It can be shared
+    by all the :class:`ayeaye.PartitionedModel`s in a pipeline-
+
+    >>> pool = LocalProcessPool(max_processes=8, persistent=True, start_method="forkserver")
+    >>> pool.make_shared()
+    >>> ... run models ...
+    >>> pool.shutdown()
     """
 
-    def __init__(self, max_processes):
+    # pool used by :class:`ayeaye.PartitionedModel`s that haven't been given one. @see
+    # :meth:`make_shared`
+    _shared_pool = None
+
+    def __init__(
+        self,
+        max_processes,
+        persistent=False,
+        start_method=None,
+        preload_modules=None,
+        in_flight_factor=2,
+        chunk_size=1,
+        model_cache_size=0,
+        shared_memory_threshold=None,
+        max_attempts=1,
+        retry_delay=1.0,
+        retry_backoff=2.0,
+        retry_max_delay=60.0,
+    ):
         """
         @param max_processes: (int) upper limit for number of concurrent processes.
+        @param persistent: (bool) keep the worker processes running after :meth:`run_subtasks`
+            has finished so they can be used by the next call. They run until :meth:`shutdown`.
+        @param start_method: (str) 'fork', 'forkserver' or 'spawn'. None for the platform's
+            default. @see :func:`multiprocessing.get_context`
+        @param preload_modules: (list of str) names of modules imported by each worker as it
+            starts. e.g. ['pandas']. With 'forkserver' these are imported once by the server.
+        @param in_flight_factor: (int) sub-tasks read from the `sub_tasks` iterator given to
+            :meth:`run_subtasks` but not finished are limited to this multiple of the number of
+            workers. The next sub-task is only read when one finishes so a generator yielding a
+            huge number of sub-tasks doesn't fill the parent's memory. A generator paused like this
+            mustn't be holding a lock that's needed to receive messages from finished sub-tasks.
+        @param chunk_size: (int) up to this number of sub-tasks are sent to a worker in one
+            message and run on one model instance. Only consecutive sub-tasks that can share an
+            instance (@see :meth:`TaskPartition.same_model_as`) are grouped. This is for models
+            with lots of tiny sub-tasks where sending each one and building a model for it takes
+            longer than the work. A smaller chunk is sent when a worker would otherwise wait.
+        @param model_cache_size: (int) each worker keeps up to this number of initialised model
+            instances so later sub-tasks with the same model class, construction kwargs,
+            `partition_initialise` kwargs and resolver context don't build the model again.
+            Expensive setup in `__init__` or :meth:`PartitionedModel.partition_initialise` (e.g.
+            loading a lookup table) is done once per worker. Datasets are closed after each
+            sub-task unless their connection is reusable (e.g. a database session). The least
+            recently used model is closed when the cache is full. 0 builds a model for each
+            sub-task (or chunk).
+        @param shared_memory_threshold: (int or None) sub-task results with values (`bytes`,
+            `bytearray`, numpy arrays, Arrow buffers etc.) of at least this number of bytes are
+            sent to the parent in shared memory instead of down a pipe. The shared memory is
+            released when the result has been received. @see
+            :mod:`ayeaye.runtime.shared_memory_transport`. None to always use the pipe.
+        @param max_attempts: (int) times a sub-task is run before its :class:`TaskFailed` is
+            passed to the caller. 1 doesn't retry. Sub-tasks must be idempotent to be retried.
+        @param retry_delay: (float) seconds before the first retry of a sub-task
+        @param retry_backoff: (float) the delay is multiplied by this for each later retry
+        @param retry_max_delay: (float) upper limit in seconds for the delay between attempts
         """
-        self.max_processes = max_processes
         self.proc_table = None
+        if in_flight_factor < 1:
+            raise ValueError("in_flight_factor must be a positive integer")
+
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be a positive integer")
+
+        if model_cache_size < 0:
+            raise ValueError("model_cache_size can't be negative")
+
+        if shared_memory_threshold is not None and shared_memory_threshold < 1:
+            raise ValueError("shared_memory_threshold must be a positive integer or None")
+
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be a positive integer")
+
+        if retry_delay < 0 or retry_max_delay < 0:
+            raise ValueError("retry delays can't be negative")
+
+        if retry_backoff < 1:
+            raise ValueError("retry_backoff can't be less than 1")
+
+        self.max_processes = max_processes
+        self.persistent = persistent
+        self.start_method = start_method
+        self.preload_modules = list(preload_modules or [])
+        self.in_flight_factor = in_flight_factor
+        self.chunk_size = chunk_size
+        self.model_cache_size = model_cache_size
+        self.shared_memory_threshold = shared_memory_threshold
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.retry_backoff = retry_backoff
+        self.retry_max_delay = retry_max_delay
+        self.mp_context = multiprocessing.get_context(start_method)
+        self._inboxes = None  # a :class:`multiprocessing.Queue` of sub-tasks for each worker
+        self._results = None  # read end of a pipe of messages from each worker
+        self._owner_pid = os.getpid()
+        self._run_lock = Lock()
+        # :class:`WorkerUtilisation` for each worker in the last call to :meth:`run_subtasks`
+        self.utilisation = []
 
     def __del__(self):
         """
@@ -95,17 +280,149 @@ class LocalProcessPool(AbstractProcessPool):
         within a process isn't handled correctly and would result in exceptions being
         dumped.
         """
-
         if self.proc_table:
-            # terminate any processes that are still alive
-            for proc in self.proc_table:
-                if proc.is_alive():
-                    proc.terminate()
+            self.shutdown(terminate=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.shutdown()
+
+    @property
+    def is_running(self):
+        "@return: (bool) worker processes have been started and not shutdown"
+        return self.proc_table is not None and self._owner_pid == os.getpid()
+
+    def make_shared(self):
+        """
+        Use this pool for all :class:`ayeaye.PartitionedModel`s in this process that haven't
+        been given a process pool. It should be `persistent` otherwise the only benefit is
+        sharing the settings.
+
+        The pool isn't shared with child processes. A model running as a sub-task in a worker
+        gets its own pool.
+
+        @return: self
+        """
+        LocalProcessPool._shared_pool = self
+        return self
+
+    @classmethod
+    def shared(cls):
+        """
+        @return: :class:`LocalProcessPool` set with :meth:`make_shared` or None
+        """
+        pool = LocalProcessPool._shared_pool
+        if pool is None or pool._owner_pid != os.getpid():
+            # pool was made by the parent process
+            return None
+
+        return pool
+
+    def start(self, processes=None):
+        """
+        Start the worker processes. If they are already running, any that have exited are
+        replaced.
+
+        :meth:`run_subtasks` starts the workers when needed so this is just for warming up a
+        `persistent` pool before it's used.
+
+        @param processes: (int) number of workers to start. Defaults to `max_processes`.
+        """
+        if self.is_running:
+            for worker_id, proc in enumerate(self.proc_table):
+                if proc.exitcode is not None:
+                    self._start_worker(worker_id)
+            return
+
+        if self._owner_pid != os.getpid():
+            # a copy of the pool inherited by a child process. Any workers belong to the parent.
+            self._owner_pid = os.getpid()
+            self.proc_table = None
+
+        if self.preload_modules and self.mp_context.get_start_method() == "forkserver":
+            self.mp_context.set_forkserver_preload(self.preload_modules)
+
+        if self.shared_memory_threshold is not None:
+            # forked workers would otherwise each start a resource tracker. Sharing the parent's
+            # means it knows when the parent has unlinked a block that a worker made.
+            resource_tracker.ensure_running()
+
+        self._inboxes = []
+        self._results = []
+        self.proc_table = []
+        for worker_id in range(processes or self.max_processes):
+            self._start_worker(worker_id)
+
+        _running_pools.add(self)
+
+    def _start_worker(self, worker_id):
+        "Start or replace the worker process with id `worker_id`."
+        inbox = self.mp_context.Queue()
+        results_reader, results_writer = self.mp_context.Pipe(duplex=False)
+        proc = self.mp_context.Process(
+            target=LocalProcessPool.run_model,
+            kwargs={
+                "worker_id": worker_id,
+                "subtasks_queue": inbox,
+                "returns_pipe": results_writer,
+                "preload_modules": self.preload_modules,
+                "model_cache_size": self.model_cache_size,
+                "shared_memory_threshold": self.shared_memory_threshold,
+            },
+        )
+        proc.start()
+
+        # just the worker has the write end so the reader sees the end of the pipe if it exits
+        results_writer.close()
+
+        if worker_id < len(self.proc_table):
+            # the old worker has gone so sub-tasks left in it's inbox will never be read
+            self._inboxes[worker_id].cancel_join_thread()
+            self._results[worker_id].close()
+            self._inboxes[worker_id] = inbox
+            self._results[worker_id] = results_reader
+            self.proc_table[worker_id] = proc
+        else:
+            self._inboxes.append(inbox)
+            self._results.append(results_reader)
+            self.proc_table.append(proc)
+
+    def shutdown(self, terminate=False):
+        """
+        Stop the worker processes. The pool can still be used, the workers are started again
+        when they are next needed.
+
+        @param terminate: (bool) end the workers without waiting for running sub-tasks to finish.
+        """
+        if self.proc_table is None:
+            return
+
+        if self._owner_pid == os.getpid():
+            for proc, inbox in zip(self.proc_table, self._inboxes):
+                if terminate:
+                    if proc.is_alive():
+                        proc.terminate()
+                    inbox.cancel_join_thread()
+                else:
+                    # signal to processes to end
+                    queue_put(inbox, None)
 
-            # wait for processes to end
             for proc in self.proc_table:
                 proc.join()
 
+            for results_reader in self._results:
+                results_reader.close()
+
+        self.proc_table = None
+        self._inboxes = None
+        self._results = None
+        _running_pools.discard(self)
+
+        if LocalProcessPool._shared_pool is self:
+            LocalProcessPool._shared_pool = None
+
     def run_subtasks(self, sub_tasks, context_kwargs=None, processes=None):
         """
         Generator yielding instances that are a subclass of :class:`AbstractTaskMessage`. These
@@ -115,6 +432,28 @@ class LocalProcessPool(AbstractProcessPool):
         An exception seems brutal but is more intuitive to debug than auto-adjusting the actual
         number of processes. If None is given, `self.max_processes` is used.
 
+        A worker process that exits while running a sub-task (e.g. it was killed by the OS for
+        using too much memory) is replaced and a :class:`TaskFailed` message is yielded for the
+        sub-task, or for each sub-task in the chunk (see `chunk_size`) it was running. Sub-tasks
+        it hadn't started are given to other workers.
+
+        Sub-tasks waiting for a worker are given out largest first using their
+        :attr:`TaskPartition.cost`. Just the sub-tasks already read from `sub_tasks` are ordered
+        (@see `in_flight_factor`); a :class:`PartitionedModel` returning a list from
+        :meth:`partition_slice` has the whole list sorted. How busy each worker was is in
+        `self.utilisation` when the run has finished.
+
+        The pool runs one set of sub-tasks at a time. If the generator isn't run to the end (e.g.
+        the caller raised an exception for a :class:`TaskFailed` message) the workers are
+        terminated as they could still be running sub-tasks from this call.
+
+        A failed sub-task (including one running when its worker exited) is run again when
+        `max_attempts` allows. It waits `retry_delay` seconds, multiplied by `retry_backoff` for
+        each earlier retry, while other sub-tasks carry on. Instead of a :class:`TaskFailed` a
+        'WARNING' :class:`TaskLogMessage` is yielded for each failure that is retried and for a
+        sub-task that succeeded after failing. The :class:`TaskFailed` for the final attempt has the
+        attempt number in :attr:`TaskFailed.attempt`.
+
         @see doc. string in :meth:`AbstractProcessPool.run_subtasks`
         """
         if processes is None:
@@ -123,103 +462,249 @@ class LocalProcessPool(AbstractProcessPool):
         if processes > self.max_processes:
             raise ValueError(f"{processes} processes passed, max set to {self.max_processes}")
 
-        context_kwargs = context_kwargs or {}
-
-        subtasks_queue = Queue()
-        return_values_queue = Queue()
+        if not self._run_lock.acquire(blocking=False):
+            raise RuntimeError("This pool is already running sub-tasks")
 
-        self.proc_table = []
-        for proc_id in range(processes):
-            proc = Process(
-                target=LocalProcessPool.run_model,
-                kwargs={
-                    "worker_id": proc_id,
-                    "total_workers": processes,
-                    "subtasks_queue": subtasks_queue,
-                    "returns_queue": return_values_queue,
-                    "context_kwargs": context_kwargs,
-                },
+        context_kwargs = context_kwargs or {}
+        run_finished = False
+        dispatcher = None
+        run_start = time.perf_counter()
+        feeder_reader, feeder_writer = multiprocessing.Pipe(duplex=False)
+        try:
+            self.start(processes=None if self.persistent else processes)
+
+            # A persistent pool could have more workers than this run should use
+            worker_ids = range(min(processes, len(self.proc_table)))
+            dispatcher = _SubTaskDispatcher(
+                self,
+                worker_ids,
+                context_kwargs,
+                max_in_flight=self.in_flight_factor * len(worker_ids) * self.chunk_size,
+                chunk_size=self.chunk_size,
             )
-            self.proc_table.append(proc)
-
-        for proc in self.proc_table:
-            proc.start()
-
-        subtasks_count = Value(c_int, -1)
-        subtasks_count.value = 0
-
-        class SubTaskProcessor(Thread):
-            def __init__(self, subtasks_count, *args, **kwargs):
-                super().__init__(*args, **kwargs)
-                self.subtasks_count = subtasks_count
-
-            def run(self):
-                for sub_task in sub_tasks:
-                    subtasks_queue.put(sub_task)
-                    # count tasks into the process pool ...
-                    self.subtasks_count.value += 1
-
-        sub_tasks_thread = SubTaskProcessor(subtasks_count=subtasks_count)
-        sub_tasks_thread.start()
-
-        # ... and count tasks out of the process pool
-        completed_procs = 0
-        while True:
-
-            if not sub_tasks_thread.is_alive() and completed_procs == subtasks_count.value:
-                # subtasks iterator is exhausted (thread complete) and all tasks have finished running
-                break
 
-            try:
-                task_message = return_values_queue.get(timeout=1)
-            except:
-                continue
-
-            if isinstance(task_message, (TaskComplete, TaskFailed)):
-                completed_procs += 1
+            def feed_sub_tasks():
+                feeder_message = _FeederFinished()
+                sub_tasks_iterator = iter(sub_tasks)
+                try:
+                    # back-pressure - the next sub-task is read when there is space for it
+                    while dispatcher.wait_for_space():
+                        try:
+                            sub_task = next(sub_tasks_iterator)
+                        except StopIteration:
+                            break
+                        dispatcher.submit(sub_task)
+                except Exception as e:
+                    feeder_message = _FeederFinished(exception=e)
 
-            # could be a log message or sub-task completed notification
-            yield task_message
+                try:
+                    feeder_writer.send(feeder_message)
+                except OSError:
+                    # run_subtasks has finished. e.g. the caller stopped reading messages
+                    pass
+
+            Thread(target=feed_sub_tasks, daemon=True).start()
+
+            def sub_task_finished(sub_task, task_message):
+                """
+                @param task_message: :class:`TaskComplete` or :class:`TaskFailed` for `sub_task`
+                @return: (list of :class:`AbstractTaskMessage`)
+                """
+                attempt = dispatcher.attempt(sub_task)
+                sub_task_name = f"{sub_task.model_cls.__name__}.{sub_task.method_name}"
+                if isinstance(task_message, TaskFailed):
+                    task_message.attempt = attempt
+                    if attempt < self.max_attempts:
+                        delay = self._retry_delay(attempt)
+                        dispatcher.retry(sub_task, delay)
+                        msg = (
+                            f"Sub-task {sub_task_name}({sub_task.method_kwargs}) failed on attempt "
+                            f"{attempt} of {self.max_attempts} with "
+                            f"{task_message.exception_class_name}: {task_message.traceback[0]}. "
+                            f"Retrying in {delay:.2f}s"
+                        )
+                        return [TaskLogMessage(msg=msg, level="WARNING")]
+
+                dispatcher.attempts_finished(sub_task)
+                if attempt > 1 and isinstance(task_message, TaskComplete):
+                    msg = (
+                        f"Sub-task {sub_task_name}({sub_task.method_kwargs}) succeeded on attempt "
+                        f"{attempt} after failing"
+                    )
+                    return [TaskLogMessage(msg=msg, level="WARNING"), task_message]
+
+                return [task_message]
+
+            def received(worker_id, message_bytes):
+                "@return: (list of :class:`AbstractTaskMessage`)"
+                if self.shared_memory_threshold is None:
+                    task_message = pickle.loads(message_bytes)
+                else:
+                    # results could be in shared memory
+                    task_message = shared_memory_transport.loads(message_bytes)
+                if isinstance(task_message, _ChunkFinished):
+                    chunk = dispatcher.chunk_finished(worker_id, task_message.busy_seconds)
+                    messages = []
+                    for sub_task, result in zip(chunk, task_message.results):
+                        messages.extend(sub_task_finished(sub_task, result))
+                    return messages
+
+                return [task_message]
+
+            feeder_finished = False
+            while not (feeder_finished and dispatcher.all_finished):
+                results = {reader: w_id for w_id, reader in enumerate(self._results)}
+                sentinels = {proc.sentinel: w_id for w_id, proc in enumerate(self.proc_table)}
+
+                # blocks until there is a message from a worker or the feeder, a worker exits or
+                # a failed sub-task is due to be retried
+                ready = wait(
+                    [feeder_reader, *results, *sentinels], timeout=dispatcher.seconds_until_retry()
+                )
+                dispatcher.release_retries()
+
+                exited_workers = set()
+                for connection in ready:
+                    if connection is feeder_reader:
+                        feeder_message = feeder_reader.recv()
+                        if feeder_message.exception is not None:
+                            raise feeder_message.exception
+                        feeder_finished = True
+
+                    elif connection in sentinels:
+                        exited_workers.add(sentinels[connection])
+
+                    else:
+                        worker_id = results[connection]
+                        try:
+                            message_bytes = connection.recv_bytes()
+                        except EOFError:
+                            exited_workers.add(worker_id)
+                            continue
+
+                        # could be a log message or sub-task completed notification
+                        yield from received(worker_id, message_bytes)
+
+                for worker_id in sorted(exited_workers):
+                    # messages sent before the worker exited
+                    results_reader = self._results[worker_id]
+                    while True:
+                        try:
+                            if not results_reader.poll():
+                                break
+                            message_bytes = results_reader.recv_bytes()
+                        except (EOFError, OSError):
+                            break
+                        yield from received(worker_id, message_bytes)
+
+                    proc = self.proc_table[worker_id]
+                    proc.join()
+                    for sub_task in dispatcher.worker_exited(worker_id):
+                        task_failed = self._worker_exited_message(
+                            sub_task, worker_id, proc.pid, proc.exitcode, context_kwargs
+                        )
+                        yield from sub_task_finished(sub_task, task_failed)
+
+            run_finished = True
+
+        finally:
+            if dispatcher is not None:
+                dispatcher.cancel()
+                self.utilisation = dispatcher.utilisation(time.perf_counter() - run_start)
+
+            feeder_reader.close()
+            feeder_writer.close()
+
+            if not run_finished:
+                self.shutdown(terminate=True)
+            elif not self.persistent:
+                self.shutdown()
+
+            self._run_lock.release()
+
+    def utilisation_report(self):
+        """
+        @return: (list of str) a line for each worker describing how busy it was during the last
+            call to :meth:`run_subtasks`
+        """
+        report = []
+        for u in self.utilisation:
+            report.append(
+                f"Worker {u.worker_id} ran {u.sub_tasks} sub-tasks (cost {u.cost:g}) and was busy "
+                f"for {u.busy_seconds:.2f}s of {u.run_seconds:.2f}s ({u.utilisation:.0%})"
+            )
+        return report
 
-        # signal to processes to end
-        for _ in range(processes):
-            subtasks_queue.put(None)
+    def _retry_delay(self, attempt):
+        """
+        @param attempt: (int) the attempt that failed. 1 for the first.
+        @return: (float) seconds to wait before the next attempt
+        """
+        delay = self.retry_delay * self.retry_backoff ** (attempt - 1)
+        return min(delay, self.retry_max_delay)
 
-        for proc in self.proc_table:
-            proc.join()
+    @staticmethod
+    def _worker_exited_message(sub_task, worker_id, pid, exitcode, context_kwargs):
+        """
+        @return: :class:`TaskFailed` for the sub-task that was running when a worker exited
+        """
+        return TaskFailed(
+            model_class_name=sub_task.model_cls.__name__,
+            model_construction_kwargs=sub_task.model_construction_kwargs,
+            partition_initialise_kwargs=sub_task.partition_initialise_kwargs,
+            method_name=sub_task.method_name,
+            method_kwargs=sub_task.method_kwargs,
+            resolver_context=context_kwargs,
+            exception_class_name=str(WorkerProcessExited),
+            task_id=sub_task.task_id,
+            traceback=[
+                f"Worker {worker_id} (pid {pid}) exited with code {exitcode} while running the "
+                "sub-task"
+            ],
+        )
 
     @staticmethod
     def run_model(
         worker_id,
-        total_workers,
         subtasks_queue,
-        returns_queue,
-        context_kwargs,
+        returns_pipe,
+        preload_modules=None,
+        model_cache_size=0,
+        shared_memory_threshold=None,
     ):
         """
         @param worker_id: (int)
             unique number assigned in ascending order to workers as they start
 
-        @param total_workers: (int)
-            Number of workers in pool or None for dynamic workers
-
-        @param subtasks_queue: :class:`multiprocessing.Queue` object
-            subtasks are defined in :class:`TaskPartition` objects; each subtask is an item read
-            from this queue.
-
-        @param returns_queue: :class:`multiprocessing.Queue` object
+        @param subtasks_queue: :class:`multiprocessing.Queue` object just for this worker
+            subtasks are defined in :class:`TaskPartition` objects; each item read from this
+            queue is a (context_kwargs, total_workers, chunk) tuple or None to stop the worker.
+            - context_kwargs (dict) Output from
+              :meth:`connect_resolve.ConnectorResolver.capture_context` - but without the
+              'mapper' key. key/values that are made available to the model. These are likely to
+              be taken from `self` and passed to this static method as it alone runs in the
+              :class:`Process`. @see :class:`connect_resolve.ConnectorResolver`
+            - total_workers (int) Number of workers running these sub-tasks
+            - chunk (list of :class:`TaskPartition`) sub-tasks to run in order on one model
+              instance. @see :meth:`TaskPartition.same_model_as`
+
+        @param returns_pipe: write end of a :func:`multiprocessing.Pipe` just for this worker
             Multiplex data from the subtask back to the caller (i.e. the instance that made the
             sub-tasks).
-            Format for the queue is the output from :meth:`to_json` from any subclass of
-            :class:`AbstractTaskMessage`.
+            Items sent down the pipe are pickled subclasses of :class:`AbstractTaskMessage` and a
+            :class:`_ChunkFinished` for each chunk of sub-tasks. @see :func:`queue_put`.
 
-        @param context_kwargs: (dict)
-            Output from :meth:`connect_resolve.ConnectorResolver.capture_context` - but without
-            the 'mapper' key.
-            key/values that are made available to the model. These are likely to be taken from
-            `self` and passed to this static method as it alone runs in the :class:`Process`.
-            @see :class:`connect_resolve.ConnectorResolver`
+        @param preload_modules: (list of str) modules to import before running sub-tasks
+
+        @param model_cache_size: (int) initialised models kept for later sub-tasks. @see
+            :class:`_ModelCache`
+
+        @param shared_memory_threshold: (int or None) send values of at least this size in shared
+            memory. @see :mod:`ayeaye.runtime.shared_memory_transport`
         """
+        for module_name in preload_modules or []:
+            importlib.import_module(module_name)
+
         # brutal reset but needs a test to ensure threads don't share
 
         # Depending on OS's fork() the parent process's memory could be available to this Process. Clear
@@ -227,69 +712,418 @@ class LocalProcessPool(AbstractProcessPool):
         # For more detail see unittest TestRuntimeMultiprocess.test_resolver_context_not_inherited
         connector_resolver.brutal_reset()
 
-        # send logs from the sub-task running in separate Process back to the parent down the queue
+        # a model running in this worker could have been given the parent's shared pool
+        LocalProcessPool._shared_pool = None
+
+        returns_queue = _PipeWriter(returns_pipe)
+
+        # send logs from the sub-task running in separate Process back to the parent down the pipe
         q_logger = QueueLogger(log_prefix=f"Task ({worker_id})", log_queue=returns_queue)
 
+        model_cache = _ModelCache(maxsize=model_cache_size)
+
         while True:
-            task_message = subtasks_queue.get()
+            queue_item = queue_get(subtasks_queue)
 
             # None on queue means end process as all work has been completed
-            if task_message is None:
+            if queue_item is None:
+                model_cache.clear()
                 break
 
-            assert isinstance(task_message, TaskPartition)
+            context_kwargs, total_workers, chunk = queue_item
+
+            # the sub-tasks in a chunk run on one model instance. @see
+            # :meth:`TaskPartition.same_model_as`
+            chunk_start = time.perf_counter()
+            task_results = []
+            model_key = _ModelCache.key(chunk[0], context_kwargs)
+            model = model_cache.get(model_key)
+            if model is not None:
+                model.runtime.total_workers = total_workers
+
+            with connector_resolver.context(**context_kwargs, **chunk[0].additional_context):
+                for task_message in chunk:
+                    assert isinstance(task_message, TaskPartition)
+
+                    if task_message.method_kwargs is None:
+                        task_message.method_kwargs = {}
+
+                    try:
+                        if model is None:
+                            model = LocalProcessPool._worker_model(
+                                task_message, q_logger, worker_id, total_workers
+                            )
+                            model_cache.put(model_key, model)
+
+                        sub_task_method = getattr(model, task_message.method_name)
+                        subtask_return_value = sub_task_method(**task_message.method_kwargs)
+                        task_msg = TaskComplete(
+                            model_cls_name=task_message.model_cls.__name__,
+                            method_name=task_message.method_name,
+                            method_kwargs=task_message.method_kwargs,
+                            return_value=subtask_return_value,
+                            task_id=task_message.task_id,
+                        )
+
+                    except Exception:
+                        task_msg = LocalProcessPool._task_failed_message(
+                            task_message, context_kwargs
+                        )
+
+                        # the model could be in a bad state so the next sub-task gets a new one
+                        model_cache.discard(model_key)
+                        if model is not None:
+                            model.close_datasets()
+                            model = None
+
+                    task_results.append(task_msg)
+
+                if model is not None:
+                    model.close_datasets(keep_reusable=model_key in model_cache)
+
+            # one message with the results of all the sub-tasks in the chunk
+            busy_seconds = time.perf_counter() - chunk_start
+            chunk_finished = _ChunkFinished(results=task_results, busy_seconds=busy_seconds)
+            if shared_memory_threshold is None:
+                queue_put(returns_queue, chunk_finished)
+            else:
+                message_bytes = shared_memory_transport.dumps(
+                    chunk_finished, threshold=shared_memory_threshold
+                )
+                returns_queue.put(message_bytes)
 
-            if task_message.method_kwargs is None:
-                task_message.method_kwargs = {}
+    @staticmethod
+    def _task_failed_message(task_message, context_kwargs):
+        """
+        Call from within the `except` block handling the sub-task's exception.
 
-            with connector_resolver.context(**context_kwargs, **task_message.additional_context):
+        @param task_message: :class:`TaskPartition` that raised the exception
+        @param context_kwargs: (dict) resolver context the sub-task was run in
+        @return: :class:`TaskFailed`
+        """
+        # TODO - this is a bit rough
+        e_type, e_value, e_traceback = sys.exc_info()
+        traceback_ln = [str(e_value)]
+        tb_list = traceback.extract_tb(e_traceback)
+        for filename, line, funcname, text in tb_list:
+            t = f"Traceback:  File[{filename}] Line[{line}] Text[{text}]"
+            traceback_ln.append(t)
+
+        return TaskFailed(
+            model_class_name=task_message.model_cls.__name__,
+            model_construction_kwargs=task_message.model_construction_kwargs,
+            partition_initialise_kwargs=task_message.partition_initialise_kwargs,
+            method_name=task_message.method_name,
+            method_kwargs=task_message.method_kwargs,
+            resolver_context=context_kwargs,
+            exception_class_name=str(e_type),
+            traceback=traceback_ln,
+            task_id=task_message.task_id,
+        )
 
-                model = task_message.model_cls(**task_message.model_construction_kwargs)
-                model.set_logger(q_logger)
+    @staticmethod
+    def _worker_model(task_message, logger, worker_id, total_workers):
+        """
+        Build the model that runs the sub-task's method in a worker process.
 
-                # switch off STDOUT as I'm pretty sure it shouldn't be used by a process other than
-                # the parent as only the parent is joined to a terminal.
-                model.log_to_stdout = False
+        @param task_message: :class:`TaskPartition`
+        @return: instance of `task_message.model_cls`
+        """
+        model = task_message.model_cls(**task_message.model_construction_kwargs)
+        model.set_logger(logger)
 
-                if isinstance(model, ayeaye.PartitionedModel):
-                    model.runtime.worker_id = worker_id
-                    model.runtime.total_workers = total_workers
-                    model.partition_initialise(**task_message.partition_initialise_kwargs)
+        # switch off STDOUT as I'm pretty sure it shouldn't be used by a process other than
+        # the parent as only the parent is joined to a terminal.
+        model.log_to_stdout = False
 
-                # TODO - :meth:`log` for the worker processes should be connected back to the parent
-                # with a queue or pipe and it shouldn't be using stdout
+        if isinstance(model, ayeaye.PartitionedModel):
+            model.runtime.worker_id = worker_id
+            model.runtime.total_workers = total_workers
+            model.partition_initialise(**task_message.partition_initialise_kwargs)
 
-                sub_task_method = getattr(model, task_message.method_name)
+        return model
 
-                try:
-                    subtask_return_value = sub_task_method(**task_message.method_kwargs)
-                    task_msg = TaskComplete(
-                        model_cls_name=task_message.model_cls.__name__,
-                        method_name=task_message.method_name,
-                        method_kwargs=task_message.method_kwargs,
-                        return_value=subtask_return_value,
-                    )
 
-                except Exception as e:
-                    # TODO - this is a bit rough
-                    _e_type, e_value, e_traceback = sys.exc_info()
-                    traceback_ln = [str(e_value)]
-                    tb_list = traceback.extract_tb(e_traceback)
-                    for filename, line, funcname, text in tb_list:
-                        t = f"Traceback:  File[{filename}] Line[{line}] Text[{text}]"
-                        traceback_ln.append(t)
-
-                    task_msg = TaskFailed(
-                        model_class_name=task_message.model_cls.__name__,
-                        model_construction_kwargs=task_message.model_construction_kwargs,
-                        partition_initialise_kwargs=task_message.partition_initialise_kwargs,
-                        method_name=task_message.method_name,
-                        method_kwargs=task_message.method_kwargs,
-                        resolver_context=context_kwargs,
-                        exception_class_name=str(type(e)),
-                        traceback=traceback_ln,
-                    )
+class _ModelCache:
+    """
+    Least recently used initialised models in a worker process. @see `model_cache_size` in
+    :class:`LocalProcessPool`.
+    """
+
+    def __init__(self, maxsize):
+        """
+        @param maxsize: (int) 0 for no caching
+        """
+        self.maxsize = maxsize
+        self.models = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.models
+
+    @staticmethod
+    def key(task_message, context_kwargs):
+        """
+        @param task_message: :class:`TaskPartition`
+        @param context_kwargs: (dict) resolver context the sub-task runs in
+        @return: (hashable) models built for sub-tasks with the same key are interchangeable
+        """
+        kwargs = (
+            task_message.model_construction_kwargs,
+            task_message.partition_initialise_kwargs,
+            task_message.additional_context,
+            context_kwargs,
+        )
+        # dictionaries aren't hashable. Their pickles are (and these have just been unpickled).
+        return task_message.model_cls, pickle.dumps(kwargs, protocol=PICKLE_PROTOCOL)
+
+    def get(self, key):
+        "@return: cached model or None"
+        model = self.models.get(key)
+        if model is not None:
+            self.models.move_to_end(key)
+        return model
+
+    def put(self, key, model):
+        if self.maxsize == 0:
+            return
+
+        self.models[key] = model
+        self.models.move_to_end(key)
+        while len(self.models) > self.maxsize:
+            _, evicted = self.models.popitem(last=False)
+            evicted.close_datasets()
+
+    def discard(self, key):
+        "Forget a model without closing it."
+        self.models.pop(key, None)
+
+    def clear(self):
+        for model in self.models.values():
+            model.close_datasets()
+        self.models.clear()
+
+
+class _SubTaskDispatcher:
+    """
+    Gives the sub-tasks from one call to :meth:`LocalProcessPool.run_subtasks` to the workers and
+    keeps track of the sub-tasks each worker has been given.
+
+    It's used by the thread reading the sub-tasks iterator and the thread receiving messages from
+    the workers so all changes are made with `self.lock` held. The reading thread waits on
+    `self.lock` while the maximum number of sub-tasks are in flight.
+    """
+
+    # Chunks of sub-tasks given to a worker at once. More than one so a worker doesn't wait for the
+    # next chunk after sending results. Workers run their chunks in the order received.
+    worker_prefetch = 2
+
+    def __init__(self, pool, worker_ids, context_kwargs, max_in_flight, chunk_size=1):
+        """
+        @param pool: :class:`LocalProcessPool` with running workers
+        @param worker_ids: (sequence of int) workers to give sub-tasks to
+        @param context_kwargs: (dict) sent with each chunk of sub-tasks
+        @param max_in_flight: (int) limit for sub-tasks submitted but not finished
+        @param chunk_size: (int) maximum sub-tasks sent to a worker in one message
+        """
+        self.pool = pool
+        self.worker_ids = worker_ids
+        self.context_kwargs = context_kwargs
+        self.max_in_flight = max_in_flight
+        self.chunk_size = chunk_size
+        self.cancelled = False
+        self.lock = Condition()
+        self.backlog = deque()  # :class:`TaskPartition`s not given to a worker yet
+        self.assigned = {worker_id: deque() for worker_id in worker_ids}  # chunks of sub-tasks
+        self.submitted = 0
+        self.finished = 0
+        # id of a :class:`TaskPartition` -> attempt number, for sub-tasks that have been retried
+        self.attempts = {}
+        # heap of (time it's due, sequence, :class:`TaskPartition`) for sub-tasks to retry
+        self.retries = []
+        self.retry_sequence = count()
+        # worker_id -> [sub-tasks, cost, busy seconds] of finished chunks
+        self.worker_totals = {worker_id: [0, 0.0, 0.0] for worker_id in worker_ids}
+
+    @property
+    def all_finished(self):
+        with self.lock:
+            return self.finished == self.submitted
+
+    def wait_for_space(self):
+        """
+        Block until another sub-task can be submitted.
+
+        @return: (bool) False if the run has been cancelled
+        """
+        with self.lock:
+            self.lock.wait_for(
+                lambda: self.cancelled or self.submitted - self.finished < self.max_in_flight
+            )
+            return not self.cancelled
+
+    def cancel(self):
+        "Stop waiting for space. The run has finished or been abandoned."
+        with self.lock:
+            self.cancelled = True
+            self.lock.notify_all()
+
+    def submit(self, sub_task):
+        with self.lock:
+            self._add_to_backlog(sub_task)
+            self.submitted += 1
+            self._dispatch()
+
+    def attempt(self, sub_task):
+        "@return: (int) attempt number of the sub-task's current (or last) run. 1 for the first."
+        with self.lock:
+            return self.attempts.get(id(sub_task), 1)
+
+    def attempts_finished(self, sub_task):
+        "The sub-task won't be retried again."
+        with self.lock:
+            self.attempts.pop(id(sub_task), None)
+
+    def retry(self, sub_task, delay):
+        """
+        Run a failed sub-task again. It's in flight until the retry finishes.
+
+        @param delay: (float) seconds before it's given to a worker. @see :meth:`release_retries`
+        """
+        # a copy as the same :class:`TaskPartition` could have been submitted more than once
+        retry_task = copy.copy(sub_task)
+        with self.lock:
+            self.attempts[id(retry_task)] = self.attempts.pop(id(sub_task), 1) + 1
+            self.submitted += 1
+            due = time.monotonic() + delay
+            heapq.heappush(self.retries, (due, next(self.retry_sequence), retry_task))
+
+    def seconds_until_retry(self):
+        "@return: (float or None) until the next retry is due. None if there aren't any."
+        with self.lock:
+            if not self.retries:
+                return None
+            return max(0.0, self.retries[0][0] - time.monotonic())
+
+    def release_retries(self):
+        "Give the retries that are due to the workers."
+        with self.lock:
+            now = time.monotonic()
+            while self.retries and self.retries[0][0] <= now:
+                _, _, sub_task = heapq.heappop(self.retries)
+                self._add_to_backlog(sub_task)
+            self._dispatch()
+
+    def chunk_finished(self, worker_id, busy_seconds=0.0):
+        """
+        @param busy_seconds: (float) time the worker spent running the chunk
+        @return: (list of :class:`TaskPartition`) the chunk, in the order its results are sent
+        """
+        with self.lock:
+            chunk = self.assigned[worker_id].popleft()
+            self.finished += len(chunk)
+
+            totals = self.worker_totals[worker_id]
+            totals[0] += len(chunk)
+            totals[1] += sum(_cost(sub_task) for sub_task in chunk)
+            totals[2] += busy_seconds
+
+            self._dispatch()
+            self.lock.notify_all()
+
+        return chunk
+
+    def utilisation(self, run_seconds):
+        """
+        @param run_seconds: (float) duration of the run
+        @return: (list of :class:`WorkerUtilisation`)
+        """
+        with self.lock:
+            return [
+                WorkerUtilisation(worker_id, run_seconds, sub_tasks, cost, busy_seconds)
+                for worker_id, (sub_tasks, cost, busy_seconds) in self.worker_totals.items()
+            ]
+
+    def worker_exited(self, worker_id):
+        """
+        Replace the worker and give sub-tasks it hadn't started to other workers.
+
+        @return: (list of :class:`TaskPartition`) chunk that was running when the worker exited.
+            Empty if the worker wasn't running anything.
+        """
+        with self.lock:
+            assigned = self.assigned.get(worker_id, deque())
+            running_chunk = assigned.popleft() if assigned else []
+            self.finished += len(running_chunk)
+
+            for chunk in reversed(assigned):
+                self.backlog.extendleft(reversed(chunk))
+            assigned.clear()
+
+            self.pool._start_worker(worker_id)
+            self._dispatch()
+            self.lock.notify_all()
+
+        return running_chunk
+
+    def _add_to_backlog(self, sub_task):
+        """
+        Largest cost first. Sub-tasks with the same cost, or without one, keep their order. Call
+        with `self.lock` held.
+        """
+        cost = _cost(sub_task)
+        position = len(self.backlog)
+        while position > 0 and _cost(self.backlog[position - 1]) < cost:
+            position -= 1
+        self.backlog.insert(position, sub_task)
+
+    def _dispatch(self):
+        "Give waiting sub-tasks to the least busy workers. Call with `self.lock` held."
+        if self.cancelled:
+            return
+
+        def workload(worker_id):
+            # chunks first as that's the limit. Then the estimated cost of those chunks.
+            chunks = self.assigned[worker_id]
+            return len(chunks), sum(_cost(sub_task) for chunk in chunks for sub_task in chunk)
+
+        total_workers = len(self.worker_ids)
+        while self.backlog:
+            worker_id = min(self.worker_ids, key=workload)
+            if len(self.assigned[worker_id]) >= self.worker_prefetch:
+                break
+
+            chunk = self._next_chunk()
+            self.assigned[worker_id].append(chunk)
+            queue_put(self.pool._inboxes[worker_id], (self.context_kwargs, total_workers, chunk))
+
+    def _next_chunk(self):
+        """
+        Take sub-tasks from the front of the backlog that can share a model instance.
+
+        @return: (list of :class:`TaskPartition`)
+        """
+        chunk = [self.backlog.popleft()]
+        while (
+            self.backlog
+            and len(chunk) < self.chunk_size
+            and chunk[0].same_model_as(self.backlog[0])
+        ):
+            chunk.append(self.backlog.popleft())
+
+        return chunk
+
+
+def _cost(sub_task):
+    "@return: (float) estimated size of the :class:`TaskPartition`. 0 when it isn't known."
+    return sub_task.cost or 0
+
+
+# pools with running workers. They are stopped when the interpreter exits as it would otherwise wait
+# for the (non-daemonic) workers to end.
+_running_pools = WeakSet()
 
-                returns_queue.put(task_msg)
 
-                model.close_datasets()
+@atexit.register
+def _shutdown_running_pools():
+    for pool in list(_running_pools):
+        pool.shutdown(terminate=True)
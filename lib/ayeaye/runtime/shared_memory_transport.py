@@ -0,0 +1,157 @@
+"""
+Send large values (e.g. bytes, numpy arrays or Arrow buffers) from a worker process to the parent in
+:mod:`multiprocessing.shared_memory` blocks instead of copying them down a pipe.
+
+Messages are pickled with protocol 5. Each value of at least `threshold` bytes is copied into a
+shared memory block and just the block's name goes into the pickle. These values are `bytes`,
+`bytearray` and objects with buffers that can be pickled out-of-band (@see
+:class:`pickle.PickleBuffer`) such as numpy arrays and pyarrow objects. The parent copies the values
+out and unlinks the blocks as it unpickles the message.
+
+A block is left behind if the parent never unpickles the message, e.g. the worker was terminated.
+:mod:`multiprocessing`'s resource tracker unlinks these when the parent process exits.
+"""
+
+from dataclasses import dataclass
+import io
+from multiprocessing import shared_memory
+import pickle
+
+# Protocol 5 is needed for out-of-band buffers
+PICKLE_PROTOCOL = 5
+
+# persistent id tag for `bytes` and `bytearray` values in shared memory
+_SHARED_MEMORY_VALUE = "ayeaye_shared_memory"
+
+
+@dataclass
+class SharedMemoryMessage:
+    "A pickled message with it's out-of-band buffers in shared memory blocks."
+
+    message_bytes: bytes  # pickle without the out-of-band buffers
+    blocks: list  # (name, size in bytes) of the shared memory block for each out-of-band buffer
+
+    def load(self):
+        """
+        Unpickle the message and unlink the shared memory blocks.
+
+        @return: the original message
+        """
+        buffers = [_read_block(block_name, size, bytearray) for block_name, size in self.blocks]
+        return _unpickle(self.message_bytes, buffers=buffers)
+
+
+class _SharedMemoryPickler(pickle.Pickler):
+    """
+    `bytes` and `bytearray` are always pickled in-band so large ones are replaced with a persistent
+    id naming the shared memory block they have been copied to.
+
+    Note - :meth:`persistent_id` is called for every object so a message made of lots of small
+    objects is a little slower to pickle.
+    """
+
+    def __init__(self, file, threshold, **kwargs):
+        super().__init__(file, **kwargs)
+        self.threshold = threshold
+
+    def persistent_id(self, obj):
+        value_type = type(obj)
+        if (value_type is bytes or value_type is bytearray) and len(obj) >= self.threshold:
+            block_name = _write_block(obj)
+            return _SHARED_MEMORY_VALUE, block_name, len(obj), value_type.__name__
+
+        return None
+
+
+class _SharedMemoryUnpickler(pickle.Unpickler):
+    "Copy values from the shared memory blocks in the persistent ids made by the pickler."
+
+    value_types = {"bytes": bytes, "bytearray": bytearray}
+
+    def persistent_load(self, pid):
+        tag, block_name, size, type_name = pid
+        if tag != _SHARED_MEMORY_VALUE:
+            raise pickle.UnpicklingError(f"Unknown persistent id: {tag}")
+
+        return _read_block(block_name, size, self.value_types[type_name])
+
+
+def _write_block(value):
+    """
+    @param value: bytes like
+    @return: (str) name of a new shared memory block with a copy of `value`
+    """
+    size = memoryview(value).nbytes
+    block = shared_memory.SharedMemory(create=True, size=size)
+    block.buf[:size] = value
+    # the block stays until the parent unlinks it
+    block.close()
+    return block.name
+
+
+def _read_block(block_name, size, value_type):
+    """
+    @param value_type: (class) `bytes` or `bytearray`
+    @return: copy of the first `size` bytes of the shared memory block, which is unlinked
+    """
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        # the block could be bigger than requested as it's a whole number of pages
+        with block.buf[:size] as block_view:
+            return value_type(block_view)
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _unpickle(message_bytes, buffers=None):
+    return _SharedMemoryUnpickler(io.BytesIO(message_bytes), buffers=buffers).load()
+
+
+def dumps(message, threshold):
+    """
+    @param message: anything that can be pickled
+    @param threshold: (int) values of this many bytes or more are put in shared memory
+    @return: (bytes) pickle of the message or, if it has out-of-band buffers, of a
+        :class:`SharedMemoryMessage`. Either must be unpickled with :func:`loads`.
+    """
+    out_of_band = []
+
+    def buffer_callback(pickle_buffer):
+        "@return: (bool) serialise the buffer in-band"
+        try:
+            raw_buffer = pickle_buffer.raw()
+        except BufferError:
+            # not contiguous
+            return True
+
+        if raw_buffer.nbytes < threshold:
+            return True
+
+        out_of_band.append((_write_block(raw_buffer), raw_buffer.nbytes))
+        return False
+
+    message_file = io.BytesIO()
+    pickler = _SharedMemoryPickler(
+        message_file, threshold, protocol=PICKLE_PROTOCOL, buffer_callback=buffer_callback
+    )
+    pickler.dump(message)
+    message_bytes = message_file.getvalue()
+
+    if not out_of_band:
+        return message_bytes
+
+    shared_message = SharedMemoryMessage(message_bytes=message_bytes, blocks=out_of_band)
+    return pickle.dumps(shared_message, protocol=PICKLE_PROTOCOL)
+
+
+def loads(message_bytes):
+    """
+    @param message_bytes: (bytes) from :func:`dumps`
+    @return: the message. The shared memory blocks it used have been unlinked.
+    """
+    message = _unpickle(message_bytes)
+    if isinstance(message, SharedMemoryMessage):
+        return message.load()
+
+    return message
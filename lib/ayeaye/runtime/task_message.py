@@ -43,6 +43,23 @@ class TaskPartition(AbstractTaskMessage):
     # in addition to current resolver context (see :class:`ayeaye.connect_resolve.ConnectorResolver`)
     # optionally add these when running this task
     additional_context: dict = field(default_factory=dict)
+    # estimated size of the sub-task in any unit used by all the sub-tasks of a model (e.g. bytes
+    # to read). Larger sub-tasks are started first so a big one doesn't finish long after the rest.
+    cost: Optional[float] = None
+    # optional. Pools copy it to the sub-task's :class:`TaskComplete` or :class:`TaskFailed`
+    task_id: Optional[str] = None
+
+    def same_model_as(self, other):
+        """
+        @param other: :class:`TaskPartition`
+        @return: (bool) both sub-tasks could be run on one instance of the model
+        """
+        return (
+            self.model_cls is other.model_cls
+            and self.model_construction_kwargs == other.model_construction_kwargs
+            and self.partition_initialise_kwargs == other.partition_initialise_kwargs
+            and self.additional_context == other.additional_context
+        )
 
 
 @dataclass
@@ -51,6 +68,7 @@ class TaskComplete(AbstractTaskMessage):
     method_name: str
     method_kwargs: dict
     return_value: Any
+    task_id: Optional[str] = None  # from the :class:`TaskPartition`
 
 
 @dataclass
@@ -65,6 +83,7 @@ class TaskFailed(AbstractTaskMessage):
     traceback: list
     task_id: Optional[str] = None
     failure_origin_task_id: Optional[str] = None  # task_id of a failed subtask
+    attempt: int = 1  # the sub-task had been run this many times when it failed
 
 
 @dataclass
@@ -0,0 +1,244 @@
+"""
+Run :class:`ayeaye.PartitionedModel` sub-tasks in threads within the current process.
+"""
+
+from collections import deque
+import queue
+from threading import Condition, Lock, Thread
+
+from ayeaye.connect_resolve import connector_resolver
+from ayeaye.runtime.multiprocess import AbstractProcessPool, LocalProcessPool, _FeederFinished
+from ayeaye.runtime.task_message import TaskComplete, TaskLogMessage
+
+# Internal message. A worker thread has no more sub-tasks to run.
+_WORKER_FINISHED = object()
+
+
+class _MessageLogger:
+    """
+    Send log messages from a sub-task's model to the parent's :meth:`log` through the run's
+    message queue. It's the threaded equivalent of :class:`QueueLogger`.
+    """
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    def write(self, msg):
+        self.messages.put(TaskLogMessage(msg=msg))
+
+
+class LocalThreadPool(AbstractProcessPool):
+    """
+    Run sub-tasks in threads of the current process.
+
+    This is for models with sub-tasks that mostly wait for I/O, e.g. a :class:`RestfulConnector`
+    request, reading from S3 or a database query. There isn't a process to start or sub-tasks and
+    results to pickle but, because of the GIL, sub-tasks that need the CPU don't run in parallel so
+    :class:`LocalProcessPool` is better for those.
+
+    Each sub-task is run by a new instance of it's model with the resolver context given to
+    :meth:`run_subtasks` and the sub-task's `additional_context`. Each thread has it's own
+    context (@see :meth:`ConnectorResolver.isolated_thread`) so sub-tasks with different contexts
+    can run at the same time. Like a worker process, the thread doesn't see anything added to the
+    `connector_resolver` outside of these contexts.
+
+    A :class:`ayeaye.PartitionedModel` uses this pool when it's given one-
+
+    >>> model.process_pool = LocalThreadPool(max_threads=32)
+
+    or when :meth:`PartitionedModel.partition_plea` returns a `PartitionOption` with
+    `worker_type="thread"`.
+    """
+
+    def __init__(self, max_threads, in_flight_factor=2):
+        """
+        @param max_threads: (int) upper limit for number of threads running sub-tasks.
+        @param in_flight_factor: (int) sub-tasks read from the `sub_tasks` iterator given to
+            :meth:`run_subtasks` but not finished are limited to this multiple of the number of
+            threads. @see the same argument to :class:`LocalProcessPool`.
+        """
+        if in_flight_factor < 1:
+            raise ValueError("in_flight_factor must be a positive integer")
+
+        self.max_threads = max_threads
+        self.in_flight_factor = in_flight_factor
+        self._run_lock = Lock()
+
+    def run_subtasks(self, sub_tasks, context_kwargs=None, processes=None):
+        """
+        Generator yielding instances that are a subclass of :class:`AbstractTaskMessage`. These
+        are from subtasks.
+
+        `processes` is the number of threads. It can't be more than `self.max_threads`.
+
+        A thread can't be stopped part way through a sub-task. So, if the generator isn't run to
+        the end, the threads finish the sub-tasks they are running and then exit.
+
+        @see doc. string in :meth:`AbstractProcessPool.run_subtasks`
+        """
+        if processes is None:
+            processes = self.max_threads
+
+        if processes > self.max_threads:
+            raise ValueError(f"{processes} threads requested, max set to {self.max_threads}")
+
+        if not self._run_lock.acquire(blocking=False):
+            raise RuntimeError("This pool is already running sub-tasks")
+
+        run = _ThreadRun(
+            context_kwargs=context_kwargs or {},
+            total_workers=processes,
+            max_in_flight=self.in_flight_factor * processes,
+        )
+        try:
+            Thread(target=run.feed_sub_tasks, args=(sub_tasks,), daemon=True).start()
+            for worker_id in range(processes):
+                Thread(target=run.run_worker, args=(worker_id,), daemon=True).start()
+
+            running_workers = processes
+            while running_workers:
+                message = run.messages.get()
+                if message is _WORKER_FINISHED:
+                    running_workers -= 1
+
+                elif isinstance(message, _FeederFinished):
+                    if message.exception is not None:
+                        raise message.exception
+
+                else:
+                    # could be a log message or sub-task completed notification
+                    yield message
+
+        finally:
+            run.cancel()
+            self._run_lock.release()
+
+
+class _ThreadRun:
+    """
+    The sub-tasks from one call to :meth:`LocalThreadPool.run_subtasks`.
+
+    One thread reads the sub-tasks iterator and the worker threads take sub-tasks from
+    `self.backlog`. All changes are made with `self.lock` held. Messages for the caller, from all
+    the threads, go on `self.messages`.
+    """
+
+    def __init__(self, context_kwargs, total_workers, max_in_flight):
+        """
+        @param context_kwargs: (dict) resolver context for all the sub-tasks
+        @param total_workers: (int) number of worker threads
+        @param max_in_flight: (int) limit for sub-tasks read from the iterator but not finished
+        """
+        self.context_kwargs = context_kwargs
+        self.total_workers = total_workers
+        self.max_in_flight = max_in_flight
+        self.lock = Condition()
+        self.backlog = deque()  # :class:`TaskPartition`s not taken by a worker yet
+        self.in_flight = 0
+        self.feeder_finished = False
+        self.cancelled = False
+        self.messages = queue.Queue()
+
+    def cancel(self):
+        "Workers exit after their current sub-task and the iterator isn't read any further."
+        with self.lock:
+            self.cancelled = True
+            self.lock.notify_all()
+
+    def feed_sub_tasks(self, sub_tasks):
+        feeder_message = _FeederFinished()
+        sub_tasks_iterator = iter(sub_tasks)
+        try:
+            # back-pressure - the next sub-task is read when there is space for it
+            while self._wait_for_space():
+                try:
+                    sub_task = next(sub_tasks_iterator)
+                except StopIteration:
+                    break
+
+                with self.lock:
+                    self.backlog.append(sub_task)
+                    self.in_flight += 1
+                    self.lock.notify_all()
+        except Exception as e:
+            feeder_message = _FeederFinished(exception=e)
+
+        # before the workers can finish so the caller sees an exception from the iterator
+        self.messages.put(feeder_message)
+
+        with self.lock:
+            self.feeder_finished = True
+            self.lock.notify_all()
+
+    def _wait_for_space(self):
+        """
+        @return: (bool) False if the run has been cancelled
+        """
+        with self.lock:
+            self.lock.wait_for(lambda: self.cancelled or self.in_flight < self.max_in_flight)
+            return not self.cancelled
+
+    def _next_sub_task(self):
+        """
+        Block until there is a sub-task to run.
+
+        @return: :class:`TaskPartition` or None when there aren't any more
+        """
+        with self.lock:
+            self.lock.wait_for(lambda: self.cancelled or self.backlog or self.feeder_finished)
+            if self.cancelled or not self.backlog:
+                return None
+
+            return self.backlog.popleft()
+
+    def run_worker(self, worker_id):
+        logger = _MessageLogger(self.messages)
+        try:
+            while True:
+                task_message = self._next_sub_task()
+                if task_message is None:
+                    break
+
+                self.messages.put(self.run_sub_task(task_message, logger, worker_id))
+
+                with self.lock:
+                    self.in_flight -= 1
+                    self.lock.notify_all()
+        finally:
+            self.messages.put(_WORKER_FINISHED)
+
+    def run_sub_task(self, task_message, logger, worker_id):
+        """
+        Run the sub-task on a new model in this thread's own resolver context.
+
+        @param task_message: :class:`TaskPartition`
+        @return: :class:`TaskComplete` or :class:`TaskFailed`
+        """
+        if task_message.method_kwargs is None:
+            task_message.method_kwargs = {}
+
+        with connector_resolver.isolated_thread():
+            with connector_resolver.context(
+                **self.context_kwargs, **task_message.additional_context
+            ):
+                model = None
+                try:
+                    model = LocalProcessPool._worker_model(
+                        task_message, logger, worker_id, self.total_workers
+                    )
+                    sub_task_method = getattr(model, task_message.method_name)
+                    subtask_return_value = sub_task_method(**task_message.method_kwargs)
+                    return TaskComplete(
+                        model_cls_name=task_message.model_cls.__name__,
+                        method_name=task_message.method_name,
+                        method_kwargs=task_message.method_kwargs,
+                        return_value=subtask_return_value,
+                        task_id=task_message.task_id,
+                    )
+
+                except Exception:
+                    return LocalProcessPool._task_failed_message(task_message, self.context_kwargs)
+
+                finally:
+                    if model is not None:
+                        model.close_datasets()
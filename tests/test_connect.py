@@ -267,6 +267,16 @@ class TestConnect(unittest.TestCase):
         animals = Connect(engine_url="csv://" + EXAMPLE_CSV_PATH + ";encoding=magic_encoding")
         self.assertEqual("magic_encoding", animals.encoding)
 
+    def test_standalone_len_and_random_access(self):
+        animals = Connect(engine_url="csv://" + EXAMPLE_CSV_PATH)
+        self.assertEqual(2, animals.record_count())
+        self.assertEqual(2, len(animals))
+        self.assertEqual("Golden dart frog", animals[1].common_name)
+        self.assertEqual(["Crown of thorns starfish"], [a.common_name for a in animals[:1]])
+
+        names = [a.common_name for a in list(Connect(engine_url="csv://" + EXAMPLE_CSV_PATH))]
+        self.assertEqual(["Crown of thorns starfish", "Golden dart frog"], names)
+
     def test_construction_args(self):
         with self.assertRaises(ValueError, msg="Ref and engine_url are mutually exclusive"):
             Connect(ref="x", engine_url="tsv://" + EXAMPLE_TSV_PATH)
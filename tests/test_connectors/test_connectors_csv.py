@@ -92,10 +92,7 @@ class TestConnectorsCsv(unittest.TestCase):
         self.assertEqual(expected_path, a.file_path)
 
         c = CsvConnector("csv:///data/abc.csv;encoding=latin-1;start=3;end=100")
-        with self.assertRaises(NotImplementedError):
-            c.engine_params
-
-        a = c._engine_params
+        a = c.engine_params
         expected_path = "/data/abc.csv"
         if True or os.path.sep != "/":
             expected_path = expected_path.replace("/", os.path.sep)
@@ -391,3 +388,199 @@ class TestConnectorsCsv(unittest.TestCase):
         first_row = next(iter(c))
         self.assertIsInstance(first_row.when_spotted, datetime)
         self.assertEqual(first_row.when_spotted, datetime(2023, 7, 26))
+
+    def test_iter_batches(self):
+        """
+        Blocks of tuples, without a Pinnate per row. Missing values at the end of a row are None.
+        """
+        c = CsvConnector(
+            engine_url="csv://" + EXAMPLE_CSV_VENOMOUS,
+            transform_map={"toxic_scale": lambda v: int(v) if v else None},
+        )
+        batches = list(c.iter_batches(batch_size=3))
+
+        self.assertEqual([3, 1], [len(b) for b in batches])
+        self.assertEqual(("Crown of thorns starfish", "Indo-Pacific", 4), batches[0][0])
+        self.assertEqual(("Geo textile cone shell", "", None), batches[0][2])
+        self.assertEqual(("Stonefish", "All over", 6), batches[1][0])
+
+    def test_iter_batches_empty_file(self):
+        "Like iterating rows, an empty file without `field_names` has no batches"
+        empty_file = os.path.join(tempfile.mkdtemp(), "empty.csv")
+        open(empty_file, "w").close()
+
+        c = CsvConnector(engine_url="csv://" + empty_file)
+        self.assertEqual([], list(c.iter_batches()))
+        self.assertEqual([], list(c))
+
+    def test_iter_batches_columnar(self):
+        c = CsvConnector(engine_url="csv://" + EXAMPLE_CSV_PATH)
+
+        progress = []
+        batches = []
+        for batch in c.iter_batches(batch_size=1, columnar=True):
+            batches.append(batch)
+            progress.append(c.progress)
+
+        expected = [
+            {"common_name": ["Crown of thorns starfish"], "native_to": ["Indo-Pacific"]},
+            {"common_name": ["Golden dart frog"], "native_to": ["Colombia"]},
+        ]
+        self.assertEqual(expected, batches)
+
+        # progress is from the byte position in the underlying file
+        self.assertEqual(1.0, progress[-1])
+
+    def test_byte_ranges(self):
+        """
+        Each record is read by exactly one of the ranges; the header isn't a record.
+        """
+        c = CsvConnector(engine_url="csv://" + EXAMPLE_CSV_VENOMOUS)
+        all_records = [r.as_dict() for r in c]
+
+        for partition_count in [1, 2, 3, 7, 500]:
+            ranged_records = []
+            for start, end in c.byte_ranges(partition_count):
+                ranged = CsvConnector(
+                    engine_url=f"csv://{EXAMPLE_CSV_VENOMOUS};start={start};end={end}"
+                )
+                for r in ranged:
+                    ranged_records.append(r.as_dict())
+                    self.assertTrue(0 < ranged.progress <= 1.0)
+
+            self.assertEqual(all_records, ranged_records, f"Failed with {partition_count} ranges")
+
+    def test_byte_range_without_header(self):
+        "start and end don't need to be on record boundaries"
+        line_0 = "Yellow-necked mouse,Apodemus flavicollis,Europe\n"
+        c = CsvConnector(
+            engine_url=f"csv://{EXAMPLE_CSV_MICE};start=1;end={len(line_0) + 1}",
+            field_names=["common_name", "scientific_name", "geo_distribution"],
+        )
+        mice = [mouse.common_name for mouse in c]
+        self.assertEqual(1, len(mice), "Only the second record starts in the range")
+        self.assertNotEqual("Yellow-necked mouse", mice[0])
+
+    def test_len_and_random_access(self):
+        c = CsvConnector(engine_url="csv://" + EXAMPLE_CSV_VENOMOUS)
+        all_records = [r.as_dict() for r in c]
+
+        self.assertEqual(len(all_records), c.record_count())
+        self.assertEqual(len(all_records), len(c), "The index has been built")
+        self.assertEqual(all_records[2], c[2].as_dict())
+        self.assertEqual(all_records[-1], c[-1].as_dict())
+        self.assertEqual(all_records[1:3], [r.as_dict() for r in c[1:3]])
+        with self.assertRaises(IndexError):
+            c[len(all_records)]
+
+        # record counts within byte ranges
+        byte_ranges = c.byte_ranges(2, balance_records=True)
+        range_lengths = []
+        for start, end in byte_ranges:
+            ranged = CsvConnector(
+                engine_url=f"csv://{EXAMPLE_CSV_VENOMOUS};start={start};end={end}"
+            )
+            range_lengths.append(ranged.record_count())
+            self.assertEqual(ranged.record_count(), len([r for r in ranged]))
+        self.assertEqual([2, 2], range_lengths)
+
+    def test_persisted_line_index(self):
+        csv_file = os.path.join(tempfile.mkdtemp(), "ants.csv")
+        with open(csv_file, "w") as f:
+            f.write("common_name,colony_size\nBullet ant,1000\n\nFire ant,250000\n")
+
+        c = CsvConnector(engine_url="csv://" + csv_file, persist_line_index=True)
+        self.assertEqual(2, c.record_count(), "Blank lines aren't records")
+        self.assertEqual("Fire ant", c[1].common_name)
+        self.assertTrue(
+            os.path.exists(os.path.join(os.path.dirname(csv_file), ".ants.csv.ayeaye_index"))
+        )
+
+        # the index is rebuilt when the file changes
+        with open(csv_file, "a") as f:
+            f.write("Weaver ant,500000\n")
+        os.utime(csv_file, ns=(0, 0))
+
+        c = CsvConnector(engine_url="csv://" + csv_file, persist_line_index=True)
+        self.assertEqual(3, c.record_count())
+        self.assertEqual("Weaver ant", c[2].common_name)
+
+        c = CsvConnector(engine_url="csv://" + csv_file, persist_line_index=True)
+        self.assertEqual(3, len(c), "The index in the sidecar file is current")
+
+    def test_len_without_index(self):
+        """
+        len() doesn't build the index. `list(..)` and `bool(..)` call it so they would read the
+        file twice.
+        """
+        c = CsvConnector(engine_url="csv://" + EXAMPLE_CSV_VENOMOUS)
+        self.assertTrue(c)
+        records = list(c)
+        self.assertIsNone(c._line_index)
+        with self.assertRaises(TypeError):
+            len(c)
+
+        self.assertEqual(records[0].as_dict(), c[0].as_dict())
+        self.assertEqual(len(records), len(c))
+
+    def test_random_access_without_connecting(self):
+        "Records are read from the file in binary mode with the connector's encoding"
+        csv_file = os.path.join(tempfile.mkdtemp(), "cafes.csv")
+        with open(csv_file, "w", encoding="latin-1") as f:
+            f.write("name,town\nCaf\xe9 Nero,Ely\nCaf\xe9 Rouge,Bath\n")
+
+        c = CsvConnector(engine_url=f"csv://{csv_file};encoding=latin-1")
+        self.assertEqual("Caf\xe9 Rouge", c[1].name)
+        self.assertIsNone(c._file_handle)
+        self.assertFalse(c.is_connected)
+
+    def test_add_many_buffered(self):
+        csv_file = os.path.join(tempfile.mkdtemp(), "bats.csv")
+        c = CsvConnector(
+            engine_url="csv://" + csv_file,
+            access=ayeaye.AccessMode.WRITE,
+            field_names=["common_name", "wingspan_cm"],
+            transform_map={"wingspan_cm": lambda w: f"{w:.1f}"},
+            write_buffer_size=2,
+            file_buffer_size=1024 * 1024,
+        )
+        bat = {"common_name": "Noctule", "wingspan_cm": 35, "not_written": True}
+        c.add(bat)
+        bat["common_name"] = "Changed after add"
+        self.assertEqual(1, len(c._write_buffer), "Not yet written")
+
+        c.add_many(
+            [
+                ayeaye.Pinnate({"common_name": "Greater horseshoe", "wingspan_cm": 37.5}),
+                {"common_name": "Grey long-eared"},
+            ]
+        )
+        self.assertEqual(0, len(c._write_buffer), "All written at the end of add_many")
+        c.close_connection()
+
+        with open(csv_file, "r", encoding=c.encoding) as f:
+            csv_content = f.read()
+
+        expected_content = (
+            "common_name,wingspan_cm\n"
+            "Noctule,35.0\n"
+            "Greater horseshoe,37.5\n"
+            "Grey long-eared,\n"
+        )
+        self.assertEqual(expected_content, csv_content)
+
+    def test_add_not_buffered_by_default(self):
+        csv_file = os.path.join(tempfile.mkdtemp(), "bats.csv")
+        c = CsvConnector(
+            engine_url="csv://" + csv_file,
+            access=ayeaye.AccessMode.WRITE,
+            field_names=["common_name", "wingspan_cm"],
+            transform_map={"wingspan_cm": lambda w: f"{w:.1f}"},
+        )
+        c.add({"common_name": "Noctule", "wingspan_cm": 35})
+        self.assertEqual(0, len(c._write_buffer))
+
+        # the error is raised by the add that caused it
+        with self.assertRaises(ValueError):
+            c.add({"common_name": "Pipistrelle", "wingspan_cm": "about 20"})
+        c.close_connection()
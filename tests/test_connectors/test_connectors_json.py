@@ -3,6 +3,7 @@ import tempfile
 import unittest
 
 import ayeaye
+from ayeaye.connectors.json_backend import json_backends
 from ayeaye.connectors.json_connector import JsonConnector
 
 from . import TEST_DATA_PATH
@@ -16,6 +17,23 @@ class TestConnectors(unittest.TestCase):
         self.assertEqual("London", c.data.name)
         self.assertEqual("light intensity drizzle", c.data.weather.description)
 
+    def test_json_len_and_getitem(self):
+        c = JsonConnector(engine_url="json://" + EXAMPLE_JSON_PATH)
+        self.assertEqual(len(c.data.as_dict()), len(c))
+        self.assertEqual("London", c["name"])
+
+    def test_json_list_document(self):
+        "Documents in a list are Pinnate objects, as they are in a dictionary"
+        data_dir = tempfile.mkdtemp()
+        json_file = os.path.join(data_dir, "birds.json")
+        with open(json_file, "w") as f:
+            f.write('[{"name": "Robin"}, {"name": "Wren"}]')
+
+        c = JsonConnector(engine_url=f"json://{json_file}")
+        self.assertEqual(["Robin", "Wren"], [bird.name for bird in c.data])
+        self.assertEqual("Wren", c[1].name)
+        self.assertEqual(2, len(c))
+
     def test_json_write(self):
         data_dir = tempfile.mkdtemp()
         json_file = os.path.join(data_dir, "chips.json")
@@ -63,3 +81,27 @@ class TestConnectors(unittest.TestCase):
         self.assertIn(
             "Read attempted on dataset opened in AccessMode.WRITE mode.", str(context.exception)
         )
+
+    def test_json_backends(self):
+        data_dir = tempfile.mkdtemp()
+
+        for backend_name in json_backends.available():
+            json_file = os.path.join(data_dir, f"{backend_name}.json")
+            c = JsonConnector(
+                engine_url=f"json://{json_file};indent=2",
+                access=ayeaye.AccessMode.WRITE,
+                json_backend=backend_name,
+            )
+            c.data = {"Tiger": ["Asia"]}
+            c.close_connection()
+
+            c = JsonConnector(engine_url=f"json://{json_file}", json_backend=backend_name)
+            self.assertEqual(["Asia"], c.data.Tiger, f"Failed with {backend_name}")
+
+            with self.assertRaises(TypeError):
+                c = JsonConnector(
+                    engine_url=f"json://{json_file}",
+                    access=ayeaye.AccessMode.WRITE,
+                    json_backend=backend_name,
+                )
+                c.data = set([1, 2, 3])
@@ -3,11 +3,13 @@ Created on 17 Dec 2020
 
 @author: si
 """
+
 import os
 import tempfile
 import unittest
 
 import ayeaye
+from ayeaye.connectors.json_backend import json_backends
 from ayeaye.connectors.ndjson_connector import NdjsonConnector
 
 from . import TEST_DATA_PATH
@@ -43,3 +45,106 @@ class TestNdjsonConnector(unittest.TestCase):
             '{"common_name": "Warty frogfish"}\n' '{"common_name": "Hairy Frogfish"}\n'
         )
         self.assertEqual(expected_content, file_content)
+
+    def test_byte_ranges(self):
+        c = NdjsonConnector(engine_url="ndjson://" + EXAMPLE_NDJSON_UK_PUBS)
+        all_records = [r.as_dict() for r in c]
+
+        for partition_count in [1, 4, 100]:
+            ranged_records = []
+            for start, end in c.byte_ranges(partition_count):
+                ranged = NdjsonConnector(
+                    engine_url=f"ndjson://{EXAMPLE_NDJSON_UK_PUBS};start={start};end={end}"
+                )
+                ranged_records.extend([r.as_dict() for r in ranged])
+
+            self.assertEqual(all_records, ranged_records, f"Failed with {partition_count} ranges")
+
+    def test_json_backends(self):
+        """
+        Same records from all available backends. Progress is from the number of bytes read.
+        """
+        expected = [
+            pub.as_dict()
+            for pub in NdjsonConnector(engine_url="ndjson://" + EXAMPLE_NDJSON_UK_PUBS)
+        ]
+
+        for backend_name in json_backends.available():
+            c = NdjsonConnector(
+                engine_url="ndjson://" + EXAMPLE_NDJSON_UK_PUBS, json_backend=backend_name
+            )
+            progress = []
+            actual = []
+            for pub in c:
+                actual.append(pub.as_dict())
+                progress.append(c.progress)
+
+            self.assertEqual(expected, actual, f"Failed with {backend_name}")
+            self.assertEqual(1.0, progress[-1], f"Failed with {backend_name}")
+
+    def test_json_backend_default(self):
+        data_dir = tempfile.mkdtemp()
+        ndjson_file = os.path.join(data_dir, "frog_fish.ndjson")
+
+        c = NdjsonConnector(
+            engine_url="ndjson://" + ndjson_file,
+            access=ayeaye.AccessMode.WRITE,
+            json_backend="not_a_json_library",
+        )
+        with self.assertRaises(ValueError):
+            c.add({"common_name": "Warty frogfish"})
+
+        with self.assertRaises(ValueError):
+            json_backends.default = "not_a_json_library"
+
+        self.assertEqual("json", json_backends.default)
+
+    def test_len_and_random_access(self):
+        c = NdjsonConnector(engine_url="ndjson://" + EXAMPLE_NDJSON_UK_PUBS)
+        all_records = [r.as_dict() for r in c]
+
+        self.assertEqual(len(all_records), c.record_count())
+        self.assertEqual(len(all_records), len(c), "The index has been built")
+        self.assertEqual(all_records[3], c[3].as_dict())
+        self.assertEqual(all_records[::4], [r.as_dict() for r in c[::4]])
+
+        for start, end in c.byte_ranges(3, balance_records=True):
+            ranged = NdjsonConnector(
+                engine_url=f"ndjson://{EXAMPLE_NDJSON_UK_PUBS};start={start};end={end}"
+            )
+            self.assertIn(ranged.record_count(), [3, 4])
+            self.assertEqual([r.as_dict() for r in ranged][0], ranged[0].as_dict())
+
+    def test_add_not_buffered_by_default(self):
+        ndjson_file = os.path.join(tempfile.mkdtemp(), "frogfish.ndjson")
+        c = NdjsonConnector(engine_url="ndjson://" + ndjson_file, access=ayeaye.AccessMode.WRITE)
+        c.add({"common_name": "Warty frogfish"})
+        self.assertEqual(0, len(c._write_buffer))
+        c.close_connection()
+
+    def test_add_many_buffered(self):
+        ndjson_file = os.path.join(tempfile.mkdtemp(), "frogfish.ndjson")
+        c = NdjsonConnector(
+            engine_url="ndjson://" + ndjson_file,
+            access=ayeaye.AccessMode.WRITE,
+            write_buffer_size=2,
+        )
+        fish = {"common_name": "Warty frogfish"}
+        c.add(fish)
+        fish["common_name"] = "Changed after add"
+        c.add_many(
+            [ayeaye.Pinnate({"common_name": "Hairy Frogfish"}), {"common_name": "Sargassum"}]
+        )
+        self.assertEqual(0, len(c._write_buffer), "All written at the end of add_many")
+        c.flush()
+
+        with open(ndjson_file, "r", encoding=c.encoding) as f:
+            file_content = f.read()
+
+        expected_content = (
+            '{"common_name": "Warty frogfish"}\n'
+            '{"common_name": "Hairy Frogfish"}\n'
+            '{"common_name": "Sargassum"}\n'
+        )
+        self.assertEqual(expected_content, file_content)
+        c.close_connection()
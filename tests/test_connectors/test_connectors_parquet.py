@@ -1,5 +1,7 @@
 import os
+import tempfile
 import unittest
+from unittest import mock
 
 PANDAS_NOT_INSTALLED = False
 try:
@@ -8,11 +10,13 @@ except ModuleNotFoundError:
     pd = None
 
 try:
+    import pyarrow as pa
     import pyarrow.parquet as pq
 except ModuleNotFoundError:
     pq = None
 
 
+import ayeaye
 from ayeaye.connectors.parquet_connector import ParquetConnector
 
 from . import TEST_DATA_PATH
@@ -65,3 +69,221 @@ class TestParquetConnector(unittest.TestCase):
         self.assertEqual(
             "Alice", p["name"].iloc[0], "Can't find expected value in Pandas dataframe"
         )
+
+    def build_planets_file(self):
+        """
+        @return: (str) path to a parquet file with 3 row groups of 4 rows each
+        """
+        table = pa.table(
+            {
+                "planet_id": list(range(12)),
+                "name": [f"planet_{i}" for i in range(12)],
+                "moons": [i % 3 for i in range(12)],
+            }
+        )
+        parquet_file = os.path.join(tempfile.mkdtemp(), "planets.parquet")
+        pq.write_table(table, parquet_file, row_group_size=4)
+        return parquet_file
+
+    def test_columns_and_batches(self):
+        parquet_file = self.build_planets_file()
+        c = ParquetConnector(
+            engine_url="parquet://" + parquet_file, columns=["name", "moons"], batch_size=3
+        )
+
+        batch_sizes = []
+        for batch in c.iter_batches():
+            self.assertEqual(["name", "moons"], batch.schema.names)
+            batch_sizes.append(batch.num_rows)
+
+        self.assertEqual(12, sum(batch_sizes))
+        self.assertEqual(3, max(batch_sizes))
+
+        c = ParquetConnector(engine_url="parquet://" + parquet_file, columns=["name"])
+        self.assertEqual({"name": "planet_0"}, next(iter(c)).as_dict())
+
+    def test_filters_prune_row_groups(self):
+        parquet_file = self.build_planets_file()
+        c = ParquetConnector(
+            engine_url="parquet://" + parquet_file,
+            columns=["name"],
+            filters=[("planet_id", ">=", 5), ("moons", "in", [0, 2])],
+        )
+        planets = []
+        for planet in c:
+            planets.append(planet.name)
+            if len(planets) == 1:
+                self.assertEqual(8, c.row_count, "First row group should be skipped")
+
+        expected = ["planet_5", "planet_6", "planet_8", "planet_9", "planet_11"]
+        self.assertEqual(expected, planets)
+
+        c = ParquetConnector(
+            engine_url="parquet://" + parquet_file, filters=[("planet_id", "==", 100)]
+        )
+        self.assertEqual([], [planet for planet in c])
+
+        with self.assertRaises(ValueError):
+            ParquetConnector(engine_url="parquet://" + parquet_file, filters=[("moons", "~", 1)])
+
+    def test_write_rows_and_batches(self):
+        parquet_file = os.path.join(tempfile.mkdtemp(), "output", "rivers.parquet")
+        c = ParquetConnector(
+            engine_url="parquet://" + parquet_file,
+            access=ayeaye.AccessMode.WRITE,
+            row_group_size=4,
+        )
+        c.add({"name": "Severn", "length_km": 354})
+        c.add(ayeaye.Pinnate({"name": "Thames", "length_km": 346}))
+        c.add_batch({"name": ["Trent", "Great Ouse", "Wye"], "length_km": [297, 230, 250]})
+        c.add_batch(pa.table({"name": ["Ure"], "length_km": [119]}))
+        c.add({"name": "Tay", "length_km": 188})
+        c.close_connection()
+
+        metadata = pq.ParquetFile(parquet_file).metadata
+        self.assertEqual(2, metadata.num_row_groups)
+        self.assertEqual(4, metadata.row_group(0).num_rows)
+
+        c = ParquetConnector(engine_url="parquet://" + parquet_file)
+        rivers = [r.name for r in c]
+        expected = ["Severn", "Thames", "Trent", "Great Ouse", "Wye", "Ure", "Tay"]
+        self.assertEqual(expected, rivers)
+
+    def test_write_mixed_pending_schemas(self):
+        """
+        Records and batches buffered before the first row group is written are conformed to one
+        schema. A row of None doesn't give the column the null type.
+        """
+        parquet_file = os.path.join(tempfile.mkdtemp(), "rivers.parquet")
+        c = ParquetConnector(engine_url="parquet://" + parquet_file, access=ayeaye.AccessMode.WRITE)
+        c.add({"name": "Severn", "length_km": 354})
+        c.add_batch({"name": ["Trent"], "length_km": [297]})
+        c.add({"name": "Unknown", "length_km": None})
+        c.add_batch(pa.table({"length_km": [119], "name": ["Ure"]}))
+        c.add({"name": "Tay"})
+        c.close_connection()
+
+        table = pq.read_table(parquet_file)
+        self.assertEqual(pa.int64(), table.schema.field("length_km").type)
+        self.assertEqual([354, 297, None, 119, None], table.column("length_km").to_pylist())
+
+    def test_write_fields_missing_from_first_record(self):
+        "The schema has fields from all the buffered records, not just the first"
+        parquet_file = os.path.join(tempfile.mkdtemp(), "rivers.parquet")
+        c = ParquetConnector(engine_url="parquet://" + parquet_file, access=ayeaye.AccessMode.WRITE)
+        c.add({"name": "Severn"})
+        c.add({"name": "Trent", "length_km": 297})
+        c.close_connection()
+
+        table = pq.read_table(parquet_file)
+        self.assertEqual(["name", "length_km"], table.schema.names)
+        self.assertEqual([None, 297], table.column("length_km").to_pylist())
+
+    def test_write_mixed_pending_schemas_old_pyarrow(self):
+        "Before pyarrow 14 `unify_schemas` doesn't have the `promote_options` arg"
+        unify_schemas = pa.unify_schemas
+
+        def old_unify_schemas(schemas, **kwargs):
+            if kwargs:
+                raise TypeError("unify_schemas() got an unexpected keyword argument")
+            return unify_schemas(schemas)
+
+        parquet_file = os.path.join(tempfile.mkdtemp(), "rivers.parquet")
+        with mock.patch("pyarrow.unify_schemas", old_unify_schemas):
+            c = ParquetConnector(
+                engine_url="parquet://" + parquet_file, access=ayeaye.AccessMode.WRITE
+            )
+            c.add({"name": "Unknown", "length_km": None})
+            c.add_batch({"name": ["Trent"], "length_km": [297]})
+            c.close_connection()
+
+        table = pq.read_table(parquet_file)
+        self.assertEqual(pa.int64(), table.schema.field("length_km").type)
+        self.assertEqual([None, 297], table.column("length_km").to_pylist())
+
+    def test_write_with_schema(self):
+        parquet_file = os.path.join(tempfile.mkdtemp(), "lakes.parquet")
+        schema = pa.schema([("name", pa.string()), ("depth_m", pa.float32())])
+        c = ParquetConnector(
+            engine_url="parquet://" + parquet_file, access=ayeaye.AccessMode.WRITE, schema=schema
+        )
+        c.close_connection()
+        self.assertEqual(schema, pq.read_schema(parquet_file))
+
+        c = ParquetConnector(
+            engine_url="parquet://" + parquet_file, access=ayeaye.AccessMode.WRITE, schema=schema
+        )
+        c.add({"name": "Loch Ness", "depth_m": 227})
+        c.close_connection()
+        self.assertEqual(pa.float32(), pq.read_table(parquet_file).schema.field("depth_m").type)
+
+    def build_sales_dataset(self):
+        """
+        @return: (str) path to a hive partitioned dataset. e.g. <path>/year=2023/month=1/...
+        """
+        table = pa.table(
+            {
+                "year": [2023, 2023, 2024, 2024, 2024, 2024],
+                "month": [1, 2, 1, 1, 2, 3],
+                "amount": [10, 20, 30, 40, 50, 60],
+            }
+        )
+        dataset_path = tempfile.mkdtemp()
+        pq.write_to_dataset(table, dataset_path, partition_cols=["year", "month"])
+        return dataset_path
+
+    def test_dataset_url_filters(self):
+        dataset_path = self.build_sales_dataset()
+
+        c = ParquetConnector(engine_url="parquet://" + dataset_path)
+        self.assertEqual(210, sum(r.amount for r in c))
+
+        c = ParquetConnector(
+            engine_url=f"parquet://{dataset_path};filter=year=2024;filter=month>=2",
+            columns=["month", "amount"],
+        )
+        c.connect()
+        self.assertEqual(2, c.row_count, "Only two partitions should be opened")
+        sales = [r.as_dict() for r in c]
+        self.assertEqual([{"month": 2, "amount": 50}, {"month": 3, "amount": 60}], sales)
+
+        # the equality filter goes straight to the partition's directory
+        c = ParquetConnector(engine_url=f"parquet://{dataset_path};filter=year=2024")
+        c.connect()
+        self.assertTrue(all("year=2024" in f.path for f in c.fragments))
+        self.assertEqual(3, len(c.fragments), "One file per month")
+
+    def test_file_url_filters(self):
+        parquet_file = self.build_planets_file()
+        c = ParquetConnector(
+            engine_url=f"parquet://{parquet_file};filter=planet_id<4",
+            filters=[("moons", "!=", 0)],
+        )
+        self.assertEqual(["planet_1", "planet_2"], [r.name for r in c])
+
+        c = ParquetConnector(engine_url=f"parquet://{parquet_file};filter=no_such_column=1")
+        with self.assertRaises(ValueError):
+            c.connect()
+
+    def test_len_and_random_access(self):
+        parquet_file = self.build_planets_file()
+        c = ParquetConnector(engine_url="parquet://" + parquet_file, columns=["name"])
+        self.assertEqual(12, len(c))
+        self.assertEqual("planet_9", c[9].name)
+        self.assertEqual(["planet_3", "planet_4", "planet_5"], [r.name for r in c[3:6]])
+
+        c = ParquetConnector(engine_url="parquet://" + parquet_file, filters=[("moons", "=", 0)])
+        self.assertEqual(4, len(c))
+        self.assertEqual(9, c[-1].planet_id)
+
+        c = ParquetConnector(engine_url=f"parquet://{self.build_sales_dataset()};filter=year=2024")
+        self.assertEqual(4, len(c))
+        self.assertEqual(sorted([30, 40, 50, 60]), sorted(r.amount for r in c[:]))
+
+    def test_record_type(self):
+        parquet_file = self.build_planets_file()
+        c = ParquetConnector(engine_url="parquet://" + parquet_file, record_type=ayeaye.Record)
+        planets = [p for p in c]
+        self.assertIsInstance(planets[0], ayeaye.Record)
+        self.assertEqual("planet_3", planets[3].name)
+        self.assertEqual({"planet_id": 4, "name": "planet_4", "moons": 1}, c[4].as_dict())
@@ -42,6 +42,20 @@ class TestRestfulConnector(unittest.TestCase):
             msg,
         )
 
+    @responses.activate
+    def test_get_array(self):
+        "Documents in an array reply are Pinnate objects"
+        responses.add(
+            responses.GET,
+            "http://zooological-online.mock/parrots/",
+            json=[{"common_name": "African grey"}, {"common_name": "Kea"}],
+            status=200,
+        )
+
+        c = RestfulConnector(engine_url="http://zooological-online.mock")
+        parrots = c.get("/parrots/")
+        self.assertEqual(["African grey", "Kea"], [parrot.common_name for parrot in parrots])
+
     @responses.activate
     def test_post(self):
         "http POST a new document"
@@ -16,6 +16,7 @@ from tests.example_models import DependenciesModel, One, Two, Three, Four, Five,
 PROJECT_TEST_PATH = os.path.dirname(os.path.abspath(__file__))
 EXAMPLE_CSV_PATH = os.path.join(PROJECT_TEST_PATH, "data", "deadly_creatures.csv")
 EXAMPLE_TSV_PATH = os.path.join(PROJECT_TEST_PATH, "data", "monkeys.tsv")
+EXAMPLE_CSV_VENOMOUS = os.path.join(PROJECT_TEST_PATH, "data", "venomous_creatures.csv")
 
 
 class FindLongestAnimalName(ayeaye.PartitionedModel):
@@ -244,6 +245,38 @@ class ModelContextExample(ayeaye.PartitionedModel):
         self.log(f"task:{base_number} sees engine_url: {self.non_existant_data.engine_url}")
 
 
+class CreatureNamesByteRange(ayeaye.PartitionedModel):
+    """
+    Each sub-task reads a byte range from the same CSV file.
+    """
+
+    creatures = ayeaye.Connect(engine_url=f"csv://{EXAMPLE_CSV_VENOMOUS}")
+    creatures_range = ayeaye.Connect(
+        engine_url=f"csv://{EXAMPLE_CSV_VENOMOUS};start={{range_start}};end={{range_end}}"
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.common_names = []
+
+    def build(self):
+        pass
+
+    def partition_slice(self, partition_count):
+        for start, end in self.creatures.byte_ranges(partition_count):
+            yield TaskPartition(
+                model_cls=self.__class__,
+                method_name="creature_names",
+                additional_context={"range_start": str(start), "range_end": str(end)},
+            )
+
+    def creature_names(self):
+        return [creature.common_name for creature in self.creatures_range]
+
+    def partition_subtask_complete(self, task_message):
+        self.common_names.extend(task_message.return_value)
+
+
 class TestPartitionedModel(unittest.TestCase):
     def setUp(self):
         self._working_directory = None
@@ -526,3 +559,21 @@ class TestPartitionedModel(unittest.TestCase):
 
         expected_data = "Crown of thorns starfish"
         self.assertEqual(expected_data, output_data)
+
+    def test_byte_range_sub_tasks(self):
+        """
+        Split one file into byte ranges, one range per sub-task.
+        """
+        for max_concurrent_tasks in [1, 3]:
+            m = CreatureNamesByteRange()
+            m.log_to_stdout = False
+            m.runtime.max_concurrent_tasks = max_concurrent_tasks
+            m.go()
+
+            expected = [
+                "Crown of thorns starfish",
+                "Golden dart frog",
+                "Geo textile cone shell",
+                "Stonefish",
+            ]
+            self.assertEqual(sorted(expected), sorted(m.common_names))
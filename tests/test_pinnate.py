@@ -183,6 +183,135 @@ class TestPinnate(unittest.TestCase):
         p_hydrated = pickle.loads(pinnate_text)
         self.assertEqual(None, p_hydrated.as_native())
 
+    def test_serialise_protocol_5(self):
+        d = {"a": {"b": [{"c": 1}]}, "d": {1, 2}}
+        for p in [Pinnate(d), Pinnate.wrap(d)]:
+            p.a.b  # wrapped values are cached and shouldn't be pickled
+            p_hydrated = pickle.loads(pickle.dumps(p, protocol=5))
+            self.assertEqual(p.as_dict(), p_hydrated.as_dict())
+            self.assertEqual(1, p_hydrated.a.b[0].c)
+
+        p_hydrated.a.b[0].c = 2
+        self.assertEqual(2, p_hydrated.as_dict()["a"]["b"][0]["c"], "Still adopting after pickle")
+
+        # state from before :meth:`Pinnate.__reduce__`
+        p = Pinnate.__new__(Pinnate)
+        p.__setstate__({"pinnate_data": {"a": {"b": 1}}})
+        self.assertEqual(1, p.a.b)
+
+    def test_nested_wrapping_is_cached(self):
+        p = Pinnate({"products": [{"price": 1}, {"price": 2}], "owner": {"name": "Ann"}})
+        self.assertIs(p.owner, p.owner, "Dictionary isn't re-wrapped on each access")
+        self.assertIs(p.products, p.products, "List isn't re-wrapped on each access")
+        self.assertIs(p.products[0], p.products[0])
+        self.assertEqual(2, p.products[1].price)
+
+        # setting a key discards the cached version
+        p.products = [{"price": 3}]
+        self.assertEqual(3, p.products[0].price)
+        p["owner"] = {"name": "Bob"}
+        self.assertEqual("Bob", p.owner.name)
+        p.update({"products": []})
+        self.assertEqual([], p.products)
+        self.assertEqual({"products": [], "owner": {"name": "Bob"}}, p.as_dict())
+
+    def test_wrap_items_and_values(self):
+        "Nested dictionaries are Pinnate objects, as they are in an eager Pinnate"
+        d = {"name": "Ann", "address": {"city": "Leeds"}}
+        for p in [Pinnate(d), Pinnate.wrap(d)]:
+            items = dict(p.items())
+            self.assertEqual("Leeds", items["address"].city)
+            self.assertEqual("Ann", items["name"])
+            self.assertEqual("Leeds", dict(iter(p))["address"].city)
+            self.assertIsInstance(list(p.values())[1], Pinnate)
+
+    def test_changes_through_nested_lists(self):
+        """
+        Dictionaries in lists share the payload's dictionaries and changes to lists are made to the
+        payload's list so they are kept.
+        """
+        for p in [
+            Pinnate({"lines": [{"price": 1}]}),
+            Pinnate.wrap({"lines": [{"price": 1}]}),
+        ]:
+            p.lines[0].price = 5
+            self.assertEqual(5, p.lines[0].price)
+            self.assertEqual({"lines": [{"price": 5}]}, p.as_dict())
+
+            p.lines.append(Pinnate({"price": 2}))
+            p.lines.append({"price": 3})
+            p.lines[2].price = 4
+            self.assertEqual(3, len(p.lines))
+            self.assertEqual(2, p.lines[1].price)
+            self.assertEqual({"lines": [{"price": 5}, {"price": 2}, {"price": 4}]}, p.as_dict())
+
+            p.lines[0] = {"price": 6}
+            del p.lines[1]
+            p.lines.insert(0, {"price": 7})
+            self.assertEqual(7, p.lines[0].price)
+            self.assertEqual({"lines": [{"price": 7}, {"price": 6}, {"price": 4}]}, p.as_dict())
+
+            p.lines.sort(key=lambda line: line.price)
+            self.assertEqual([4, 6, 7], [line.price for line in p.lines])
+            self.assertEqual(4, p.as_dict()["lines"][0]["price"])
+
+            self.assertEqual(4, p.lines.pop(0).price)
+            self.assertEqual({"lines": [{"price": 6}, {"price": 7}]}, p.as_dict())
+
+    def test_changes_through_nested_dictionaries(self):
+        "Dictionaries set as values of an eager Pinnate are changed, not copies of them"
+        p = Pinnate({})
+        p.x = {"k": 1}
+        p.x["k"] = 2
+        self.assertEqual({"x": {"k": 2}}, p.as_dict())
+
+        p.x.k = 3
+        self.assertEqual(3, p.x.k)
+        self.assertEqual({"x": {"k": 3}}, p.as_dict())
+
+    def test_wrap_list(self):
+        "Dictionaries in a list payload are Pinnate objects, as they are in an eager Pinnate"
+        d = [{"name": "Ann"}, {"name": "Bob"}, 3]
+        for p in [Pinnate(d), Pinnate.wrap(d)]:
+            self.assertEqual(["Ann", "Bob"], [x.name for x in p if isinstance(x, Pinnate)])
+            self.assertEqual("Bob", list(p.values())[1].name)
+            self.assertEqual("Ann", p[0].name)
+            self.assertEqual(3, p[2])
+
+        p = Pinnate.wrap(d)
+        self.assertEqual(["Ann", "Bob"], [x.name for x in p[:2]])
+        p[1].name = "Bobby"
+        self.assertEqual("Bobby", d[1]["name"])
+
+    def test_wrap_without_copying(self):
+        d = {"name": "Ann", "address": {"city": "Leeds"}, "orders": [{"id": 1}]}
+        p = Pinnate.wrap(d)
+        self.assertIs(d, p.as_dict(), "Unchanged so the original is returned")
+        self.assertIs(d, p.as_native())
+
+        # nested values are wrapped when accessed, as they would be in an eager Pinnate
+        self.assertIsInstance(p.address, Pinnate)
+        self.assertIsInstance(p["address"], Pinnate)
+        self.assertEqual(Pinnate(d).as_dict(), p.as_dict())
+        self.assertEqual(1, p.orders[0].id)
+
+        # changes are made to the original
+        p.address.city = "York"
+        p.orders[0].id = 2
+        p.email = "ann@example.com"
+        p["manager"] = Pinnate({"name": "Bob"})
+        p.update({"name": "Annie"})
+        expected = {
+            "name": "Annie",
+            "address": {"city": "York"},
+            "orders": [{"id": 2}],
+            "email": "ann@example.com",
+            "manager": {"name": "Bob"},
+        }
+        self.assertEqual(expected, d)
+        self.assertIs(d, p.as_dict())
+        self.assertEqual("Bob", p.manager.name)
+
 
 if __name__ == "__main__":
     unittest.main()
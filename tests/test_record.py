@@ -0,0 +1,95 @@
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+
+import ayeaye
+from ayeaye.connectors.csv_connector import CsvConnector
+from ayeaye.connectors.ndjson_connector import NdjsonConnector
+from ayeaye.connectors.parquet_connector import ParquetConnector
+from ayeaye.pinnate import Pinnate
+from ayeaye.record import Record, record_class
+
+from .test_connectors import TEST_DATA_PATH
+
+
+class TestRecord(unittest.TestCase):
+    def test_attrib_and_dict(self):
+        r = Record({"my_string": "abcdef", "not an identifier": 1, "count": 2})
+        self.assertEqual("abcdef", r.my_string)
+        self.assertEqual("abcdef", r["my_string"])
+        self.assertEqual(1, r["not an identifier"])
+        self.assertEqual(2, r["count"], "Field with the same name as a method")
+        self.assertEqual("abcdef", r[0])
+        self.assertIn("my_string", r)
+        self.assertEqual({"my_string": "abcdef", "not an identifier": 1, "count": 2}, r.as_dict())
+        self.assertEqual({"count": 2}, r.as_dict(select_fields=["count"]))
+        self.assertIsNone(r.get("missing"))
+
+        with self.assertRaises(AttributeError):
+            r.missing
+
+        with self.assertRaises(AttributeError):
+            r.my_string = "read only"
+
+    def test_shared_class(self):
+        a = Record({"x": 1, "y": 2})
+        b = Record({"x": 3, "y": 4})
+        self.assertIs(type(a), type(b))
+        self.assertIs(type(a), record_class(("x", "y")))
+        self.assertLess(sys.getsizeof(a), sys.getsizeof(Pinnate({"x": 1, "y": 2}).as_dict()))
+
+    def test_pickle(self):
+        r = Record({"x": 1, "y": [1, 2]})
+        r_copy = pickle.loads(pickle.dumps(r))
+        self.assertEqual(r.as_dict(), r_copy.as_dict())
+        self.assertEqual(1, r_copy.x)
+
+    def test_connector_record_type(self):
+        csv_path = f"{TEST_DATA_PATH}/deadly_creatures.csv"
+        c = CsvConnector(engine_url="csv://" + csv_path, record_type=Record)
+        as_records = [r.as_dict() for r in c]
+        c = CsvConnector(engine_url="csv://" + csv_path)
+        as_pinnates = [r.as_dict() for r in c]
+        self.assertEqual(as_pinnates, as_records)
+
+        c = NdjsonConnector(
+            engine_url=f"ndjson://{TEST_DATA_PATH}/uk_pubs.ndjson", record_type=Record
+        )
+        self.assertIsInstance(c[0], Record)
+
+    def test_extra_csv_values(self):
+        "csv.DictReader puts values beyond the header under the None key"
+        csv_path = os.path.join(tempfile.mkdtemp(), "extra.csv")
+        with open(csv_path, "w") as f:
+            f.write("a,b\n1,2\n3,4,5\n")
+
+        c = CsvConnector(engine_url="csv://" + csv_path, record_type=Record)
+        records = list(c)
+        self.assertEqual("3", records[1].a)
+        self.assertEqual(["5"], records[1][None])
+
+    def test_write_records(self):
+        "Records read with `record_type=Record` can be written by the same connector types"
+        output_dir = tempfile.mkdtemp()
+        csv_path = f"{TEST_DATA_PATH}/deadly_creatures.csv"
+        expected = [r.as_dict() for r in CsvConnector(engine_url="csv://" + csv_path)]
+
+        for engine_type, connector_cls in [
+            ("csv", CsvConnector),
+            ("ndjson", NdjsonConnector),
+            ("parquet", ParquetConnector),
+        ]:
+            output_path = os.path.join(output_dir, f"creatures.{engine_type}")
+            output = connector_cls(
+                engine_url=f"{engine_type}://{output_path}", access=ayeaye.AccessMode.WRITE
+            )
+            for r in CsvConnector(engine_url="csv://" + csv_path, record_type=Record):
+                output.add(r)
+            output.close_connection()
+
+            written = [
+                r.as_dict() for r in connector_cls(engine_url=f"{engine_type}://{output_path}")
+            ]
+            self.assertEqual(expected, written, engine_type)
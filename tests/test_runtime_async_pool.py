@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+import unittest
+
+import ayeaye
+from ayeaye.runtime.async_pool import LocalAsyncPool
+from ayeaye.runtime.task_message import TaskComplete, TaskFailed, TaskLogMessage, TaskPartition
+
+
+class SlowFetch(ayeaye.PartitionedModel):
+    """
+    Sub-tasks that wait, like an API request would, and resolve a template variable from their
+    own context before and after waiting.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.fetched = {}
+
+    def partition_plea(self):
+        return ayeaye.PartitionedModel.PartitionOption(
+            minimum=1, maximum=50, optimal=50, worker_type="async"
+        )
+
+    def build(self):
+        pass
+
+    def partition_slice(self, partition_count):
+        return [
+            TaskPartition(
+                model_cls=self.__class__,
+                method_name="fetch",
+                method_kwargs={"page": page},
+                additional_context={"page_url": f"https://example.com/{page}"},
+            )
+            for page in range(50)
+        ]
+
+    async def fetch(self, page):
+        before = ayeaye.connector_resolver.resolve("{page_url}")
+        self.log(f"Fetching page {page}")
+        await asyncio.sleep(0.2)
+        after = ayeaye.connector_resolver.resolve("{page_url}")
+        return page, before, after
+
+    def fail(self):
+        raise ValueError("Sub-task failed")
+
+    def partition_subtask_complete(self, task_message):
+        page, before, after = task_message.return_value
+        self.fetched[page] = (before, after)
+
+
+class TestRuntimeAsyncPool(unittest.TestCase):
+    def test_concurrent_sub_tasks(self):
+        """
+        `async def` sub-tasks run concurrently, each in it's own resolver context. The model chose
+        the async pool with `partition_plea`.
+        """
+        model = SlowFetch()
+        start_time = time.perf_counter()
+        model.go()
+        elapsed = time.perf_counter() - start_time
+
+        self.assertIsInstance(model.process_pool, LocalAsyncPool)
+        self.assertEqual(50, len(model.fetched))
+        for page, (before, after) in model.fetched.items():
+            self.assertEqual(f"https://example.com/{page}", before)
+            self.assertEqual(before, after)
+
+        # 50 sub-tasks waiting for 0.2 seconds each
+        self.assertLess(elapsed, 5)
+
+    def test_async_stream(self):
+        """
+        Messages can be read with `async for` and the sub-tasks can come from an asynchronous
+        iterator.
+        """
+
+        async def sub_tasks():
+            yield TaskPartition(model_cls=SlowFetch, method_name="fail")
+            for page in range(3):
+                yield TaskPartition(
+                    model_cls=SlowFetch,
+                    method_name="fetch",
+                    method_kwargs={"page": page},
+                    additional_context={"page_url": f"page_{page}"},
+                )
+
+        async def run():
+            pool = LocalAsyncPool(max_concurrent=2)
+            return [message async for message in pool.run_subtasks_async(sub_tasks())]
+
+        messages = asyncio.run(run())
+
+        completed = sorted(m.return_value for m in messages if isinstance(m, TaskComplete))
+        self.assertEqual([(p, f"page_{p}", f"page_{p}") for p in range(3)], completed)
+
+        failed = [m for m in messages if isinstance(m, TaskFailed)]
+        self.assertEqual(["Sub-task failed"], [m.traceback[0] for m in failed])
+
+        logs = [m for m in messages if isinstance(m, TaskLogMessage)]
+        self.assertEqual(3, len(logs))
+
+    def test_blocking_sub_tasks_iterator(self):
+        """
+        A blocking `partition_slice` generator doesn't stop sub-tasks that are already running.
+        The first sub-task releases the generator.
+        """
+        released = threading.Event()
+        generator_released = []
+
+        class ReleaseGenerator(SlowFetch):
+            async def release(self):
+                # the other worker reads the next sub-task while this waits
+                await asyncio.sleep(0.1)
+                released.set()
+                return 0, None, None
+
+        def sub_tasks():
+            yield TaskPartition(model_cls=ReleaseGenerator, method_name="release")
+            # would wait until the timeout if this blocked the event loop
+            generator_released.append(released.wait(timeout=10))
+            yield TaskPartition(
+                model_cls=ReleaseGenerator,
+                method_name="fetch",
+                method_kwargs={"page": 1},
+                additional_context={"page_url": "page_1"},
+            )
+
+        pool = LocalAsyncPool(max_concurrent=2)
+        messages = list(pool.run_subtasks(sub_tasks=sub_tasks()))
+
+        self.assertEqual([True], generator_released)
+        self.assertEqual(2, len([m for m in messages if isinstance(m, TaskComplete)]))
+
+    def test_sub_tasks_iterator_exception(self):
+        def sub_tasks():
+            yield TaskPartition(model_cls=SlowFetch, method_name="fail")
+            raise KeyError("no more tasks")
+
+        pool = LocalAsyncPool(max_concurrent=2)
+        with self.assertRaises(KeyError):
+            list(pool.run_subtasks(sub_tasks=sub_tasks()))
+
+        with self.assertRaises(ValueError):
+            list(pool.run_subtasks(sub_tasks=sub_tasks(), processes=3))
@@ -0,0 +1,260 @@
+from io import StringIO
+import os
+import tempfile
+import threading
+import unittest
+
+import ayeaye
+from ayeaye.runtime.checkpoint import AbstractCheckpoint, SqliteCheckpoint
+from ayeaye.runtime.multiprocess import AbstractProcessPool, LocalProcessPool
+from ayeaye.runtime.task_message import TaskComplete, TaskPartition
+
+from tests.example_models import DependenciesModel, One
+from tests.test_model_partitioned import CreatureNamesByteRange
+
+
+class SquareNumbers(ayeaye.PartitionedModel):
+    """
+    Sub-tasks square a number. The sub-task for `fail_on` raises an exception.
+    """
+
+    fail_on = None
+    # numbers squared by sub-tasks running in this process
+    squared = []
+
+    def __init__(self):
+        super().__init__()
+        self.results = {}
+        self.completed = False
+
+    def partition_plea(self):
+        return ayeaye.PartitionedModel.PartitionOption(minimum=1, maximum=1, optimal=1)
+
+    def build(self):
+        pass
+
+    def partition_slice(self, partition_count):
+        return [("square", {"number": number}) for number in range(6)]
+
+    def square(self, number):
+        if number == self.fail_on:
+            raise ValueError(f"Can't square {number}")
+        SquareNumbers.squared.append(number)
+        return number * number
+
+    def partition_subtask_complete(self, task_message):
+        self.results[task_message.method_kwargs["number"]] = task_message.return_value
+
+    def partition_complete(self):
+        self.completed = True
+
+
+class SquareNumbersInWorkers(SquareNumbers):
+    def partition_plea(self):
+        return ayeaye.PartitionedModel.PartitionOption(minimum=1, maximum=2, optimal=2)
+
+
+class SerialPool(AbstractProcessPool):
+    "Minimal pool from outside Aye-aye. It only knows about :class:`TaskPartition` sub-tasks."
+
+    def __init__(self):
+        self.sub_tasks = []
+
+    def run_subtasks(self, sub_tasks, context_kwargs=None, processes=None):
+        for sub_task in sub_tasks:
+            assert isinstance(sub_task, TaskPartition)
+            self.sub_tasks.append(sub_task)
+            model = sub_task.model_cls(**sub_task.model_construction_kwargs)
+            yield TaskComplete(
+                model_cls_name=sub_task.model_cls.__name__,
+                method_name=sub_task.method_name,
+                method_kwargs=sub_task.method_kwargs,
+                return_value=getattr(model, sub_task.method_name)(**sub_task.method_kwargs),
+                task_id=sub_task.task_id,
+            )
+
+
+class CrashingCreatureNames(CreatureNamesByteRange):
+    """
+    Three sub-tasks that only differ in their resolver context. With `crash` all but the first
+    fail.
+    """
+
+    crash = False
+
+    def partition_plea(self):
+        return ayeaye.PartitionedModel.PartitionOption(minimum=1, maximum=1, optimal=1)
+
+    def partition_slice(self, partition_count):
+        yield from super().partition_slice(3)
+
+    def creature_names(self):
+        if self.crash and ayeaye.connector_resolver.resolve("{range_start}") != "0":
+            raise ValueError("Crashed")
+        return super().creature_names()
+
+
+class TestRuntimeCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.checkpoint_path = os.path.join(tempfile.mkdtemp(), "checkpoint.sqlite")
+        SquareNumbers.fail_on = None
+        SquareNumbers.squared = []
+
+    def test_key(self):
+        def key(**kwargs):
+            task_kwargs = {"model_cls": SquareNumbers, "method_name": "square"}
+            task_kwargs.update(kwargs)
+            return AbstractCheckpoint.key(TaskPartition(**task_kwargs))
+
+        k = key(method_kwargs={"a": 1, "b": [2, 3]})
+        self.assertEqual(k, key(method_kwargs={"b": [2, 3], "a": 1}))
+        self.assertNotEqual(k, key(method_kwargs={"a": 2}))
+        self.assertNotEqual(k, key(method_name="cube", method_kwargs={"a": 1, "b": [2, 3]}))
+        self.assertNotEqual(
+            k, key(model_cls=SquareNumbersInWorkers, method_kwargs={"a": 1, "b": [2, 3]})
+        )
+
+        for other_kwargs in [
+            "model_construction_kwargs",
+            "partition_initialise_kwargs",
+            "additional_context",
+        ]:
+            other = {"method_kwargs": {"a": 1, "b": [2, 3]}, other_kwargs: {"x": 1}}
+            self.assertNotEqual(k, key(**other), other_kwargs)
+
+    def test_resume_failed_run(self):
+        """
+        Sub-tasks completed before a run failed aren't run again. Their results are replayed.
+        """
+        SquareNumbers.fail_on = 4
+        model = SquareNumbers()
+        model.log_to_stdout = False
+        model.checkpoint = SqliteCheckpoint(self.checkpoint_path)
+        with self.assertRaises(ValueError):
+            model.go()
+
+        self.assertEqual([0, 1, 2, 3], SquareNumbers.squared)
+
+        SquareNumbers.fail_on = None
+        SquareNumbers.squared = []
+        model = SquareNumbers()
+        model.log_to_stdout = False
+        model.checkpoint = SqliteCheckpoint(self.checkpoint_path)
+        model.go()
+
+        self.assertEqual([4, 5], SquareNumbers.squared)
+        self.assertEqual({n: n * n for n in range(6)}, model.results)
+        self.assertTrue(model.completed)
+
+        # the run finished so the next one starts again
+        first = TaskPartition(
+            model_cls=SquareNumbers, method_name="square", method_kwargs={"number": 0}
+        )
+        self.assertIsNone(model.checkpoint.completed(first))
+
+    def test_resume_sub_tasks_with_context(self):
+        """
+        Sub-tasks that only differ in `additional_context` are different sub-tasks.
+        """
+        CrashingCreatureNames.crash = True
+        model = CrashingCreatureNames()
+        model.log_to_stdout = False
+        model.checkpoint = SqliteCheckpoint(self.checkpoint_path)
+        with self.assertRaises(ValueError):
+            model.go()
+
+        CrashingCreatureNames.crash = False
+        model = CrashingCreatureNames()
+        model.log_to_stdout = False
+        model.checkpoint = SqliteCheckpoint(self.checkpoint_path)
+        model.go()
+
+        expected = [c.common_name for c in CreatureNamesByteRange().creatures]
+        self.assertEqual(4, len(set(expected)))
+        self.assertEqual(expected, model.common_names)
+
+    def test_resume_with_process_pool(self):
+        checkpoint = SqliteCheckpoint(self.checkpoint_path)
+        for number in [1, 3]:
+            checkpoint.record(
+                TaskPartition(
+                    model_cls=SquareNumbersInWorkers,
+                    method_name="square",
+                    method_kwargs={"number": number},
+                ),
+                TaskComplete(
+                    model_cls_name="SquareNumbersInWorkers",
+                    method_name="square",
+                    method_kwargs={"number": number},
+                    return_value="from checkpoint",
+                ),
+            )
+
+        model = SquareNumbersInWorkers()
+        model.log_to_stdout = False
+        model.runtime.max_concurrent_tasks = 2
+        model.process_pool = LocalProcessPool(max_processes=2)
+        model.checkpoint = checkpoint
+        model.go()
+
+        expected = {0: 0, 1: "from checkpoint", 2: 4, 3: "from checkpoint", 4: 16, 5: 25}
+        self.assertEqual(expected, model.results)
+
+    def test_resume_dependency_driven_runner(self):
+        """
+        The runner's `partition_slice` waits for completed models before it yields the models that
+        depend on them. Replayed completions reach it without waiting for other messages.
+        """
+        checkpoint = SqliteCheckpoint(self.checkpoint_path)
+        checkpoint.record(
+            TaskPartition(model_cls=One, method_name="go"),
+            TaskComplete(
+                model_cls_name="One", method_name="go", method_kwargs={}, return_value=None
+            ),
+        )
+
+        model_runner = DependenciesModel()
+        external_log = StringIO()
+        model_runner.set_logger(external_log)
+        model_runner.log_to_stdout = False
+        model_runner.runtime.max_concurrent_tasks = 2
+        model_runner.process_pool = LocalProcessPool(max_processes=2)
+        model_runner.checkpoint = checkpoint
+
+        runner_thread = threading.Thread(target=model_runner.go, daemon=True)
+        runner_thread.start()
+        runner_thread.join(timeout=30)
+        self.assertFalse(runner_thread.is_alive(), "Runner is waiting for a replayed completion")
+
+        all_the_logs = external_log.getvalue()
+        self.assertIn("Skipped 1 sub-tasks completed by an earlier run", all_the_logs)
+        self.assertNotIn("Running model One", all_the_logs)
+        for model_name in ["One", "Two", "Six"]:
+            self.assertIn(f"Model completed: {model_name}", all_the_logs)
+
+    def test_resume_with_other_pool(self):
+        "Pools are only given the sub-tasks that aren't in the checkpoint"
+        checkpoint = SqliteCheckpoint(self.checkpoint_path)
+        checkpoint.record(
+            TaskPartition(
+                model_cls=SquareNumbersInWorkers, method_name="square", method_kwargs={"number": 2}
+            ),
+            TaskComplete(
+                model_cls_name="SquareNumbersInWorkers",
+                method_name="square",
+                method_kwargs={"number": 2},
+                return_value="from checkpoint",
+            ),
+        )
+
+        model = SquareNumbersInWorkers()
+        model.log_to_stdout = False
+        model.runtime.max_concurrent_tasks = 2
+        model.process_pool = SerialPool()
+        model.checkpoint = checkpoint
+        model.go()
+
+        expected = {0: 0, 1: 1, 2: "from checkpoint", 3: 9, 4: 16, 5: 25}
+        self.assertEqual(expected, model.results)
+        pool_numbers = [t.method_kwargs["number"] for t in model.process_pool.sub_tasks]
+        self.assertEqual([0, 1, 3, 4, 5], pool_numbers)
@@ -0,0 +1,123 @@
+from io import StringIO
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import ayeaye
+from ayeaye.runtime.knowledge import RuntimeKnowledge
+
+GiB = 1024**3
+
+
+class MemoryHungry(ayeaye.PartitionedModel):
+    def partition_plea(self):
+        return ayeaye.PartitionedModel.PartitionOption(
+            minimum=1, maximum=8, optimal=8, task_memory=1024 * GiB**2
+        )
+
+    def build(self):
+        pass
+
+    def partition_slice(self, partition_count):
+        return [("sub_task", {}) for _ in range(2)]
+
+    def sub_task(self):
+        return None
+
+
+class TestRuntimeKnowledge(unittest.TestCase):
+    def fake_runtime(self, proc_self_cgroup, files):
+        """
+        @param proc_self_cgroup: (str) contents of the fake /proc/self/cgroup
+        @param files: (dict) path relative to the cgroup root -> file contents
+        @return: :class:`RuntimeKnowledge` using fake files
+        """
+        fake_root = tempfile.mkdtemp()
+        cgroup_root = os.path.join(fake_root, "cgroup")
+        for relative_path, contents in files.items():
+            path = os.path.join(cgroup_root, relative_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(contents)
+
+        runtime = RuntimeKnowledge()
+        runtime.cgroup_root = cgroup_root
+        runtime.proc_self_cgroup = os.path.join(fake_root, "self_cgroup")
+        runtime.proc_meminfo = os.path.join(fake_root, "meminfo")
+
+        with open(runtime.proc_self_cgroup, "w") as f:
+            f.write(proc_self_cgroup)
+
+        with open(runtime.proc_meminfo, "w") as f:
+            f.write(f"MemTotal:       {64 * GiB // 1024} kB\n")
+            f.write(f"MemAvailable:   {32 * GiB // 1024} kB\n")
+
+        return runtime
+
+    @mock.patch("os.sched_getaffinity", return_value=set(range(8)), create=True)
+    def test_cgroup_v2(self, _):
+        runtime = self.fake_runtime(
+            "0::/kubepods/pod1\n",
+            {
+                "cpu.max": "max 100000",
+                "kubepods/pod1/cpu.max": "150000 100000",
+                "kubepods/pod1/memory.max": str(4 * GiB),
+                "kubepods/pod1/memory.current": str(3 * GiB),
+                "kubepods/pod1/memory.stat": f"anon 100\ninactive_file {GiB}\n",
+            },
+        )
+        self.assertEqual(1.5, runtime.cgroup_cpu_quota())
+        self.assertEqual(2, runtime.effective_cpus)
+        self.assertEqual(4, runtime.max_concurrent_tasks)
+
+        self.assertEqual(2 * GiB, runtime.available_memory)
+        self.assertEqual(4, runtime.max_tasks_for_memory(GiB // 2))
+        self.assertEqual(1, runtime.max_tasks_for_memory(100 * GiB))
+
+        # an estimate in scientific notation is a float
+        tasks = runtime.max_tasks_for_memory(2.5e8)
+        self.assertEqual(8, tasks)
+        self.assertIsInstance(tasks, int)
+
+        for not_valid in [0, -GiB]:
+            with self.assertRaises(ValueError):
+                runtime.max_tasks_for_memory(not_valid)
+
+    @mock.patch("os.sched_getaffinity", return_value=set(range(8)), create=True)
+    def test_cgroup_v1(self, _):
+        runtime = self.fake_runtime(
+            "5:memory:/docker/abc\n2:cpu,cpuacct:/docker/abc\n1:name=systemd:/\n",
+            {
+                # the container's cgroups are mounted at the root of each hierarchy
+                "cpu/cpu.cfs_quota_us": "300000",
+                "cpu/cpu.cfs_period_us": "100000",
+                "memory/memory.limit_in_bytes": str(8 * GiB),
+                "memory/memory.usage_in_bytes": str(GiB),
+            },
+        )
+        self.assertEqual(3, runtime.effective_cpus)
+        self.assertEqual(7 * GiB, runtime.available_memory)
+
+    @mock.patch("os.sched_getaffinity", return_value={0, 1}, create=True)
+    def test_no_limits(self, _):
+        runtime = self.fake_runtime(
+            "2:cpu,cpuacct:/\n0::/\n",
+            {"cpu/cpu.cfs_quota_us": "-1", "cpu/cpu.cfs_period_us": "100000"},
+        )
+        self.assertIsNone(runtime.cgroup_cpu_quota())
+        self.assertEqual(2, runtime.effective_cpus, "CPU affinity")
+        self.assertEqual(32 * GiB, runtime.available_memory, "From meminfo")
+
+        runtime.max_concurrent_tasks = 1
+        self.assertEqual(1, runtime.max_concurrent_tasks)
+
+    def test_memory_limits_workers(self):
+        m = MemoryHungry()
+        log = StringIO()
+        m.set_logger(log)
+        m.log_to_stdout = False
+        m.go()
+
+        self.assertIn("Available memory limits the number of workers to 1", log.getvalue())
+        self.assertIn("Running single sub-task within main process", log.getvalue())
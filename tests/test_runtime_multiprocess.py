@@ -1,10 +1,19 @@
+from multiprocessing.connection import wait
+import os
+import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
+import uuid
 
 import ayeaye
+from ayeaye.exception import SubTaskFailed
 from ayeaye.runtime.multiprocess import LocalProcessPool
 from ayeaye.runtime.task_message import (
     task_message_factory,
     TaskComplete,
+    TaskFailed,
     TaskLogMessage,
     TaskPartition,
 )
@@ -31,6 +40,71 @@ class ExamineResolverContext(ayeaye.PartitionedModel):
         return r
 
 
+class WorkerPid(ayeaye.PartitionedModel):
+    def __init__(self):
+        super().__init__()
+        self.worker_pids = set()
+        # id(self) could be reused by a later instance
+        self.instance_id = uuid.uuid4().hex
+
+    def partition_plea(self):
+        return ayeaye.PartitionedModel.PartitionOption(minimum=1, maximum=2, optimal=2)
+
+    def build(self):
+        pass
+
+    def partition_slice(self, partition_count):
+        return [("worker_pid", {}) for _ in range(4)]
+
+    def worker_pid(self):
+        return os.getpid()
+
+    def partition_subtask_complete(self, task_message):
+        self.worker_pids.add(task_message.return_value)
+
+    def partition_initialise(self, **kwargs):
+        super().partition_initialise(**kwargs)
+        self.initialise_count = getattr(self, "initialise_count", 0) + 1
+
+    def large_result(self, size):
+        return {"bytes": b"b" * size, "bytearray": bytearray(size), "small": b"s"}
+
+    def sleep(self, seconds, wait_for=None):
+        "@param wait_for: (str) path of a file to wait for before sleeping"
+        deadline = time.monotonic() + 30
+        while wait_for is not None and not os.path.exists(wait_for):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{wait_for} wasn't made")
+            time.sleep(0.01)
+
+        time.sleep(seconds)
+        return seconds
+
+    def initialised(self, fail=False):
+        if fail:
+            raise ValueError("Sub-task failed")
+        return self.instance_id, self.initialise_count
+
+    def exit_worker(self):
+        os._exit(3)
+
+    def flaky(self, counter_path, failures):
+        "Fail the first `failures` times it's run. Attempts are counted in a file."
+        with open(counter_path, "a+") as f:
+            f.write("x")
+            f.seek(0)
+            attempt = len(f.read())
+
+        if attempt <= failures:
+            raise ValueError(f"Failed attempt {attempt}")
+        return attempt
+
+    def model_instance(self, fail=False):
+        if fail:
+            raise ValueError("Sub-task failed")
+        return self.instance_id
+
+
 class TestRuntimeMultiprocess(unittest.TestCase):
     """
     Test the local execution of :class:`ayeaye.Model`s with multiple processes.
@@ -97,3 +171,316 @@ class TestRuntimeMultiprocess(unittest.TestCase):
         message = task_message_factory(serialised)
         self.assertIsInstance(message, TaskLogMessage)
         self.assertEqual(message.msg, sample_message)
+
+    def test_persistent_pool(self):
+        """
+        Workers are kept running between calls to `run_subtasks`.
+        """
+        pool = LocalProcessPool(
+            max_processes=2, persistent=True, start_method="spawn", preload_modules=["json"]
+        )
+        self.assertFalse(pool.is_running)
+
+        def subtasks_iterator():
+            for _ in range(4):
+                yield TaskPartition(model_cls=WorkerPid, method_name="worker_pid")
+
+        with pool:
+            worker_pids = []
+            for _ in range(2):
+                for subtask_msg in pool.run_subtasks(sub_tasks=subtasks_iterator()):
+                    if isinstance(subtask_msg, TaskComplete):
+                        worker_pids.append(subtask_msg.return_value)
+
+                self.assertTrue(pool.is_running)
+
+            self.assertEqual(8, len(worker_pids))
+            pool_pids = {proc.pid for proc in pool.proc_table}
+            self.assertTrue(set(worker_pids).issubset(pool_pids))
+
+        self.assertFalse(pool.is_running)
+
+    def test_shared_pool_across_models(self):
+        pool = LocalProcessPool(max_processes=2, persistent=True).make_shared()
+        try:
+            first_model = WorkerPid()
+            first_model.go()
+            second_model = WorkerPid()
+            second_model.go()
+
+            self.assertIs(pool, second_model.process_pool)
+            pool_pids = {proc.pid for proc in pool.proc_table}
+            self.assertTrue(first_model.worker_pids.issubset(pool_pids))
+            self.assertTrue(second_model.worker_pids.issubset(pool_pids))
+        finally:
+            pool.shutdown()
+
+        self.assertIsNone(LocalProcessPool.shared())
+
+    def test_event_driven_completion(self):
+        """
+        The last message is yielded as soon as it's received, not on the next poll of a queue.
+        """
+        wait_timeouts = []
+
+        def recording_wait(object_list, timeout=None):
+            wait_timeouts.append(timeout)
+            return wait(object_list, timeout=timeout)
+
+        with LocalProcessPool(max_processes=2, persistent=True) as pool:
+            pool.start()
+            sub_tasks = [TaskPartition(model_cls=WorkerPid, method_name="worker_pid")] * 3
+
+            with mock.patch("ayeaye.runtime.multiprocess.wait", recording_wait):
+                messages = list(pool.run_subtasks(sub_tasks=iter(sub_tasks)))
+
+        self.assertEqual(3, len(messages))
+        # without sub-tasks to retry it only wakes for a message or an exited worker
+        self.assertTrue(len(wait_timeouts) > 0)
+        self.assertEqual({None}, set(wait_timeouts))
+
+    def test_worker_exit_is_detected(self):
+        """
+        A worker process that exits while running a sub-task is reported as a failed sub-task and
+        replaced. The other sub-tasks still run.
+        """
+        sub_tasks = [
+            TaskPartition(model_cls=WorkerPid, method_name="worker_pid"),
+            TaskPartition(model_cls=WorkerPid, method_name="exit_worker"),
+            TaskPartition(model_cls=WorkerPid, method_name="worker_pid"),
+            TaskPartition(model_cls=WorkerPid, method_name="worker_pid"),
+        ]
+        pool = LocalProcessPool(max_processes=2)
+        messages = list(pool.run_subtasks(sub_tasks=iter(sub_tasks)))
+
+        failed = [m for m in messages if isinstance(m, TaskFailed)]
+        self.assertEqual(1, len(failed))
+        self.assertEqual("exit_worker", failed[0].method_name)
+        self.assertIn("WorkerProcessExited", failed[0].exception_class_name)
+        self.assertIn("exited with code 3", failed[0].traceback[0])
+        self.assertEqual(3, len([m for m in messages if isinstance(m, TaskComplete)]))
+
+    def test_sub_tasks_iterator_exception(self):
+        def sub_tasks():
+            yield TaskPartition(model_cls=WorkerPid, method_name="worker_pid")
+            raise KeyError("no more tasks")
+
+        pool = LocalProcessPool(max_processes=2)
+        with self.assertRaises(KeyError):
+            list(pool.run_subtasks(sub_tasks=sub_tasks()))
+
+        self.assertFalse(pool.is_running)
+
+    def test_bounded_in_flight_sub_tasks(self):
+        """
+        Sub-tasks are only read from the iterator when there is space in the in-flight window.
+        """
+        pulled = []
+        window = 2 * 1
+        window_refilled = threading.Event()
+
+        def sub_tasks():
+            for idx in range(20):
+                pulled.append(idx)
+                if idx == window:
+                    window_refilled.set()
+                yield TaskPartition(model_cls=WorkerPid, method_name="worker_pid")
+
+        pool = LocalProcessPool(max_processes=2, in_flight_factor=1)
+        messages = pool.run_subtasks(sub_tasks=sub_tasks())
+        completed = [next(messages)]
+
+        # the first finished sub-task made space for one more. Messages aren't being received so
+        # no more space is made.
+        self.assertTrue(window_refilled.wait(timeout=30))
+        self.assertEqual(window + len(completed), len(pulled))
+
+        completed.extend(messages)
+        self.assertEqual(20, len(pulled))
+        self.assertEqual(20, len(completed))
+
+        with self.assertRaises(ValueError):
+            LocalProcessPool(max_processes=2, in_flight_factor=0)
+
+    def test_chunked_sub_tasks(self):
+        """
+        Sub-tasks that can share a model instance are sent to the workers in chunks.
+        """
+        sub_tasks = [
+            TaskPartition(
+                model_cls=WorkerPid, method_name="model_instance", method_kwargs={"fail": idx == 9}
+            )
+            for idx in range(12)
+        ]
+        pool = LocalProcessPool(max_processes=2, chunk_size=4)
+        messages = list(pool.run_subtasks(sub_tasks=iter(sub_tasks)))
+
+        completed = [m for m in messages if isinstance(m, TaskComplete)]
+        failed = [m for m in messages if isinstance(m, TaskFailed)]
+        self.assertEqual(11, len(completed))
+        self.assertEqual([{"fail": True}], [m.method_kwargs for m in failed])
+
+        # The first 4 sub-tasks go straight to the idle workers. The rest wait for a worker and
+        # are chunked. The chunk with the failed sub-task builds another model after the failure.
+        model_instances = {m.return_value for m in completed}
+        self.assertLessEqual(len(model_instances), 7)
+
+    def test_model_cache(self):
+        """
+        Workers keep initialised models for sub-tasks with the same model kwargs.
+        """
+
+        def sub_tasks():
+            for idx in range(6):
+                yield TaskPartition(
+                    model_cls=WorkerPid,
+                    method_name="initialised",
+                    method_kwargs={"fail": idx == 3},
+                    partition_initialise_kwargs={"even": idx % 2 == 0},
+                )
+
+        pool = LocalProcessPool(max_processes=1, model_cache_size=2)
+        messages = list(pool.run_subtasks(sub_tasks=sub_tasks()))
+        completed = [m.return_value for m in messages if isinstance(m, TaskComplete)]
+
+        self.assertEqual(5, len(completed))
+        self.assertEqual({1}, {initialise_count for _, initialise_count in completed})
+
+        # completed are sub-tasks 0, 1, 2, 4 and 5. Even sub-tasks share a model, odd sub-tasks
+        # did until sub-task 3 failed so sub-task 5 has a new one
+        model_ids = [model_id for model_id, _ in completed]
+        self.assertEqual(model_ids[0], model_ids[2])
+        self.assertEqual(model_ids[0], model_ids[3])
+        self.assertNotEqual(model_ids[1], model_ids[4])
+
+        pool = LocalProcessPool(max_processes=1)
+        messages = list(pool.run_subtasks(sub_tasks=sub_tasks()))
+        model_ids = [m.return_value[0] for m in messages if isinstance(m, TaskComplete)]
+        self.assertNotEqual(model_ids[0], model_ids[2], "no cache by default")
+
+    def test_largest_sub_tasks_first(self):
+        """
+        Sub-tasks waiting for a worker are given out in order of their estimated cost and the
+        time each worker was busy is recorded.
+        """
+        costs = [1, 5, 2, 4, 3]
+        all_submitted = os.path.join(tempfile.mkdtemp(), "all_submitted")
+
+        def sub_tasks():
+            for cost in costs:
+                if cost == 1:
+                    # the first sub-task keeps the worker busy until the rest are waiting
+                    method_kwargs = {"seconds": 0.2, "wait_for": all_submitted}
+                else:
+                    method_kwargs = {"seconds": cost / 1000}
+                yield TaskPartition(
+                    model_cls=WorkerPid, method_name="sleep", method_kwargs=method_kwargs, cost=cost
+                )
+
+            # the feeder asks for another sub-task after submitting the last one
+            with open(all_submitted, "w"):
+                pass
+
+        pool = LocalProcessPool(max_processes=1, in_flight_factor=10)
+        messages = list(pool.run_subtasks(sub_tasks=sub_tasks()))
+
+        # the first two went straight to the idle worker
+        run_order = [m.return_value for m in messages]
+        self.assertEqual([0.2, 0.005, 0.004, 0.003, 0.002], run_order)
+        self.assertEqual(1, len(pool.utilisation))
+
+        worker = pool.utilisation[0]
+        self.assertEqual((5, 15), (worker.sub_tasks, worker.cost))
+        self.assertGreaterEqual(worker.busy_seconds, 0.2)
+        self.assertTrue(0 < worker.utilisation <= 1)
+        self.assertIn("Worker 0 ran 5 sub-tasks", pool.utilisation_report()[0])
+
+    def test_shared_memory_results(self):
+        """
+        Large values in sub-task results are sent to the parent in shared memory which is released
+        when the results have been received.
+        """
+        shared_memory_before = set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+        sub_tasks = [
+            TaskPartition(
+                model_cls=WorkerPid, method_name="large_result", method_kwargs={"size": size}
+            )
+            for size in [10, 1_000_000]
+        ]
+        pool = LocalProcessPool(max_processes=2, shared_memory_threshold=1024)
+        messages = list(pool.run_subtasks(sub_tasks=iter(sub_tasks)))
+
+        results = sorted(
+            (m.return_value for m in messages if isinstance(m, TaskComplete)),
+            key=lambda r: len(r["bytes"]),
+        )
+        for size, result in zip([10, 1_000_000], results):
+            self.assertEqual(b"b" * size, result["bytes"])
+            self.assertEqual(bytearray(size), result["bytearray"])
+            self.assertIsInstance(result["bytearray"], bytearray)
+            self.assertEqual(b"s", result["small"])
+
+        if os.path.isdir("/dev/shm"):
+            self.assertEqual(shared_memory_before, set(os.listdir("/dev/shm")))
+
+        with self.assertRaises(ValueError):
+            LocalProcessPool(max_processes=2, shared_memory_threshold=0)
+
+    def test_retry_failed_sub_tasks(self):
+        """
+        Failed sub-tasks are run again after a growing delay. A failure that succeeds when retried
+        is a warning and the last failure of one that never succeeds carries the attempt number.
+        """
+        counters = tempfile.mkdtemp()
+        sub_tasks = [
+            TaskPartition(
+                model_cls=WorkerPid,
+                method_name="flaky",
+                method_kwargs={"counter_path": os.path.join(counters, name), "failures": failures},
+            )
+            for name, failures in [("succeeds", 0), ("recovers", 2), ("broken", 5)]
+        ]
+        sub_tasks.append(TaskPartition(model_cls=WorkerPid, method_name="exit_worker"))
+
+        pool = LocalProcessPool(max_processes=2, max_attempts=3, retry_delay=0.1)
+        start_time = time.perf_counter()
+        messages = list(pool.run_subtasks(sub_tasks=iter(sub_tasks)))
+        elapsed = time.perf_counter() - start_time
+
+        completed = sorted(m.return_value for m in messages if isinstance(m, TaskComplete))
+        self.assertEqual([1, 3], completed)
+
+        failed = {m.method_name: m for m in messages if isinstance(m, TaskFailed)}
+        self.assertEqual({"flaky", "exit_worker"}, set(failed))
+        self.assertEqual(3, failed["flaky"].attempt)
+        self.assertEqual("Failed attempt 3", failed["flaky"].traceback[0])
+        self.assertEqual(3, failed["exit_worker"].attempt)
+
+        warnings = [m for m in messages if isinstance(m, TaskLogMessage) and m.level == "WARNING"]
+        retried = [m.msg for m in warnings if "Retrying in" in m.msg]
+        self.assertEqual(6, len(retried), "two retries for each of three sub-tasks")
+        self.assertEqual(3, len([msg for msg in retried if "Retrying in 0.20s" in msg]))
+        self.assertEqual(1, len([m for m in warnings if "succeeded on attempt 3" in m.msg]))
+
+        # 0.1 and 0.2 second backoff before the retries
+        self.assertGreaterEqual(elapsed, 0.3)
+
+        with self.assertRaises(ValueError):
+            LocalProcessPool(max_processes=2, max_attempts=0)
+
+    def test_retry_in_model(self):
+        """
+        A :class:`PartitionedModel` using a pool with retries only sees the final failure.
+        """
+        model = WorkerPid()
+        model.log_to_stdout = False
+        model.runtime.max_concurrent_tasks = 2
+        model.process_pool = LocalProcessPool(max_processes=2, max_attempts=2, retry_delay=0)
+        model.partition_slice = lambda _: [("initialised", {"fail": True})]
+
+        with self.assertRaises(SubTaskFailed) as context:
+            model.go()
+
+        self.assertEqual(2, context.exception.task_fail_message.attempt)
+        self.assertIn("exception on attempt 2.", str(context.exception))
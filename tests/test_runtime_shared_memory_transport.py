@@ -0,0 +1,51 @@
+import os
+import pickle
+import unittest
+
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+from ayeaye.runtime import shared_memory_transport
+from ayeaye.runtime.shared_memory_transport import SharedMemoryMessage
+
+
+class TestSharedMemoryTransport(unittest.TestCase):
+    def setUp(self):
+        self.shared_memory_before = self.shared_memory_blocks()
+
+    def tearDown(self):
+        # every block has been unlinked
+        self.assertEqual(self.shared_memory_before, self.shared_memory_blocks())
+
+    @staticmethod
+    def shared_memory_blocks():
+        "@return: (set of str) names of shared memory blocks when it's possible to list them"
+        return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+    def test_small_values_stay_in_the_pickle(self):
+        message = {"name": "Alice", "payload": b"x" * 100}
+        message_bytes = shared_memory_transport.dumps(message, threshold=1024)
+
+        self.assertEqual(message, pickle.loads(message_bytes), "Just a normal pickle")
+        self.assertEqual(message, shared_memory_transport.loads(message_bytes))
+
+    def test_large_bytes(self):
+        message = {"payload": b"x" * 10_000, "buffer": bytearray(b"y" * 5_000), "small": b"z"}
+        message_bytes = shared_memory_transport.dumps(message, threshold=1024)
+        self.assertLess(len(message_bytes), 1024)
+
+        received = shared_memory_transport.loads(message_bytes)
+        self.assertEqual(message, received)
+        self.assertIsInstance(received["buffer"], bytearray)
+
+    @unittest.skipIf(np is None, "Numpy not installed")
+    def test_out_of_band_buffers(self):
+        message = [np.arange(100_000), np.arange(10), np.arange(20_000).reshape(100, 200).T]
+        message_bytes = shared_memory_transport.dumps(message, threshold=1024)
+        self.assertIsInstance(pickle.loads(message_bytes), SharedMemoryMessage)
+
+        received = shared_memory_transport.loads(message_bytes)
+        for expected, array in zip(message, received):
+            self.assertTrue((expected == array).all())
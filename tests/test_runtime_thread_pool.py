@@ -0,0 +1,126 @@
+import threading
+import unittest
+
+import ayeaye
+from ayeaye.runtime.thread_pool import LocalThreadPool
+from ayeaye.runtime.task_message import TaskComplete, TaskFailed, TaskLogMessage, TaskPartition
+
+
+class ResolveInThread(ayeaye.PartitionedModel):
+    """
+    Sub-tasks resolve a template variable from their own context while the other sub-tasks are
+    running in other threads.
+    """
+
+    # both sub-tasks must be running at the same time
+    barrier = None
+
+    def __init__(self):
+        super().__init__()
+        self.resolved = {}
+
+    def partition_plea(self):
+        return ayeaye.PartitionedModel.PartitionOption(
+            minimum=2, maximum=2, optimal=2, worker_type="thread"
+        )
+
+    def build(self):
+        pass
+
+    def partition_slice(self, partition_count):
+        ResolveInThread.barrier = threading.Barrier(2, timeout=5)
+        return [
+            TaskPartition(
+                model_cls=self.__class__,
+                method_name="resolve",
+                method_kwargs={"sub_task_id": sub_task_id},
+                additional_context={"colour": colour},
+            )
+            for sub_task_id, colour in enumerate(["red", "blue"])
+        ]
+
+    def resolve(self, sub_task_id):
+        self.barrier.wait()
+        self.log(f"Sub-task {sub_task_id} is running")
+        colour = ayeaye.connector_resolver.resolve("{colour}")
+        self.barrier.wait()
+        return sub_task_id, colour, ayeaye.connector_resolver.resolve("{build_id}")
+
+    def fail(self):
+        raise ValueError("Sub-task failed")
+
+    def partition_subtask_complete(self, task_message):
+        sub_task_id, colour, build_id = task_message.return_value
+        self.resolved[sub_task_id] = (colour, build_id)
+
+
+class TestRuntimeThreadPool(unittest.TestCase):
+    def tearDown(self):
+        ayeaye.connector_resolver.brutal_reset()
+
+    def test_isolated_resolver_context(self):
+        """
+        Sub-tasks running at the same time in different threads have their own resolver context.
+        The model chose threads with `partition_plea`.
+        """
+        model = ResolveInThread()
+        with ayeaye.connector_resolver.context(build_id="b1"):
+            model.go()
+
+        self.assertIsInstance(model.process_pool, LocalThreadPool)
+        self.assertEqual({0: ("red", "b1"), 1: ("blue", "b1")}, model.resolved)
+
+        with self.assertRaises(ValueError):
+            ayeaye.connector_resolver.resolve("{colour}")
+
+    def test_run_subtasks(self):
+        def sub_tasks():
+            yield TaskPartition(model_cls=ResolveInThread, method_name="fail")
+            for colour in ["red", "blue"]:
+                yield TaskPartition(
+                    model_cls=ResolveInThread,
+                    method_name="resolve",
+                    method_kwargs={"sub_task_id": colour},
+                    additional_context={"colour": colour},
+                )
+
+        ResolveInThread.barrier = threading.Barrier(2, timeout=5)
+        pool = LocalThreadPool(max_threads=2)
+        messages = list(pool.run_subtasks(sub_tasks=sub_tasks(), context_kwargs={"build_id": "b2"}))
+
+        completed = {m.return_value for m in messages if isinstance(m, TaskComplete)}
+        self.assertEqual({("red", "red", "b2"), ("blue", "blue", "b2")}, completed)
+
+        failed = [m for m in messages if isinstance(m, TaskFailed)]
+        self.assertEqual(1, len(failed))
+        self.assertEqual("Sub-task failed", failed[0].traceback[0])
+
+        logs = [m.msg for m in messages if isinstance(m, TaskLogMessage)]
+        self.assertEqual(2, len([msg for msg in logs if "is running" in msg]))
+
+        with self.assertRaises(ValueError):
+            list(pool.run_subtasks(sub_tasks=sub_tasks(), processes=3))
+
+    def test_sub_tasks_iterator_exception(self):
+        def sub_tasks():
+            yield TaskPartition(model_cls=ResolveInThread, method_name="fail")
+            raise KeyError("no more tasks")
+
+        pool = LocalThreadPool(max_threads=2)
+        with self.assertRaises(KeyError):
+            list(pool.run_subtasks(sub_tasks=sub_tasks()))
+
+    def test_isolated_thread(self):
+        connector_resolver = ayeaye.connector_resolver
+        connector_resolver.add(build_id="b3")
+
+        with connector_resolver.isolated_thread():
+            with self.assertRaises(ValueError):
+                connector_resolver.resolve("{build_id}")
+
+            connector_resolver.add(colour="green")
+            self.assertEqual("green", connector_resolver.resolve("{colour}"))
+
+        self.assertEqual("b3", connector_resolver.resolve("{build_id}"))
+        with self.assertRaises(ValueError):
+            connector_resolver.resolve("{colour}")